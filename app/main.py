@@ -1,16 +1,53 @@
 # app.py (New file, for API exposure)
-import os
+import json
+from typing import List, Optional, Union
+
+from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from dotenv import load_dotenv
-
-load_dotenv()
+from starlette.background import BackgroundTask
 
-from src.graph.agent_workflow import create_rag_agent_workflow
-from src.models import AgentState
+from src.cache.embedding_cache import CachedEmbeddings
+from src.cache.llm_cache import get_response_cache
+from src.cache.semantic_cache import (
+    CacheLookup,
+    get_semantic_cache,
+    is_cacheable_answer,
+)
 from src.config import ConfigurationManager
+from src.constants import (
+    DEFAULT_BATCH_CONCURRENCY,
+    DEFAULT_MAX_BATCH_QUERIES,
+    DEFAULT_MAX_CONCURRENT_QUERIES,
+    DEFAULT_MAX_QUEUED_QUERIES,
+    DEFAULT_QUEUE_TIMEOUT_SECONDS,
+    GRAPH_RECURSION_LIMIT,
+)
+from src.graph.agent_workflow import get_rag_agent_workflow
+from src.graph.batch_runner import BatchQueryRunner, parse_batch_items
+from src.graph.event_stream import format_sse, stream_agent_events
+from src.llm_config import embeddings_loaded, get_embeddings
+from src.models import build_initial_state
+from src.retrieval.relevance_gate import get_relevance_gate
+from src.retrieval.retrieval_cache import get_retrieval_cache
+from src.utils.concurrency import ConcurrencyLimiter, ServerBusyError
+from src.utils.query_router import get_query_router
+from src.utils.resource_registry import get_resource_registry
 
-rag_app = create_rag_agent_workflow()
+load_dotenv()
+
+resource_registry = get_resource_registry()
+server_config = ConfigurationManager().get_server_config()
+query_limiter = ConcurrencyLimiter(
+    max_concurrency=server_config.get(
+        "MAX_CONCURRENT_QUERIES", DEFAULT_MAX_CONCURRENT_QUERIES
+    ),
+    max_queue_size=server_config.get("MAX_QUEUED_QUERIES", DEFAULT_MAX_QUEUED_QUERIES),
+    queue_timeout=server_config.get(
+        "QUEUE_TIMEOUT_SECONDS", DEFAULT_QUEUE_TIMEOUT_SECONDS
+    ),
+)
 
 app = FastAPI(title="RAG Agent API", version="1.0.0")
 
@@ -19,6 +56,52 @@ class QueryRequest(BaseModel):
     query: str
 
 
+class BatchQueryRequest(BaseModel):
+    # Each entry is a query string or {"id": ..., "query": ...}.
+    queries: List[Union[str, dict]]
+    concurrency: Optional[int] = None
+    use_cache: bool = True
+
+
+def ensure_knowledge_base():
+    resource_registry.refresh_config()
+    if not resource_registry.knowledge_base_ready():
+        raise HTTPException(
+            status_code=500,
+            detail="Knowledge base not found or empty. Please ensure it's mounted correctly.",
+        )
+
+
+def server_busy(error: ServerBusyError) -> HTTPException:
+    print(f"Rejecting query, server busy: {error}")
+    return HTTPException(
+        status_code=503,
+        detail=f"Server is busy, please retry shortly. {error}",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def lookup_cached_answer(query: str) -> Optional[CacheLookup]:
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is None:
+        return None
+    try:
+        cache_lookup = await semantic_cache.alookup(query)
+    except Exception as e:
+        print(f"Semantic cache lookup failed, running the agent instead: {e}")
+        return None
+    if cache_lookup.hit:
+        print(
+            f"Semantic cache hit (similarity {cache_lookup.similarity:.3f}) for: {cache_lookup.matched_query}"
+        )
+    return cache_lookup
+
+
+def store_cached_answer(query: str, answer: str, cache_lookup: Optional[CacheLookup]):
+    if cache_lookup is not None:
+        get_semantic_cache().store(query, answer, cache_lookup)
+
+
 @app.post("/query")
 async def process_query(request: QueryRequest):
     """
@@ -26,46 +109,195 @@ async def process_query(request: QueryRequest):
     """
     print(f"Received query: {request.query}")
 
-    config = ConfigurationManager()
-    knowledge_base_config = config.get_knowledge_base_config()
-    chroma_db_dir = knowledge_base_config["CHROMA_DB_DIR"]
+    ensure_knowledge_base()
 
-    if not os.path.exists(chroma_db_dir) or not os.listdir(chroma_db_dir):
-        raise HTTPException(
-            status_code=500,
-            detail="Knowledge base not found or empty. Please ensure it's mounted correctly.",
-        )
+    cache_lookup = await lookup_cached_answer(request.query)
+    if cache_lookup is not None and cache_lookup.hit:
+        return {"answer": cache_lookup.answer, "cached": True}
 
-    initial_state: AgentState = {
-        "original_query": request.query,
-        "sub_queries_list": [],
-        "current_sub_query_index": 0,
-        "current_sub_query": "",
-        "retrieved_chunks": [],
-        "evaluated_sufficiency": False,
-        "evaluator_feedback": "",
-        "retrieval_attempts": 0,
-        "accumulated_relevant_chunks": [],
-        "unanswerable_sub_queries": [],
-        "final_answer_draft": "",
-        "report_formatted": "",
-        "next_agent_to_call": "research_agent",
-    }
+    initial_state = build_initial_state(request.query)
 
     try:
-        final_state = rag_app.invoke(initial_state)
-        if final_state.get("report_formatted"):
-            return {"answer": final_state["report_formatted"]}
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="An error occurred and no final answer could be generated.",
+        async with query_limiter.slot():
+            final_state = await get_rag_agent_workflow().ainvoke(
+                initial_state, config={"recursion_limit": GRAPH_RECURSION_LIMIT}
             )
+    except ServerBusyError as e:
+        raise server_busy(e) from e
     except Exception as e:
         print(f"Error during agent execution: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {e}"
+        ) from e
+
+    if final_state.get("report_formatted"):
+        if is_cacheable_answer(final_state):
+            store_cached_answer(
+                request.query, final_state["report_formatted"], cache_lookup
+            )
+        return {"answer": final_state["report_formatted"], "cached": False}
+    raise HTTPException(
+        status_code=500,
+        detail="An error occurred and no final answer could be generated.",
+    )
+
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """
+    Endpoint that streams the RAG agent's progress and answer as Server-Sent-Events.
+
+    Emits `sub_queries`, `sub_query_started`, `retrieval_done`, `sufficiency_verdict`
+    and `synthesis_done` progress events, then `token` events for the final answer
+    as it is generated, and a closing `done` (or `error`) event. Semantic cache
+    hits skip straight to a `cache_hit` event, the cached answer as a single
+    `token`, and `done`.
+    """
+    print(f"Received streaming query: {request.query}")
+
+    ensure_knowledge_base()
+
+    cache_lookup = await lookup_cached_answer(request.query)
+    if cache_lookup is not None and cache_lookup.hit:
+
+        async def cached_source():
+            yield format_sse(
+                {
+                    "event": "cache_hit",
+                    "data": {
+                        "matched_query": cache_lookup.matched_query,
+                        "similarity": cache_lookup.similarity,
+                    },
+                }
+            )
+            yield format_sse({"event": "token", "data": {"text": cache_lookup.answer}})
+            yield format_sse(
+                {
+                    "event": "done",
+                    "data": {
+                        "answer": cache_lookup.answer,
+                        "grounded": True,
+                        "replaces_stream": False,
+                    },
+                }
+            )
+
+        return StreamingResponse(cached_source(), media_type="text/event-stream")
+
+    initial_state = build_initial_state(request.query)
+
+    # Take the slot before the response starts so overload can still be a 503.
+    # It is released by whichever runs first: the body generator's `finally`,
+    # or the response's background task, which also runs when the client
+    # disconnects before the body generator starts.
+    try:
+        slot = await query_limiter.acquire_guard()
+    except ServerBusyError as e:
+        raise server_busy(e) from e
+
+    async def event_source():
+        try:
+            async for event in stream_agent_events(
+                get_rag_agent_workflow(),
+                initial_state,
+                config={"recursion_limit": GRAPH_RECURSION_LIMIT},
+            ):
+                if (
+                    event["event"] == "done"
+                    and event["data"]["answer"]
+                    and event["data"]["grounded"]
+                ):
+                    store_cached_answer(
+                        request.query, event["data"]["answer"], cache_lookup
+                    )
+                yield format_sse(event)
+        except Exception as e:
+            print(f"Error during streaming agent execution: {e}")
+            yield format_sse({"event": "error", "data": {"detail": str(e)}})
+        finally:
+            slot.release()
+
+    try:
+        return StreamingResponse(
+            event_source(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(slot.release),
+        )
+    except Exception:
+        slot.release()
+        raise
+
+
+@app.post("/query/batch")
+async def batch_query(request: BatchQueryRequest):
+    """
+    Endpoint that answers a batch of queries and streams one JSON result per
+    line (`application/x-ndjson`) as each finishes, in completion order.
+
+    Each result carries the item's `id` (its 1-based position unless given),
+    `answer`, `status` (`ok`, `no_answer` or `error`), `cached`, `grounded`,
+    `error` and `seconds`. Duplicate queries are answered once. To resume an
+    interrupted batch, resubmit the items whose ids have no result yet.
+    """
+    ensure_knowledge_base()
+
+    max_batch_queries = server_config.get(
+        "MAX_BATCH_QUERIES", DEFAULT_MAX_BATCH_QUERIES
+    )
+    if len(request.queries) > max_batch_queries:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(request.queries)} queries, the limit is {max_batch_queries}.",
+        )
+    try:
+        items = parse_batch_items(request.queries)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    concurrency = min(
+        request.concurrency
+        or server_config.get("BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY),
+        query_limiter.max_concurrency,
+    )
+    runner = BatchQueryRunner(
+        concurrency=concurrency, use_cache=request.use_cache, limiter=query_limiter
+    )
+
+    async def result_source():
+        async for record in runner.run(items):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        print(f"Batch completed: {runner.stats()}")
+
+    return StreamingResponse(result_source(), media_type="application/x-ndjson")
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "message": "RAG Agent API is running"}
+    return {
+        "status": "ok",
+        "message": "RAG Agent API is running",
+        "query_limiter": query_limiter.stats(),
+        **resource_registry.status(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    semantic_cache = get_semantic_cache()
+    response_cache = get_response_cache()
+    relevance_gate = get_relevance_gate()
+    query_router = get_query_router()
+    retrieval_cache = get_retrieval_cache()
+    embeddings = get_embeddings() if embeddings_loaded() else None
+    return {
+        "query_limiter": query_limiter.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "llm_cache": response_cache.stats() if response_cache else None,
+        "embedding_cache": (
+            embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+        ),
+        "relevance_gate": relevance_gate.stats() if relevance_gate else None,
+        "query_router": query_router.stats() if query_router else None,
+        "retrieval_cache": retrieval_cache.stats() if retrieval_cache else None,
+    }
@@ -0,0 +1,402 @@
+"""
+Latency and cost benchmark of the full agent graph, run against the
+deterministic local LLM and embeddings in `benchmarks.fakes` and a synthetic
+knowledge base in a scratch directory. For every scenario and concurrency
+level it reports throughput, latency, LLM calls, tokens and per-node wall
+time, and optionally compares the results against a stored baseline
+(exiting non-zero on a regression).
+
+    python -m benchmarks.agent_graph --levels 1 4 16 --queries 24
+    python -m benchmarks.agent_graph --save-baseline benchmarks/baseline.json
+    python -m benchmarks.agent_graph --baseline benchmarks/baseline.json \\
+        --set agent_config.EXECUTION_MODE='"batched"'
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from benchmarks.synthetic_kb import (
+    SCENARIOS,
+    build_synthetic_knowledge_base,
+    product_names,
+    scenario_queries,
+)
+from src.cache.embedding_cache import with_embedding_cache
+from src.config import load_config
+from src.constants import GRAPH_RECURSION_LIMIT
+from src.graph.agent_workflow import get_rag_agent_workflow
+from src.llm_config import set_clients
+from src.models import build_initial_state
+
+# metric -> whether a higher value is better
+COMPARED_METRICS = {
+    "throughput_qpm": True,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "llm_calls_per_query": False,
+    "input_tokens_per_query": False,
+    "output_tokens_per_query": False,
+}
+
+
+class NodeProfiler(BaseCallbackHandler):
+    """
+    Callback handler that times every graph node run and attributes LLM calls
+    and token usage to the node that made them.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._node_runs: Dict[Any, tuple] = {}
+        self._llm_runs: Dict[Any, str] = {}
+        self.nodes: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {
+                "calls": 0,
+                "seconds": 0.0,
+                "llm_calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+            }
+        )
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs
+    ):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            with self._lock:
+                if parent_run_id not in self._node_runs:
+                    self._node_runs[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish_node(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish_node(run_id)
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        with self._lock:
+            self._llm_runs[run_id] = (metadata or {}).get("langgraph_node", "other")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            node = self._llm_runs.pop(run_id, "other")
+            stats = self.nodes[node]
+            stats["llm_calls"] += 1
+            for generations in response.generations:
+                for generation in generations:
+                    usage = (
+                        getattr(
+                            getattr(generation, "message", None), "usage_metadata", None
+                        )
+                        or {}
+                    )
+                    stats["input_tokens"] += usage.get("input_tokens", 0)
+                    stats["output_tokens"] += usage.get("output_tokens", 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._llm_runs.pop(run_id, None)
+
+    def _finish_node(self, run_id):
+        with self._lock:
+            node_run = self._node_runs.pop(run_id, None)
+            if node_run is None:
+                return
+            node, started = node_run
+            self.nodes[node]["calls"] += 1
+            self.nodes[node]["seconds"] += time.perf_counter() - started
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                key: sum(stats[key] for stats in self.nodes.values())
+                for key in ("llm_calls", "input_tokens", "output_tokens")
+            }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return (
+        ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+    )
+
+
+async def measure(
+    app, queries: List[str], concurrency: int, embeddings: FakeEmbeddings
+) -> Dict[str, Any]:
+    """Runs `queries` through the graph, at most `concurrency` at a time."""
+    profiler = NodeProfiler()
+    embeddings.reset()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run_query(query: str) -> bool:
+        async with semaphore:
+            started = time.perf_counter()
+            final_state = await app.ainvoke(
+                build_initial_state(query),
+                config={
+                    "recursion_limit": GRAPH_RECURSION_LIMIT,
+                    "callbacks": [profiler],
+                },
+            )
+            latencies.append(time.perf_counter() - started)
+            return bool(final_state.get("report_formatted"))
+
+    started = time.perf_counter()
+    answered = await asyncio.gather(*(run_query(query) for query in queries))
+    wall_seconds = time.perf_counter() - started
+
+    totals = profiler.totals()
+    count = len(queries)
+    return {
+        "queries": count,
+        "answered": sum(answered),
+        "wall_seconds": wall_seconds,
+        "throughput_qpm": count / wall_seconds * 60,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+        "llm_calls_per_query": totals["llm_calls"] / count,
+        "input_tokens_per_query": totals["input_tokens"] / count,
+        "output_tokens_per_query": totals["output_tokens"] / count,
+        "embed_calls_per_query": embeddings.stats()["calls"] / count,
+        "nodes": {
+            node: {
+                "calls": stats["calls"],
+                "mean_ms": stats["seconds"] / stats["calls"] * 1000
+                if stats["calls"]
+                else 0.0,
+                "llm_calls": stats["llm_calls"],
+                "tokens": stats["input_tokens"] + stats["output_tokens"],
+            }
+            for node, stats in sorted(profiler.nodes.items())
+        },
+    }
+
+
+def configure(workdir: Path, overrides: List[str]):
+    """
+    Points the knowledge base at `workdir`, keeps caches in memory and turns
+    off the LLM response cache (it would replay answers across measurements),
+    then applies `section.KEY=<json>` overrides to the in-process config.
+    """
+    config = load_config()
+    config["knowledge_base"].update(
+        {
+            "CHROMA_DB_DIR": str(workdir / "chroma_db"),
+            "RAW_DOCS_DIR": str(workdir / "data"),
+            "MANIFEST_PATH": str(workdir / "ingest_manifest.json"),
+            "BM25_INDEX_PATH": str(workdir / "chroma_db" / "bm25_index.sqlite3"),
+            "NEAR_DUPLICATE_INDEX_PATH": str(
+                workdir / "chroma_db" / "near_duplicate_index.sqlite3"
+            ),
+        }
+    )
+    config.setdefault("cache_config", {}).update(
+        {
+            "LLM_CACHE_ENABLED": False,
+            "LLM_CACHE_BACKEND": "memory",
+            "EMBEDDING_CACHE_BACKEND": "memory",
+        }
+    )
+    for override in overrides:
+        path, _, value = override.partition("=")
+        section, _, key = path.partition(".")
+        if not key:
+            raise SystemExit(f"Invalid --set '{override}', expected section.KEY=<json>")
+        config.setdefault(section, {})[key] = json.loads(value)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> int:
+    """Prints the change of each metric against the baseline; returns the regression count."""
+    if baseline.get("settings") != results["settings"]:
+        print("\nWarning: baseline was recorded with different settings:")
+        print(f"  baseline: {baseline.get('settings')}")
+        print(f"  current:  {results['settings']}")
+
+    regressions = 0
+    print(
+        f"\n{'scenario':<18}{'conc':>5}  {'metric':<26}{'baseline':>12}{'current':>12}{'change':>9}"
+    )
+    for scenario, levels in results["scenarios"].items():
+        for level, current in levels.items():
+            previous = baseline.get("scenarios", {}).get(scenario, {}).get(level)
+            if previous is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                before, after = previous.get(metric), current[metric]
+                if not before:
+                    continue
+                change = (after - before) / before
+                regressed = (-change if higher_is_better else change) > tolerance
+                regressions += regressed
+                print(
+                    f"{scenario:<18}{level:>5}  {metric:<26}{before:>12.1f}{after:>12.1f}"
+                    f"{change:>+9.1%}{'  REGRESSION' if regressed else ''}"
+                )
+    return regressions
+
+
+def print_report(results: Dict[str, Any]):
+    print(
+        f"\n{'scenario':<18}{'conc':>5}{'q/min':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'llm/q':>7}{'tok in/q':>10}{'tok out/q':>10}{'embed/q':>9}"
+    )
+    for scenario, levels in results["scenarios"].items():
+        for level, result in levels.items():
+            print(
+                f"{scenario:<18}{level:>5}{result['throughput_qpm']:>9.1f}"
+                f"{result['latency_p50_ms']:>9.0f}{result['latency_p95_ms']:>9.0f}"
+                f"{result['llm_calls_per_query']:>7.2f}{result['input_tokens_per_query']:>10.0f}"
+                f"{result['output_tokens_per_query']:>10.0f}{result['embed_calls_per_query']:>9.2f}"
+            )
+
+    for scenario, levels in results["scenarios"].items():
+        level, result = next(iter(levels.items()))
+        print(f"\nPer node, {scenario} at concurrency {level}:")
+        print(
+            f"  {'node':<22}{'calls/q':>9}{'mean ms':>10}{'llm/q':>8}{'tokens/q':>10}"
+        )
+        for node, stats in result["nodes"].items():
+            print(
+                f"  {node:<22}{stats['calls'] / result['queries']:>9.2f}{stats['mean_ms']:>10.1f}"
+                f"{stats['llm_calls'] / result['queries']:>8.2f}{stats['tokens'] / result['queries']:>10.0f}"
+            )
+
+
+async def run_scenarios(
+    app, args, products: List[str], embeddings: FakeEmbeddings
+) -> Dict[str, Any]:
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    for scenario in args.scenarios:
+        scenarios[scenario] = {}
+        for position, level in enumerate(args.levels):
+            # Fresh queries per measurement, so caches filled by one
+            # measurement do not flatter the next.
+            queries = scenario_queries(
+                scenario, products, args.queries, offset=position * args.queries
+            )
+            scenarios[scenario][str(level)] = await measure(
+                app, queries, level, embeddings
+            )
+            print(f"  {scenario} at concurrency {level} done", file=sys.stderr)
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--levels", nargs="+", type=int, default=[1, 4, 16], help="Concurrency levels."
+    )
+    parser.add_argument(
+        "--queries", type=int, default=24, help="Queries per scenario and level."
+    )
+    parser.add_argument(
+        "--products", type=int, default=40, help="Products in the synthetic KB."
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=5.0)
+    parser.add_argument("--answer-tokens", type=int, default=200)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--set",
+        dest="overrides",
+        action="append",
+        default=[],
+        metavar="section.KEY=JSON",
+        help="Override a config value for this run, e.g. agent_config.MAX_RETRIEVAL_ATTEMPTS=3.",
+    )
+    parser.add_argument("--baseline", help="Baseline JSON to compare against.")
+    parser.add_argument(
+        "--save-baseline", help="Write the results to this baseline JSON."
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="Allowed relative regression."
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the raw results as JSON."
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Keep the agents' console output."
+    )
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="rag-agent-benchmark-"))
+    quiet = (
+        contextlib.nullcontext()
+        if args.verbose
+        else contextlib.redirect_stdout(open(os.devnull, "w"))
+    )
+    try:
+        configure(workdir, args.overrides)
+        embeddings = FakeEmbeddings(latency_ms=args.embed_latency_ms)
+        set_clients(
+            llm=FakeChatModel(
+                latency_ms=args.llm_latency_ms,
+                ms_per_token=args.llm_ms_per_token,
+                answer_tokens=args.answer_tokens,
+            ),
+            embeddings=with_embedding_cache(embeddings, "fake-benchmark-embeddings"),
+        )
+        products = product_names(args.products)
+        with quiet:
+            chunks = build_synthetic_knowledge_base(products)
+            app = get_rag_agent_workflow()
+            scenarios = asyncio.run(run_scenarios(app, args, products, embeddings))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "settings": {
+            "queries": args.queries,
+            "products": args.products,
+            "chunks": chunks,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_ms_per_token": args.llm_ms_per_token,
+            "answer_tokens": args.answer_tokens,
+            "embed_latency_ms": args.embed_latency_ms,
+            "overrides": sorted(args.overrides),
+        },
+        "scenarios": scenarios,
+    }
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2) + "\n")
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    regressions = 0
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Deterministic local stand-ins for the Gemini LLM and embeddings, so the agent
+graph can be benchmarked without network calls. Latency is simulated with
+`sleep`, and token counts use the same local estimate as context packing.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.retrieval.context_packer import STOPWORDS, estimate_tokens
+
+WORD = re.compile(r"[a-z0-9][a-z0-9\-]*")
+ORIGINAL_QUERY = re.compile(r'original query is: "(.*?)"', re.DOTALL)
+SUB_QUERY = re.compile(r'Sub-query: "(.*?)"')
+EVALUATION_CHUNKS = re.compile(
+    r"Retrieved Chunks:\n(.*?)\n\s*Based on the content", re.DOTALL
+)
+BATCH_BLOCK = re.compile(
+    r'### Sub-query (\d+): "(.*?)"\nRetrieved Chunks:\n(.*?)(?=\n\n### Sub-query \d+:|\n\nIf the chunks|\Z)',
+    re.DOTALL,
+)
+# Clause boundaries: commas, semicolons, "?" and "and" before a new question.
+SUB_QUERY_SPLIT = re.compile(
+    r",\s*(?:and\s+)?|;|\?\s+|\s+and\s+(?=(?:how|what|which|when|where|why|can|do|does|is)\b)",
+    re.IGNORECASE,
+)
+ANSWER_WORDS = (
+    "the unit supports this according to the manual please follow steps "
+    "listed for your model and contact support if the issue persists"
+).split()
+
+
+def content_words(text: str) -> List[str]:
+    return [
+        word
+        for word in WORD.findall(text.lower())
+        if word not in STOPWORDS and len(word) > 2
+    ]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers each agent prompt the way the agent expects:
+    sub-query JSON for the research agent, SUFFICIENCY verdicts (single or
+    batched JSON) for the evaluator, a one-line rewrite for the retry
+    strategy, and an `answer_tokens`-token answer for everything else.
+
+    A sub-query is judged sufficient when at least `sufficiency_overlap` of its
+    content words appear in its chunks, so queries about things missing from
+    the knowledge base exercise the retry loop. Each call sleeps
+    `latency_ms + ms_per_token * completion_tokens`.
+    """
+
+    latency_ms: float = 300.0
+    ms_per_token: float = 5.0
+    answer_tokens: int = 200
+    sufficiency_overlap: float = 0.75
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "ms_per_token": self.ms_per_token,
+            "answer_tokens": self.answer_tokens,
+        }
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = self._prompt(messages)
+        text = self.respond(prompt)
+        time.sleep(self._latency_seconds(text))
+        return self._result(prompt, text)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = self._prompt(messages)
+        text = self.respond(prompt)
+        await asyncio.sleep(self._latency_seconds(text))
+        return self._result(prompt, text)
+
+    def respond(self, prompt: str) -> str:
+        if "break down a complex user query" in prompt:
+            match = ORIGINAL_QUERY.search(prompt)
+            return json.dumps(self._split_query(match.group(1) if match else ""))
+
+        if "### Sub-query 1:" in prompt:
+            return json.dumps(
+                [
+                    self._batch_verdict(int(number), sub_query, chunks)
+                    for number, sub_query, chunks in BATCH_BLOCK.findall(prompt)
+                ]
+            )
+
+        if "Rewrite the sub-query" in prompt:
+            match = SUB_QUERY.search(prompt)
+            return f"{match.group(1) if match else ''} specifications troubleshooting"
+
+        if "SUFFICIENCY:" in prompt:
+            sub_query = SUB_QUERY.search(prompt)
+            chunks = EVALUATION_CHUNKS.search(prompt)
+            if self._sufficient(
+                sub_query.group(1) if sub_query else "",
+                chunks.group(1) if chunks else "",
+            ):
+                return "SUFFICIENCY: YES\nFEEDBACK:"
+            return "SUFFICIENCY: NO\nFEEDBACK: more details on the product needed"
+
+        return self._answer()
+
+    def _split_query(self, query: str) -> List[str]:
+        parts = [part.strip(" ?.") for part in SUB_QUERY_SPLIT.split(query)]
+        parts = [part for part in parts if len(part.split()) >= 3]
+        return parts or [query]
+
+    def _sufficient(self, sub_query: str, chunks: str) -> bool:
+        words = content_words(sub_query)
+        if not words or not chunks.strip():
+            return False
+        chunk_words = set(content_words(chunks))
+        return (
+            sum(word in chunk_words for word in words) / len(words)
+            >= self.sufficiency_overlap
+        )
+
+    def _batch_verdict(
+        self, number: int, sub_query: str, chunks: str
+    ) -> Dict[str, Any]:
+        if self._sufficient(sub_query, chunks):
+            return {"id": number, "sufficient": True, "feedback": ""}
+        return {
+            "id": number,
+            "sufficient": False,
+            "feedback": "more details on the product needed",
+        }
+
+    def _answer(self) -> str:
+        words = []
+        while estimate_tokens(" ".join(words)) < self.answer_tokens:
+            words.append(ANSWER_WORDS[len(words) % len(ANSWER_WORDS)])
+        return " ".join(words)
+
+    def _latency_seconds(self, text: str) -> float:
+        return (self.latency_ms + self.ms_per_token * estimate_tokens(text)) / 1000
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(
+            message.content
+            if isinstance(message.content, str)
+            else str(message.content)
+            for message in messages
+        )
+
+    @staticmethod
+    def _result(prompt: str, text: str) -> ChatResult:
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors: texts sharing words get similar vectors, so
+    dense retrieval behaves plausibly on the synthetic knowledge base. Vectors
+    are non-negative and L2-normalised, like real embedding models, so Chroma's
+    distance-based relevance scores stay within [0, 1]. Each call sleeps
+    `latency_ms`; calls and embedded texts are counted.
+    """
+
+    def __init__(self, dimensions: int = 256, latency_ms: float = 20.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "texts": 0}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(len(texts))
+        time.sleep(self.latency_ms / 1000)
+        return [normalize(self._vector(text)) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(len(texts))
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [normalize(self._vector(text)) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {"calls": 0, "texts": 0}
+
+    def _count(self, texts: int):
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["texts"] += texts
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in WORD.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        if not any(vector):
+            vector[0] = 1.0
+        return vector
+
+
+def normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
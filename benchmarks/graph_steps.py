@@ -0,0 +1,155 @@
+"""
+Step count and per-step overhead of the agent graph topology, with and
+without the supervisor hop. The agents are replaced by scripted nodes that
+replay the routing of a sequential run (each sub-query is retried `--retries`
+times before it is accepted), so only the graph framework cost is measured.
+
+    python -m benchmarks.graph_steps --sub-queries 3 --retries 1 --runs 200
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List, TypedDict
+
+from langgraph.graph import END, StateGraph
+
+AGENTS = (
+    "research_agent",
+    "retriever_agent",
+    "evaluator_agent",
+    "synthesizer_agent",
+    "formatter_agent",
+)
+
+
+class BenchmarkState(TypedDict, total=False):
+    sub_queries: int
+    retries: int
+    current_sub_query_index: int
+    retrieval_attempts: int
+    retrieved_chunks: List[str]
+    next_agent_to_call: str
+
+
+def scripted_agents(chunks_per_retrieval: int) -> Dict[str, Callable]:
+    """No-op agents that return the same routing decisions as the real ones."""
+
+    def research(state: BenchmarkState) -> BenchmarkState:
+        if state["current_sub_query_index"] >= state["sub_queries"]:
+            return {"next_agent_to_call": "synthesizer_agent"}
+        return {"retrieval_attempts": 0, "next_agent_to_call": "retriever_agent"}
+
+    def retriever(state: BenchmarkState) -> BenchmarkState:
+        return {
+            "retrieval_attempts": state["retrieval_attempts"] + 1,
+            "retrieved_chunks": ["x" * 1000] * chunks_per_retrieval,
+            "next_agent_to_call": "evaluator_agent",
+        }
+
+    def evaluator(state: BenchmarkState) -> BenchmarkState:
+        if state["retrieval_attempts"] <= state["retries"]:
+            return {"next_agent_to_call": "retriever_agent"}
+        return {
+            "current_sub_query_index": state["current_sub_query_index"] + 1,
+            "next_agent_to_call": "research_agent",
+        }
+
+    def synthesizer(state: BenchmarkState) -> BenchmarkState:
+        return {"next_agent_to_call": "formatter_agent"}
+
+    def formatter(state: BenchmarkState) -> BenchmarkState:
+        return {"next_agent_to_call": "END"}
+
+    return dict(zip(AGENTS, (research, retriever, evaluator, synthesizer, formatter)))
+
+
+def route(state: BenchmarkState) -> str:
+    return state["next_agent_to_call"]
+
+
+def build_supervisor_graph(agents: Dict[str, Callable]):
+    """The previous topology: every agent returns to a pass-through supervisor node."""
+    workflow = StateGraph(BenchmarkState)
+    workflow.add_node(
+        "supervisor", lambda state: {"next_agent_to_call": state["next_agent_to_call"]}
+    )
+    for name, agent in agents.items():
+        workflow.add_node(name, agent)
+        workflow.add_edge(name, "supervisor")
+    workflow.set_entry_point("supervisor")
+    workflow.add_conditional_edges(
+        "supervisor", route, {**{name: name for name in agents}, "END": END}
+    )
+    return workflow.compile()
+
+
+def build_direct_graph(agents: Dict[str, Callable]):
+    """The current topology: every agent routes straight to its successor."""
+    workflow = StateGraph(BenchmarkState)
+    routes = {**{name: name for name in agents}, "END": END}
+    for name, agent in agents.items():
+        workflow.add_node(name, agent)
+        workflow.add_conditional_edges(name, route, routes)
+    workflow.set_conditional_entry_point(route, routes)
+    return workflow.compile()
+
+
+def measure(app, initial_state: BenchmarkState, runs: int) -> Dict[str, float]:
+    config = {"recursion_limit": 10_000}
+    steps = sum(
+        1 for _ in app.stream(initial_state, config=config, stream_mode="updates")
+    )
+
+    app.invoke(initial_state, config=config)  # warm-up
+    started = time.perf_counter()
+    for _ in range(runs):
+        app.invoke(initial_state, config=config)
+    seconds_per_run = (time.perf_counter() - started) / runs
+
+    return {
+        "steps": steps,
+        "ms_per_run": seconds_per_run * 1000,
+        "us_per_step": seconds_per_run / steps * 1_000_000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sub-queries", type=int, default=3)
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--chunks", type=int, default=5, help="Chunks per retrieval.")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    agents = scripted_agents(args.chunks)
+    initial_state: BenchmarkState = {
+        "sub_queries": args.sub_queries,
+        "retries": args.retries,
+        "current_sub_query_index": 0,
+        "retrieval_attempts": 0,
+        "retrieved_chunks": [],
+        "next_agent_to_call": "research_agent",
+    }
+
+    results = {
+        "supervisor hop": measure(
+            build_supervisor_graph(agents), initial_state, args.runs
+        ),
+        "direct edges": measure(build_direct_graph(agents), initial_state, args.runs),
+    }
+
+    print(f"{'topology':<16}{'steps':>8}{'ms/run':>10}{'us/step':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<16}{result['steps']:>8}{result['ms_per_run']:>10.2f}{result['us_per_step']:>10.1f}"
+        )
+    before, after = results["supervisor hop"], results["direct edges"]
+    print(
+        f"\nSteps per run: {before['steps']} -> {after['steps']} "
+        f"({1 - after['steps'] / before['steps']:.0%} fewer); "
+        f"time per run: {1 - after['ms_per_run'] / before['ms_per_run']:.0%} lower."
+    )
+
+
+if __name__ == "__main__":
+    main()
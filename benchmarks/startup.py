@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark: import time, knowledge base readiness check and first
+graph build, each measured in a fresh interpreter so module caches do not
+hide the cost. Reports the median over `--runs` interpreters and the peak
+resident memory of the child process.
+
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from src.constants import BASE_DIR
+
+CHILD = """
+import json, resource, time
+timings = {}
+def stage(name, fn):
+    started = time.perf_counter()
+    fn()
+    timings[name] = time.perf_counter() - started
+try:
+    stage("import_app", lambda: __import__("app.main"))
+    from src.utils.db_utils import knowledge_base_status
+    stage("knowledge_base_status", knowledge_base_status)
+    from src.graph.agent_workflow import get_rag_agent_workflow
+    stage("build_graph", get_rag_agent_workflow)
+except Exception as e:
+    timings["error"] = repr(e)
+timings["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print("BENCHMARK " + json.dumps(timings))
+"""
+
+STAGES = ("import_app", "knowledge_base_status", "build_graph")
+
+
+def run_child() -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    line = next(
+        line for line in completed.stdout.splitlines() if line.startswith("BENCHMARK ")
+    )
+    return json.loads(line[len("BENCHMARK ") :])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--json", action="store_true", help="Print the raw results as JSON."
+    )
+    args = parser.parse_args()
+
+    results = [run_child() for _ in range(args.runs)]
+    errors = {result["error"] for result in results if "error" in result}
+
+    summary = {
+        stage: statistics.median(result[stage] for result in results if stage in result)
+        for stage in STAGES
+        if any(stage in result for result in results)
+    }
+    summary["peak_rss_mb"] = statistics.median(
+        result["peak_rss_mb"] for result in results
+    )
+
+    if args.json:
+        print(
+            json.dumps({"runs": args.runs, "median": summary, "errors": sorted(errors)})
+        )
+        return
+
+    print(f"Median over {args.runs} fresh interpreters:")
+    for stage in STAGES:
+        if stage in summary:
+            print(f"  {stage:<24}{summary[stage] * 1000:>10.1f} ms")
+    print(f"  {'peak_rss':<24}{summary['peak_rss_mb']:>10.1f} MB")
+    for error in sorted(errors):
+        print(f"  stopped early: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Synthetic customer-support knowledge base and benchmark queries. Products and
+their manual chunks are generated from templates with a seeded RNG, so every
+run indexes the same documents and asks the same questions.
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.hybrid_retriever import get_bm25_index_path
+from src.utils.db_utils import get_vector_db
+
+BRANDS = ("AquaPure", "QuantumFlow", "ClearStream", "HydroMax", "PureWave", "Crystalis")
+# Products that are never indexed, for queries the knowledge base cannot answer.
+UNKNOWN_BRANDS = ("Orbitron", "Velora", "Kestrel")
+
+# topic -> (question, manual chunk). Each chunk contains the content words
+# of its question, so a good retrieval is judged sufficient.
+TOPICS: Dict[str, Tuple[str, str]] = {
+    "warranty": (
+        "what is the warranty period for the {product}",
+        "The warranty period for the {product} is {years} years from the date of purchase. "
+        "The limited warranty covers manufacturing defects in parts and labour. Register "
+        "the {product} online within 30 days to activate the warranty.",
+    ),
+    "installation": (
+        "how do I install the {product}",
+        "To install the {product}, shut off the cold water supply, mount the bracket under "
+        "the sink and connect the inlet hose. Installation takes about {minutes} minutes. "
+        "Open the supply valve and check the {product} for leaks after you install it.",
+    ),
+    "filter": (
+        "what is the filter replacement schedule for the {product}",
+        "The filter replacement schedule for the {product}: replace the sediment filter every "
+        "{months} months and the carbon filter every {long_months} months. The indicator on the "
+        "{product} turns red when a filter replacement is due.",
+    ),
+    "leak": (
+        "how do I fix a water leak on the {product}",
+        "To fix a water leak on the {product}, check that the hoses are fully inserted and the "
+        "filter housings are tight. Replace worn O-rings if the leak persists, and keep the "
+        "{product} switched off until the water leak is fixed.",
+    ),
+    "odor": (
+        "why does water from the {product} have a strange taste or odor",
+        "A strange taste or odor in water from the {product} usually means the carbon filter "
+        "is exhausted. Flush the {product} for five minutes and replace the carbon filter to "
+        "remove the taste and odor.",
+    ),
+    "capacity": (
+        "what is the storage capacity of the {product}",
+        "The storage capacity of the {product} is {litres} litres. The {product} refills its "
+        "storage tank in about {minutes} minutes.",
+    ),
+    "wifi": (
+        "how do I connect the {product} to Wi-Fi",
+        "To connect the {product} to Wi-Fi, open the companion app, hold the Wi-Fi button on "
+        "the {product} for five seconds and select your 2.4 GHz network.",
+    ),
+}
+
+SCENARIOS = ("single_hop", "multi_sub_query", "retry_heavy")
+
+
+def sentence(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+def product_names(count: int, seed: int = 7, brands=BRANDS) -> List[str]:
+    rng = random.Random(seed)
+    names = []
+    while len(names) < count:
+        brand = brands[len(names) % len(brands)]
+        name = f"{brand} {brand[:2].upper()}-{rng.randint(100, 999)}"
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def generate_documents(
+    products: List[str], seed: int = 7
+) -> Tuple[List[str], List[Document]]:
+    """One chunk per product and topic, plus a product overview chunk."""
+    rng = random.Random(seed)
+    ids, documents = [], []
+    for product in products:
+        slug = product.lower().replace(" ", "-")
+        values = {
+            "product": product,
+            "years": rng.randint(1, 5),
+            "minutes": rng.choice((20, 30, 45, 60)),
+            "months": rng.choice((3, 6)),
+            "long_months": rng.choice((9, 12)),
+            "litres": rng.choice((5, 8, 12, 20)),
+        }
+        chunks = {topic: chunk for topic, (_, chunk) in TOPICS.items()}
+        chunks["overview"] = (
+            "The {product} is a reverse osmosis water purifier for home use. This manual "
+            "covers setup, maintenance, troubleshooting and warranty terms for the {product}."
+        )
+        for topic, chunk in chunks.items():
+            ids.append(f"{slug}-{topic}")
+            documents.append(
+                Document(
+                    page_content=chunk.format(**values),
+                    metadata={
+                        "source": f"synthetic/{slug}.md",
+                        "product": product,
+                        "topic": topic,
+                    },
+                )
+            )
+    return ids, documents
+
+
+def build_synthetic_knowledge_base(products: List[str], seed: int = 7) -> int:
+    """
+    Indexes the synthetic documents into the configured Chroma collection and
+    BM25 index (point `knowledge_base` in the config at a scratch directory
+    first). Returns the number of chunks written.
+    """
+    ids, documents = generate_documents(products, seed)
+    get_vector_db().add_documents(documents, ids=ids)
+    bm25_index = BM25Index(get_bm25_index_path())
+    bm25_index.add(ids, documents)
+    bm25_index.save()
+    return len(ids)
+
+
+def scenario_queries(
+    scenario: str, products: List[str], count: int, offset: int = 0
+) -> List[str]:
+    """
+    `count` distinct queries for a scenario, starting at `offset` so different
+    measurements do not hit each other's caches:
+
+    - single_hop: one short question about an indexed product (routed past
+      decomposition);
+    - multi_sub_query: three questions about one product in a single query;
+    - retry_heavy: a question about a product that is not indexed, so every
+      retrieval is judged insufficient until the retry budget runs out.
+    """
+    topics = list(TOPICS)
+    unknown_products = product_names(len(products), seed=11, brands=UNKNOWN_BRANDS)
+    queries = []
+    for index in range(offset, offset + count):
+        product = products[index % len(products)]
+        topic = topics[(index // len(products)) % len(topics)]
+        if scenario == "single_hop":
+            queries.append(sentence(TOPICS[topic][0].format(product=product)) + "?")
+        elif scenario == "multi_sub_query":
+            first, second, third = (
+                TOPICS[topics[(topics.index(topic) + step) % len(topics)]][0].format(
+                    product=product
+                )
+                for step in range(3)
+            )
+            queries.append(f"{sentence(first)} and {second}, and {third}?")
+        elif scenario == "retry_heavy":
+            product = unknown_products[index % len(unknown_products)]
+            queries.append(sentence(TOPICS[topic][0].format(product=product)) + "?")
+        else:
+            raise ValueError(
+                f"Unknown scenario '{scenario}', expected one of {SCENARIOS}."
+            )
+    return queries
@@ -1,5 +1,12 @@
+import argparse
+import asyncio
+
+from src.cache.semantic_cache import get_semantic_cache, is_cacheable_answer
+from src.config import ConfigurationManager
+from src.constants import DEFAULT_BATCH_CONCURRENCY, GRAPH_RECURSION_LIMIT
 from src.graph.agent_workflow import create_rag_agent_workflow
-from src.models import AgentState
+from src.graph.batch_runner import run_batch_file
+from src.models import build_initial_state
 
 
 def run_agent(query: str):
@@ -7,32 +14,31 @@ def run_agent(query: str):
     Initializes and runs the RAG agent workflow for a given query.
     """
 
+    semantic_cache = get_semantic_cache()
+    cache_lookup = semantic_cache.lookup(query) if semantic_cache else None
+    if cache_lookup is not None and cache_lookup.hit:
+        print(
+            f"\n--- Semantic cache hit (similarity {cache_lookup.similarity:.3f}) for: '{cache_lookup.matched_query}' ---\n"
+        )
+        print("\n--- FINAL ANSWER ---\n")
+        print(cache_lookup.answer)
+        return cache_lookup.answer
+
     rag_app = create_rag_agent_workflow()
 
-    # Define the initial state for the graph
-    initial_state: AgentState = {
-        "original_query": query,
-        "sub_queries_list": [],
-        "current_sub_query_index": 0,
-        "current_sub_query": "",
-        "retrieved_chunks": [],
-        "evaluated_sufficiency": False,
-        "evaluator_feedback": "",
-        "retrieval_attempts": 0,
-        "accumulated_relevant_chunks": [],
-        "unanswerable_sub_queries": [],
-        "final_answer_draft": "",
-        "report_formatted": "",
-        "next_agent_to_call": "research_agent",  # Initial state to start the process
-    }
+    initial_state = build_initial_state(query)
 
     print(f"\n--- Starting RAG Agent for query: '{query}' ---\n")
 
-    final_state = rag_app.invoke(initial_state, config={"recursion_limit": 200})
+    final_state = rag_app.invoke(
+        initial_state, config={"recursion_limit": GRAPH_RECURSION_LIMIT}
+    )
 
     print("\n--- RAG Agent Workflow Completed ---\n")
 
     if final_state.get("report_formatted"):
+        if cache_lookup is not None and is_cacheable_answer(final_state):
+            semantic_cache.store(query, final_state["report_formatted"], cache_lookup)
         print("\n--- FINAL ANSWER ---\n")
         print(final_state["report_formatted"])
         return final_state["report_formatted"]
@@ -42,11 +48,50 @@ def run_agent(query: str):
         return "An error occurred and no final answer could be generated."
 
 
-if __name__ == "__main__":
+def run_batch(input_path: str, output_path: str, concurrency: int, use_cache: bool):
+    """
+    Answers a JSONL file of queries, writing results to `output_path` as they
+    complete. Re-running with the same output resumes where it stopped.
+    """
+    stats = asyncio.run(run_batch_file(input_path, output_path, concurrency, use_cache))
+    print("\n--- Batch Completed ---\n")
+    print(
+        f"{stats['completed']} results ({stats['errors']} errors, {stats['cached']} cached, "
+        f"{stats['duplicates']} duplicates) in {stats['seconds']:.1f}s, "
+        f"{stats['queries_per_minute']:.1f} queries/min"
+    )
+    return stats
+
 
-    user_query = "What is the warranty period for the QuantumFlow QF-2025"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the RAG agent.")
+    parser.add_argument(
+        "query",
+        nargs="?",
+        default="What is the warranty period for the QuantumFlow QF-2025",
+    )
+    parser.add_argument("--batch", help="JSONL file of queries to answer in bulk.")
+    parser.add_argument(
+        "--output",
+        default="batch_results.jsonl",
+        help="Results file for --batch (.jsonl or .parquet).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=ConfigurationManager()
+        .get_server_config()
+        .get("BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY),
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Skip the semantic answer cache."
+    )
+    args = parser.parse_args()
 
-    run_agent(user_query)
+    if args.batch:
+        run_batch(args.batch, args.output, args.concurrency, not args.no_cache)
+    else:
+        run_agent(args.query)
 
     print(
         "\n\nRemember to define your GOOGLE_API_KEY in a .env file at the project root."
@@ -1,12 +1,16 @@
+import asyncio
+import json
+import re
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from langchain.prompts import PromptTemplate
-from langchain_core.documents import Document
 
+from src.cache.llm_cache import with_response_cache
 from src.constants import BASE_DIR, MAX_RETRIEVAL_ATTEMPTS
-from src.llm_config import LLM
-from src.models import AgentState
+from src.llm_config import get_llm
+from src.models import AgentState, resolve_chunks
+from src.retrieval.relevance_gate import get_relevance_gate
 from src.utils.common import read_txt
 
 
@@ -17,7 +21,8 @@ class EvaluatorAgent:
     """
 
     def __init__(self):
-        self.llm = LLM
+        self.llm = with_response_cache(get_llm(), "evaluator_agent")
+        self.relevance_gate = get_relevance_gate()
         raw_prompt = read_txt(Path(BASE_DIR) / "prompts" / "evaluator_agent_prompt.txt")
         self.prompt_template = PromptTemplate(
             template=raw_prompt,
@@ -28,70 +33,262 @@ class EvaluatorAgent:
                 }
             ],
         )
+        raw_batch_prompt = read_txt(
+            Path(BASE_DIR) / "prompts" / "batch_evaluator_prompt.txt"
+        )
+        self.batch_prompt_template = PromptTemplate(
+            template=raw_batch_prompt, input_variables=["sub_queries_content"]
+        )
 
     def run(self, state: AgentState) -> AgentState:
         """
         Evaluates the retrieved chunks and decides whether they are sufficient.
         Manages retry logic.
         """
+        local_verdict = self._local_verdict(state)
+        if local_verdict is not None:
+            return self._route(state, *local_verdict)
+        chain_inputs = self._prepare_inputs(state)
+        try:
+            chain = self.prompt_template | self.llm
+            response = chain.invoke(chain_inputs)
+        except Exception as e:
+            return self._handle_error(state, e)
+        return self._route(state, *self._parse_response(response))
+
+    async def arun(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `run` that awaits the LLM call instead of blocking.
+        """
+        local_verdict = self._local_verdict(state)
+        if local_verdict is not None:
+            return self._route(state, *local_verdict)
+        chain_inputs = self._prepare_inputs(state)
+        try:
+            chain = self.prompt_template | self.llm
+            response = await chain.ainvoke(chain_inputs)
+        except Exception as e:
+            return self._handle_error(state, e)
+        return self._route(state, *self._parse_response(response))
+
+    def evaluate_batch(self, states: List[AgentState]) -> List[AgentState]:
+        """
+        Evaluates several sub-queries' retrieved chunks with one structured LLM
+        call and returns the routing update for each state. Sub-queries the
+        batch response does not cover are evaluated individually.
+        """
+        verdicts, pending = self._start_batch(states)
+        if len(pending) > 1:
+            try:
+                chain = self.batch_prompt_template | self.llm
+                response = chain.invoke(self._prepare_batch_inputs(states, pending))
+                verdicts.update(self._parse_batch_response(response, pending))
+            except Exception as e:
+                print(
+                    f"---WARNING: Batch evaluation failed, evaluating individually: {e}---"
+                )
+
+        for index in pending:
+            if index not in verdicts:
+                verdicts[index] = self._evaluate_single(states[index])
+        return [
+            self._route(state, *verdicts[index]) for index, state in enumerate(states)
+        ]
+
+    async def aevaluate_batch(self, states: List[AgentState]) -> List[AgentState]:
+        """
+        Async variant of `evaluate_batch`; individual fallbacks run concurrently.
+        """
+        verdicts, pending = self._start_batch(states)
+        if len(pending) > 1:
+            try:
+                chain = self.batch_prompt_template | self.llm
+                response = await chain.ainvoke(
+                    self._prepare_batch_inputs(states, pending)
+                )
+                verdicts.update(self._parse_batch_response(response, pending))
+            except Exception as e:
+                print(
+                    f"---WARNING: Batch evaluation failed, evaluating individually: {e}---"
+                )
+
+        fallbacks = [index for index in pending if index not in verdicts]
+        results = await asyncio.gather(
+            *(self._aevaluate_single(states[index]) for index in fallbacks)
+        )
+        verdicts.update(zip(fallbacks, results))
+        return [
+            self._route(state, *verdicts[index]) for index, state in enumerate(states)
+        ]
+
+    def _start_batch(
+        self, states: List[AgentState]
+    ) -> Tuple[Dict[int, Tuple[bool, str]], List[int]]:
+        verdicts: Dict[int, Tuple[bool, str]] = {}
+        pending: List[int] = []
+        for index, state in enumerate(states):
+            local_verdict = self._local_verdict(state)
+            if local_verdict is None:
+                pending.append(index)
+            else:
+                verdicts[index] = local_verdict
+        print(
+            f"---EVALUATOR AGENT: Batch of {len(states)} sub-queries, {len(pending)} need LLM evaluation---"
+        )
+        return verdicts, pending
+
+    def _evaluate_single(self, state: AgentState) -> Tuple[bool, str]:
+        try:
+            chain = self.prompt_template | self.llm
+            return self._parse_response(chain.invoke(self._prepare_inputs(state)))
+        except Exception as e:
+            print(f"---ERROR: Evaluator agent failed during LLM call: {e}---")
+            return False, "LLM evaluation failed. Assuming insufficient for retry."
+
+    async def _aevaluate_single(self, state: AgentState) -> Tuple[bool, str]:
+        try:
+            chain = self.prompt_template | self.llm
+            return self._parse_response(
+                await chain.ainvoke(self._prepare_inputs(state))
+            )
+        except Exception as e:
+            print(f"---ERROR: Evaluator agent failed during LLM call: {e}---")
+            return False, "LLM evaluation failed. Assuming insufficient for retry."
+
+    def _prepare_batch_inputs(
+        self, states: List[AgentState], pending: List[int]
+    ) -> Dict[str, str]:
+        blocks = []
+        for number, index in enumerate(pending, start=1):
+            inputs = self._prepare_inputs(states[index])
+            blocks.append(
+                f'### Sub-query {number}: "{inputs["current_sub_query"]}"\n'
+                f"Retrieved Chunks:\n{inputs['retrieved_chunks_content']}"
+            )
+        return {"sub_queries_content": "\n\n".join(blocks)}
+
+    def _parse_batch_response(
+        self, response, pending: List[int]
+    ) -> Dict[int, Tuple[bool, str]]:
+        """
+        Maps the JSON verdict list back to state indices. Malformed or missing
+        items are left out so the caller can evaluate them individually.
+        """
+        cleaned_content = re.sub(
+            r"^```(?:json)?\s*|\s*```$",
+            "",
+            response.content.strip(),
+            flags=re.MULTILINE,
+        )
+        try:
+            items = json.loads(cleaned_content)
+            if not isinstance(items, list):
+                raise ValueError("LLM response is not a JSON list.")
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"---WARNING: Invalid batch evaluation response: {e}---")
+            return {}
+
+        verdicts: Dict[int, Tuple[bool, str]] = {}
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(
+                item.get("sufficient"), bool
+            ):
+                continue
+            number = item.get("id")
+            if not isinstance(number, int) or not 1 <= number <= len(pending):
+                continue
+            feedback = str(item.get("feedback") or "").strip()
+            if item["sufficient"]:
+                verdicts[pending[number - 1]] = (True, "")
+            else:
+                verdicts[pending[number - 1]] = (
+                    False,
+                    feedback or "Information insufficient.",
+                )
+        print(
+            f"---EVALUATOR AGENT: Batch response covered {len(verdicts)}/{len(pending)} sub-queries---"
+        )
+        return verdicts
+
+    def _local_verdict(self, state: AgentState) -> Optional[Tuple[bool, str]]:
+        """
+        Returns a verdict when one can be reached without calling the LLM:
+        nothing was retrieved, a retry brought back no new chunks (so the LLM
+        would be asked the same question again), or the relevance gate finds
+        the similarity scores clearly high or clearly low.
+        """
         print("---EVALUATOR AGENT: Evaluating retrieved chunks---")
 
         current_sub_query = state["current_sub_query"]
-        retrieved_chunks: List[Document] = state["retrieved_chunks"]
-        retrieval_attempts = state["retrieval_attempts"]
-        accumulated_relevant_chunks = state.get("accumulated_relevant_chunks", [])
-        unanswerable_sub_queries = state.get("unanswerable_sub_queries", [])
 
-        if not retrieved_chunks:
+        if not state["retrieved_chunk_ids"]:
             print(
                 f"---EVALUATOR AGENT: No chunks to evaluate for '{current_sub_query}'. Marking as insufficient.---"
             )
-            evaluated_sufficiency = False
-            evaluator_feedback = "No relevant chunks were retrieved."
-        else:
-            retrieved_chunks_content = "\n\n".join(
-                [chunk.page_content for chunk in retrieved_chunks]
+            return False, "No relevant chunks were retrieved."
+
+        if state.get("retrieval_unchanged", False):
+            print(
+                f"---EVALUATOR AGENT: Retry for '{current_sub_query}' found no new chunks. Skipping LLM evaluation.---"
             )
-            try:
-                chain = self.prompt_template | self.llm
-                response = chain.invoke(
-                    {
-                        "current_sub_query": current_sub_query,
-                        "retrieved_chunks_content": retrieved_chunks_content,
-                    }
-                )
+            return False, state.get("evaluator_feedback") or "Information insufficient."
 
-                response_content = response.content.strip().upper()
-                print(f"---EVALUATOR AGENT: LLM Response:\n{response_content}---")
-
-                # Parse LLM response
-                if "SUFFICIENCY: YES" in response_content:
-                    evaluated_sufficiency = True
-                    evaluator_feedback = ""
-                else:
-                    evaluated_sufficiency = False
-                    # Extract feedback if available
-                    feedback_line = [
-                        line
-                        for line in response_content.split("\n")
-                        if "FEEDBACK:" in line
-                    ]
-                    evaluator_feedback = (
-                        feedback_line[0].replace("FEEDBACK:", "").strip()
-                        if feedback_line
-                        else "Information insufficient."
-                    )
-                    if (
-                        not evaluator_feedback
-                    ):  # Ensure there's always some feedback if NO
-                        evaluator_feedback = "Information insufficient."
+        if self.relevance_gate is not None:
+            return self.relevance_gate.verdict(state.get("retrieval_scores", []))
 
-            except Exception as e:
-                print(f"---ERROR: Evaluator agent failed during LLM call: {e}---")
-                evaluated_sufficiency = False
-                evaluator_feedback = (
-                    "LLM evaluation failed. Assuming insufficient for retry."
-                )
+        return None
+
+    def _prepare_inputs(self, state: AgentState) -> Dict[str, str]:
+        current_sub_query = state["current_sub_query"]
+        retrieved_chunks = resolve_chunks(state, state["retrieved_chunk_ids"])
+
+        retrieved_chunks_content = "\n\n".join(
+            [chunk.page_content for chunk in retrieved_chunks]
+        )
+        return {
+            "current_sub_query": current_sub_query,
+            "retrieved_chunks_content": retrieved_chunks_content,
+        }
+
+    def _parse_response(self, response) -> Tuple[bool, str]:
+        """
+        Parses the LLM response into a (sufficiency, feedback) pair.
+        """
+        response_content = response.content.strip().upper()
+        print(f"---EVALUATOR AGENT: LLM Response:\n{response_content}---")
+
+        if "SUFFICIENCY: YES" in response_content:
+            return True, ""
+
+        # Extract feedback if available
+        feedback_line = [
+            line for line in response_content.split("\n") if "FEEDBACK:" in line
+        ]
+        evaluator_feedback = (
+            feedback_line[0].replace("FEEDBACK:", "").strip()
+            if feedback_line
+            else "Information insufficient."
+        )
+        if not evaluator_feedback:  # Ensure there's always some feedback if NO
+            evaluator_feedback = "Information insufficient."
+        return False, evaluator_feedback
+
+    def _handle_error(self, state: AgentState, error: Exception) -> AgentState:
+        print(f"---ERROR: Evaluator agent failed during LLM call: {error}---")
+        return self._route(
+            state, False, "LLM evaluation failed. Assuming insufficient for retry."
+        )
+
+    def _route(
+        self, state: AgentState, evaluated_sufficiency: bool, evaluator_feedback: str
+    ) -> AgentState:
+        """
+        Accumulates chunks or records the sub-query as unanswerable, and decides
+        whether to retry retrieval or move on to the next sub-query.
+        """
+        current_sub_query = state["current_sub_query"]
+        retrieval_attempts = state["retrieval_attempts"]
+        update: AgentState = {}
 
         print(
             f"---EVALUATOR AGENT: Sufficiency: {evaluated_sufficiency}. Feedback: '{evaluator_feedback}'---"
@@ -102,7 +299,7 @@ class EvaluatorAgent:
                 f"---EVALUATOR AGENT: Chunks are sufficient for '{current_sub_query}'. Accumulating and moving to next sub-query.---"
             )
             # Accumulate chunks if sufficient
-            accumulated_relevant_chunks.extend(retrieved_chunks)
+            update["accumulated_relevant_chunk_ids"] = state["retrieved_chunk_ids"]
             next_agent = "research_agent"  # Go back to research to pick next sub-query
             current_sub_query_index = state["current_sub_query_index"] + 1
 
@@ -118,17 +315,14 @@ class EvaluatorAgent:
             print(
                 f"---EVALUATOR AGENT: Max retrieval attempts reached for '{current_sub_query}'. Marking as unanswerable.---"
             )
-            unanswerable_sub_queries.append(current_sub_query)
+            update["unanswerable_sub_queries"] = [current_sub_query]
             next_agent = "research_agent"  # Move to next sub-query
             current_sub_query_index = state["current_sub_query_index"] + 1
 
         return {
-            **state,
+            **update,
             "evaluated_sufficiency": evaluated_sufficiency,
             "evaluator_feedback": evaluator_feedback,
-            "retrieval_attempts": retrieval_attempts,
-            "accumulated_relevant_chunks": accumulated_relevant_chunks,
-            "unanswerable_sub_queries": unanswerable_sub_queries,
             "current_sub_query_index": current_sub_query_index,
             "next_agent_to_call": next_agent,
         }
@@ -1,9 +1,11 @@
+import time
 from pathlib import Path
 
 from langchain.prompts import PromptTemplate
 
+from src.cache.llm_cache import with_response_cache
 from src.constants import BASE_DIR
-from src.llm_config import LLM
+from src.llm_config import get_llm
 from src.models import AgentState
 from src.utils.common import read_txt
 
@@ -14,7 +16,7 @@ class FormatterAgent:
     """
 
     def __init__(self):
-        self.llm = LLM
+        self.llm = with_response_cache(get_llm(), "formatter_agent")
         raw_prompt = read_txt(Path(BASE_DIR) / "prompts" / "formatter_agent_prompt.txt")
         self.prompt_template = PromptTemplate(
             template=raw_prompt,
@@ -27,23 +29,51 @@ class FormatterAgent:
         """
         print("---FORMATTER AGENT: Formatting final report---")
 
-        final_answer_draft = state["final_answer_draft"]
-
+        started = time.perf_counter()
         try:
             chain = self.prompt_template | self.llm
-            response = chain.invoke({"final_answer_draft": final_answer_draft})
+            response = chain.invoke({"final_answer_draft": state["final_answer_draft"]})
             report_formatted = response.content
+            print(
+                f"---FORMATTER AGENT: Generated in {time.perf_counter() - started:.2f}s---"
+            )
         except Exception as e:
-            print(f"---ERROR: Formatter agent failed during LLM call: {e}---")
-            report_formatted = (
-                "An error occurred during formatting. Here's the raw draft:\n\n"
-                + final_answer_draft
+            report_formatted = self._handle_error(state, e)
+
+        return self._finish(state, report_formatted)
+
+    async def arun(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `run` that awaits the LLM call instead of blocking.
+        """
+        print("---FORMATTER AGENT: Formatting final report---")
+
+        started = time.perf_counter()
+        try:
+            chain = self.prompt_template | self.llm
+            response = await chain.ainvoke(
+                {"final_answer_draft": state["final_answer_draft"]}
+            )
+            report_formatted = response.content
+            print(
+                f"---FORMATTER AGENT: Generated in {time.perf_counter() - started:.2f}s---"
             )
+        except Exception as e:
+            report_formatted = self._handle_error(state, e)
+
+        return self._finish(state, report_formatted)
+
+    def _handle_error(self, state: AgentState, error: Exception) -> str:
+        print(f"---ERROR: Formatter agent failed during LLM call: {error}---")
+        return (
+            "An error occurred during formatting. Here's the raw draft:\n\n"
+            + state["final_answer_draft"]
+        )
 
+    def _finish(self, state: AgentState, report_formatted: str) -> AgentState:
         print("---FORMATTER AGENT: Final Report Formatted. Workflow END.---")
 
         return {
-            **state,
             "report_formatted": report_formatted,
             "next_agent_to_call": "END",
         }
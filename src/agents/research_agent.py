@@ -1,13 +1,17 @@
 import json
 import re
 from pathlib import Path
+from typing import List, Optional
 
 from langchain.prompts import PromptTemplate
 
-from src.constants import BASE_DIR
-from src.llm_config import LLM
-from src.models import AgentState
+from src.cache.llm_cache import with_response_cache
+from src.config import ConfigurationManager
+from src.constants import BASE_DIR, DEFAULT_EXECUTION_MODE
+from src.llm_config import get_llm
+from src.models import AgentState, build_initial_state
 from src.utils.common import read_txt
+from src.utils.query_router import get_query_router
 
 
 class ResearchAgent:
@@ -17,87 +21,166 @@ class ResearchAgent:
     """
 
     def __init__(self):
-        self.llm = LLM
+        self.llm = with_response_cache(get_llm(), "research_agent")
         raw_prompt = read_txt(Path(BASE_DIR) / "prompts" / "research_agent_prompt.txt")
         self.prompt_template = PromptTemplate(
             template=raw_prompt, input_variables=["original_query"]
         )
+        agent_config = ConfigurationManager().get_agent_config()
+        self.execution_mode = agent_config.get("EXECUTION_MODE", DEFAULT_EXECUTION_MODE)
+        self.query_router = get_query_router()
 
     def run(self, state: AgentState) -> AgentState:
         """
         Breaks down the original query into sub-queries or
         prepares the next sub-query for processing.
         """
-        print("---RESEARCH AGENT: Managing research plan---")
-        print(self.prompt_template)
+        self._log_start(state)
 
-        original_query = state["original_query"]
-        print(f"---RESEARCH AGENT: Original Query: {original_query}---")
-        sub_queries_list = state.get("sub_queries_list", [])
-        current_sub_query_index = state.get("current_sub_query_index", 0)
-        accumulated_relevant_chunks = state.get("accumulated_relevant_chunks", [])
-        unanswerable_sub_queries = state.get("unanswerable_sub_queries", [])
+        if not state.get("sub_queries_list", []):
+            original_query = state["original_query"]
+            if self.query_router is not None:
+                decision = self.query_router.route(original_query)
+                if decision.sub_queries:
+                    return self._plan(state, decision.sub_queries)
 
-        if not sub_queries_list:
             print("---RESEARCH AGENT: Generating sub-queries for original query---")
             try:
                 chain = self.prompt_template | self.llm
                 response = chain.invoke({"original_query": original_query})
+            except Exception as e:
+                return self._handle_error(state, e)
+
+            sub_queries_list = self._parse_sub_queries(response)
+            if sub_queries_list is None:
+                sub_queries_list = [original_query]
+            elif self.query_router is not None:
                 try:
-                    # Clean LLM output of markdown code formatting
-                    cleaned_content = re.sub(
-                        r"^```(?:json)?\s*|\s*```$",
-                        "",
-                        response.content.strip(),
-                        flags=re.MULTILINE,
-                    )
-                    new_sub_queries = json.loads(cleaned_content)
-
-                    if not isinstance(new_sub_queries, list):
-                        raise ValueError("LLM response is not a JSON list.")
-
-                    sub_queries_list = [
-                        sq.strip() for sq in new_sub_queries if sq.strip()
-                    ]
-                    if not sub_queries_list:
-                        raise ValueError("LLM generated an empty list of sub-queries.")
-                except (json.JSONDecodeError, ValueError) as e:
-                    print(
-                        f"---WARNING: LLM did not return a valid JSON list for sub-queries: {response.content}. Error: {e}"
-                    )
-                    sub_queries_list = [original_query]
-
-                current_sub_query_index = 0
-                accumulated_relevant_chunks = []
-                unanswerable_sub_queries = []
-
-                print(
-                    f"---RESEARCH AGENT: Generated {len(sub_queries_list)} sub-queries: {sub_queries_list}---"
-                )
+                    self.query_router.remember(original_query, sub_queries_list)
+                except Exception as e:
+                    print(f"---WARNING: Could not cache the decomposition: {e}---")
+            return self._plan(state, sub_queries_list)
 
+        return self._next_sub_query(
+            state["sub_queries_list"], state.get("current_sub_query_index", 0)
+        )
+
+    async def arun(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `run` that awaits the LLM call instead of blocking.
+        """
+        self._log_start(state)
+
+        if not state.get("sub_queries_list", []):
+            original_query = state["original_query"]
+            if self.query_router is not None:
+                decision = await self.query_router.aroute(original_query)
+                if decision.sub_queries:
+                    return self._plan(state, decision.sub_queries)
+
+            print("---RESEARCH AGENT: Generating sub-queries for original query---")
+            try:
+                chain = self.prompt_template | self.llm
+                response = await chain.ainvoke({"original_query": original_query})
             except Exception as e:
-                print(
-                    f"---ERROR: Research agent failed to generate sub-queries: {e}---"
-                )
+                return self._handle_error(state, e)
+
+            sub_queries_list = self._parse_sub_queries(response)
+            if sub_queries_list is None:
                 sub_queries_list = [original_query]
-                current_sub_query_index = 0
-                state["next_agent_to_call"] = "retriever_agent"
-                state["current_sub_query"] = original_query
-                state["retrieval_attempts"] = 0
-                return state
+            elif self.query_router is not None:
+                try:
+                    await self.query_router.aremember(original_query, sub_queries_list)
+                except Exception as e:
+                    print(f"---WARNING: Could not cache the decomposition: {e}---")
+            return self._plan(state, sub_queries_list)
+
+        return self._next_sub_query(
+            state["sub_queries_list"], state.get("current_sub_query_index", 0)
+        )
+
+    def _log_start(self, state: AgentState):
+        print("---RESEARCH AGENT: Managing research plan---")
+        print(self.prompt_template)
+        print(f"---RESEARCH AGENT: Original Query: {state['original_query']}---")
+
+    def _parse_sub_queries(self, response) -> Optional[List[str]]:
+        """
+        Parses the LLM response into a list of sub-queries. Returns None when
+        the response is not a usable JSON list, so the caller can fall back to
+        the original query (without caching that fallback).
+        """
+        try:
+            # Clean LLM output of markdown code formatting
+            cleaned_content = re.sub(
+                r"^```(?:json)?\s*|\s*```$",
+                "",
+                response.content.strip(),
+                flags=re.MULTILINE,
+            )
+            new_sub_queries = json.loads(cleaned_content)
 
+            if not isinstance(new_sub_queries, list):
+                raise ValueError("LLM response is not a JSON list.")
+
+            sub_queries_list = [sq.strip() for sq in new_sub_queries if sq.strip()]
+            if not sub_queries_list:
+                raise ValueError("LLM generated an empty list of sub-queries.")
+        except (json.JSONDecodeError, ValueError) as e:
+            print(
+                f"---WARNING: LLM did not return a valid JSON list for sub-queries: {response.content}. Error: {e}"
+            )
+            return None
+
+        print(
+            f"---RESEARCH AGENT: Generated {len(sub_queries_list)} sub-queries: {sub_queries_list}---"
+        )
+        return sub_queries_list
+
+    def _handle_error(self, state: AgentState, error: Exception) -> AgentState:
+        print(f"---ERROR: Research agent failed to generate sub-queries: {error}---")
+        original_query = state["original_query"]
+        return {
+            "sub_queries_list": [original_query],
+            "current_sub_query_index": 0,
+            "current_sub_query": original_query,
+            "retrieval_attempts": 0,
+            "next_agent_to_call": "retriever_agent",
+        }
+
+    def _plan(self, state: AgentState, sub_queries_list: List[str]) -> AgentState:
+        """
+        Starts a fresh research plan: fans the sub-queries out in parallel,
+        hands them all to the batched evaluation node, or passes the first one
+        to the retriever.
+        """
+        plan: AgentState = {
+            "sub_queries_list": sub_queries_list,
+            "current_sub_query_index": 0,
+        }
+
+        if self.execution_mode == "parallel":
+            print(
+                "---RESEARCH AGENT: Fanning out sub-queries for parallel retrieval.---"
+            )
+            return {**plan, "next_agent_to_call": "sub_query_fanout"}
+
+        if self.execution_mode == "batched":
+            print(
+                "---RESEARCH AGENT: Handing sub-queries over for batched evaluation.---"
+            )
+            return {**plan, "next_agent_to_call": "sub_query_batch"}
+
+        return {**plan, **self._next_sub_query(sub_queries_list, 0)}
+
+    def _next_sub_query(
+        self, sub_queries_list: List[str], current_sub_query_index: int
+    ) -> AgentState:
         if current_sub_query_index >= len(sub_queries_list):
             print(
                 "---RESEARCH AGENT: All sub-queries processed. Moving to synthesis.---"
             )
-            return {
-                **state,
-                "next_agent_to_call": "synthesizer_agent",
-                "sub_queries_list": sub_queries_list,
-                "current_sub_query_index": current_sub_query_index,
-                "accumulated_relevant_chunks": accumulated_relevant_chunks,
-                "unanswerable_sub_queries": unanswerable_sub_queries,
-            }
+            return {"next_agent_to_call": "synthesizer_agent"}
 
         current_sub_query = sub_queries_list[current_sub_query_index]
         print(
@@ -105,12 +188,13 @@ class ResearchAgent:
         )
 
         return {
-            **state,
-            "sub_queries_list": sub_queries_list,
             "current_sub_query_index": current_sub_query_index,
             "current_sub_query": current_sub_query,
             "retrieval_attempts": 0,
-            "retrieved_chunks": [],
+            "retrieved_chunk_ids": [],
+            "retrieval_query": "",
+            "retrieval_unchanged": False,
+            "retrieval_scores": [],
             "evaluated_sufficiency": False,
             "evaluator_feedback": "",
             "next_agent_to_call": "retriever_agent",
@@ -119,20 +203,6 @@ class ResearchAgent:
 
 if __name__ == "__main__":
     research_agent = ResearchAgent()
-    initial_state: AgentState = {
-        "original_query": "What is the capital of France?",
-        "sub_queries_list": [],
-        "current_sub_query_index": 0,
-        "current_sub_query": "",
-        "retrieved_chunks": [],
-        "evaluated_sufficiency": False,
-        "evaluator_feedback": "",
-        "retrieval_attempts": 0,
-        "accumulated_relevant_chunks": [],
-        "unanswerable_sub_queries": [],
-        "final_answer_draft": "",
-        "report_formatted": "",
-        "next_agent_to_call": "research_agent",
-    }
+    initial_state = build_initial_state("What is the capital of France?")
     state = research_agent.run(initial_state)
     print(state)
@@ -2,8 +2,15 @@ from typing import List
 
 from langchain_core.documents import Document
 
-from src.constants import DEFAULT_RETRIEVAL_K
+from src.config import ConfigurationManager
+from src.constants import (
+    DEFAULT_QUERY_REWRITE_ENABLED,
+    DEFAULT_RETRIEVAL_K,
+    DEFAULT_RETRY_K_INCREMENT,
+)
 from src.models import AgentState
+from src.retrieval.hybrid_retriever import build_retriever
+from src.retrieval.retry_strategy import RetrievalPlan, RetryStrategy
 from src.utils.db_utils import get_vector_db
 
 
@@ -14,42 +21,96 @@ class RetrieverAgent:
 
     def __init__(self):
         self.vector_db = get_vector_db()
-        self.retriever = self.vector_db.as_retriever(
-            search_kwargs={"k": DEFAULT_RETRIEVAL_K}
+        self.retriever = build_retriever(self.vector_db)
+        agent_config = ConfigurationManager().get_agent_config()
+        self.retry_strategy = RetryStrategy(
+            base_k=agent_config.get("MAX_RETRIEVAL_CHUNKS", DEFAULT_RETRIEVAL_K),
+            k_increment=agent_config.get(
+                "RETRY_K_INCREMENT", DEFAULT_RETRY_K_INCREMENT
+            ),
+            rewrite_enabled=agent_config.get(
+                "QUERY_REWRITE_ENABLED", DEFAULT_QUERY_REWRITE_ENABLED
+            ),
         )
 
     def run(self, state: AgentState) -> AgentState:
         """
         Retrieves document chunks based on the current sub-query.
         """
+        retrieval_attempts = self._start_attempt(state)
+        plan = self.retry_strategy.plan(state)
+        try:
+            retrieved_chunks: List[Document] = self.retriever.invoke(
+                plan.query, k=plan.k
+            )
+        except Exception as e:
+            return self._handle_error(state, e)
+        return self._finish(state, retrieved_chunks, retrieval_attempts, plan)
+
+    async def arun(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `run` that awaits the vector search instead of blocking.
+        """
+        retrieval_attempts = self._start_attempt(state)
+        plan = await self.retry_strategy.aplan(state)
+        try:
+            retrieved_chunks: List[Document] = await self.retriever.ainvoke(
+                plan.query, k=plan.k
+            )
+        except Exception as e:
+            return self._handle_error(state, e)
+        return self._finish(state, retrieved_chunks, retrieval_attempts, plan)
+
+    def _start_attempt(self, state: AgentState) -> int:
         print("---RETRIEVER AGENT: Retrieving information---")
-        current_sub_query = state["current_sub_query"]
         retrieval_attempts = state["retrieval_attempts"] + 1
 
         print(
-            f"---RETRIEVER AGENT: Attempt {retrieval_attempts} for '{current_sub_query}'---"
+            f"---RETRIEVER AGENT: Attempt {retrieval_attempts} for '{state['current_sub_query']}'---"
         )
+        return retrieval_attempts
 
-        try:
-            retrieved_chunks: List[Document] = self.retriever.invoke(current_sub_query)
-            if not retrieved_chunks:
-                print(
-                    f"---RETRIEVER AGENT: No chunks retrieved for '{current_sub_query}'---"
-                )
-
-            return {
-                **state,
-                "retrieved_chunks": retrieved_chunks,
-                "retrieval_attempts": retrieval_attempts,
-                "next_agent_to_call": "evaluator_agent",
-            }
-        except Exception as e:
-            print(f"---ERROR: Retriever agent failed to retrieve chunks: {e}---")
-            unanswerable_sub_queries = state.get("unanswerable_sub_queries", [])
-            unanswerable_sub_queries.append(current_sub_query)
-            return {
-                **state,
-                "unanswerable_sub_queries": unanswerable_sub_queries,
-                "current_sub_query_index": state["current_sub_query_index"] + 1,
-                "next_agent_to_call": "research_agent",
-            }
+    def _finish(
+        self,
+        state: AgentState,
+        new_chunks: List[Document],
+        retrieval_attempts: int,
+        plan: RetrievalPlan,
+    ) -> AgentState:
+        if not new_chunks:
+            print(f"---RETRIEVER AGENT: No chunks retrieved for '{plan.query}'---")
+
+        retrieved_chunk_ids, fresh_chunks, retrieval_unchanged = (
+            self.retry_strategy.merge(state, new_chunks)
+        )
+        if retrieval_unchanged:
+            print(
+                f"---RETRIEVER AGENT: Retry with '{plan.query}' (k={plan.k}) returned no new chunks.---"
+            )
+
+        # Chunks from earlier attempts are already in the store; only the
+        # fresh ones are written back.
+        chunk_store = state.get("chunk_store", {})
+        retrieval_scores = [
+            (fresh_chunks.get(chunk_id) or chunk_store[chunk_id]).metadata.get(
+                "relevance_score"
+            )
+            for chunk_id in retrieved_chunk_ids
+        ]
+        return {
+            "chunk_store": fresh_chunks,
+            "retrieved_chunk_ids": retrieved_chunk_ids,
+            "retrieval_attempts": retrieval_attempts,
+            "retrieval_query": plan.query,
+            "retrieval_unchanged": retrieval_unchanged,
+            "retrieval_scores": retrieval_scores,
+            "next_agent_to_call": "evaluator_agent",
+        }
+
+    def _handle_error(self, state: AgentState, error: Exception) -> AgentState:
+        print(f"---ERROR: Retriever agent failed to retrieve chunks: {error}---")
+        return {
+            "unanswerable_sub_queries": [state["current_sub_query"]],
+            "current_sub_query_index": state["current_sub_query_index"] + 1,
+            "next_agent_to_call": "research_agent",
+        }
@@ -0,0 +1,112 @@
+import asyncio
+from typing import List
+
+from src.agents.sub_query_worker_agent import SubQueryWorkerAgent
+from src.models import AgentState, apply_update
+
+
+class SubQueryBatchAgent(SubQueryWorkerAgent):
+    """
+    Agent responsible for processing all sub-queries in lock-step rounds:
+    every sub-query that still needs evidence is retrieved, then all of them
+    are judged by a single batched evaluator call. A ticket with N sub-queries
+    costs one evaluator round trip per round instead of one per sub-query.
+    """
+
+    def run(self, state: AgentState) -> AgentState:
+        """
+        Runs retrieval/evaluation rounds until every sub-query is answered or
+        out of retries, then joins the results for synthesis.
+        """
+        branches = self._start_branches(state)
+
+        while True:
+            active = self._active(branches)
+            if not active:
+                break
+            for index in active:
+                branches[index] = apply_update(
+                    branches[index], self.retriever_agent.run(branches[index])
+                )
+            to_evaluate = self._awaiting_evaluation(branches, active)
+            evaluated = self.evaluator_agent.evaluate_batch(
+                [branches[index] for index in to_evaluate]
+            )
+            for index, update in zip(to_evaluate, evaluated):
+                branches[index] = apply_update(branches[index], update)
+
+        return self._finish(state, branches)
+
+    async def arun(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `run`; retrievals within a round run concurrently.
+        """
+        branches = self._start_branches(state)
+
+        while True:
+            active = self._active(branches)
+            if not active:
+                break
+            retrieved = await asyncio.gather(
+                *(self.retriever_agent.arun(branches[index]) for index in active)
+            )
+            for index, update in zip(active, retrieved):
+                branches[index] = apply_update(branches[index], update)
+            to_evaluate = self._awaiting_evaluation(branches, active)
+            evaluated = await self.evaluator_agent.aevaluate_batch(
+                [branches[index] for index in to_evaluate]
+            )
+            for index, update in zip(to_evaluate, evaluated):
+                branches[index] = apply_update(branches[index], update)
+
+        return self._finish(state, branches)
+
+    def _start_branches(self, state: AgentState) -> List[AgentState]:
+        sub_queries_list = state["sub_queries_list"]
+        print(
+            f"---SUB-QUERY BATCH: Processing {len(sub_queries_list)} sub-queries with batched evaluation---"
+        )
+        return [
+            self._start_branch(
+                {
+                    "original_query": state["original_query"],
+                    "current_sub_query": sub_query,
+                    "current_sub_query_index": index,
+                }
+            )
+            for index, sub_query in enumerate(sub_queries_list)
+        ]
+
+    def _active(self, branches: List[AgentState]) -> List[int]:
+        return [
+            index
+            for index, branch_state in enumerate(branches)
+            if branch_state["next_agent_to_call"] == "retriever_agent"
+        ]
+
+    def _awaiting_evaluation(
+        self, branches: List[AgentState], active: List[int]
+    ) -> List[int]:
+        # A failed retrieval already routed its branch out of the loop.
+        return [
+            index
+            for index in active
+            if branches[index]["next_agent_to_call"] == "evaluator_agent"
+        ]
+
+    def _finish(self, state: AgentState, branches: List[AgentState]) -> AgentState:
+        chunk_store = {}
+        sub_query_results = {}
+        for index, branch_state in enumerate(branches):
+            task = {
+                "current_sub_query": state["sub_queries_list"][index],
+                "current_sub_query_index": index,
+            }
+            result = self._branch_result(task, branch_state)
+            chunk_store.update(result["chunk_store"])
+            sub_query_results.update(result["sub_query_results"])
+        return {
+            "chunk_store": chunk_store,
+            "sub_query_results": sub_query_results,
+            **self._join(sub_query_results, state["sub_queries_list"]),
+        }
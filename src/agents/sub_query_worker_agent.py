@@ -0,0 +1,155 @@
+from typing import Any, Dict, List
+
+from langgraph.types import Send
+
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.agents.retriever_agent import RetrieverAgent
+from src.models import AgentState, apply_update, build_initial_state
+
+BRANCH_AGENTS = ("retriever_agent", "evaluator_agent")
+
+
+class SubQueryWorkerAgent:
+    """
+    Agent responsible for running the full retrieve/evaluate/retry loop for a
+    single sub-query, so that every sub-query can be processed in its own
+    parallel branch of the graph.
+    """
+
+    def __init__(
+        self, retriever_agent: RetrieverAgent, evaluator_agent: EvaluatorAgent
+    ):
+        self.retriever_agent = retriever_agent
+        self.evaluator_agent = evaluator_agent
+
+    def fan_out(self, state: AgentState) -> List[Send]:
+        """
+        Emits one `Send` per sub-query so LangGraph runs the worker branches
+        concurrently within a single super-step.
+        """
+        sub_queries_list = state["sub_queries_list"]
+        print(
+            f"---SUB-QUERY WORKER: Dispatching {len(sub_queries_list)} parallel branches---"
+        )
+        return [
+            Send(
+                "sub_query_worker",
+                {
+                    "original_query": state["original_query"],
+                    "current_sub_query": sub_query,
+                    "current_sub_query_index": index,
+                },
+            )
+            for index, sub_query in enumerate(sub_queries_list)
+        ]
+
+    def run(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Retrieves and evaluates chunks for one sub-query, retrying until the
+        evaluator is satisfied or the attempt budget is spent.
+        """
+        branch_state = self._start_branch(task)
+
+        while branch_state["next_agent_to_call"] in BRANCH_AGENTS:
+            if branch_state["next_agent_to_call"] == "retriever_agent":
+                update = self.retriever_agent.run(branch_state)
+            else:
+                update = self.evaluator_agent.run(branch_state)
+            branch_state = apply_update(branch_state, update)
+
+        return self._branch_result(task, branch_state)
+
+    async def arun(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of `run` that awaits the retriever and evaluator.
+        """
+        branch_state = self._start_branch(task)
+
+        while branch_state["next_agent_to_call"] in BRANCH_AGENTS:
+            if branch_state["next_agent_to_call"] == "retriever_agent":
+                update = await self.retriever_agent.arun(branch_state)
+            else:
+                update = await self.evaluator_agent.arun(branch_state)
+            branch_state = apply_update(branch_state, update)
+
+        return self._branch_result(task, branch_state)
+
+    def _start_branch(self, task: Dict[str, Any]) -> AgentState:
+        current_sub_query = task["current_sub_query"]
+        print(
+            f"---SUB-QUERY WORKER: Branch {task['current_sub_query_index'] + 1} processing '{current_sub_query}'---"
+        )
+
+        # Each branch works on its own private state, so its chunk store only
+        # holds what this sub-query retrieved.
+        return {
+            **build_initial_state(task["original_query"]),
+            "sub_queries_list": [current_sub_query],
+            "current_sub_query": current_sub_query,
+            "next_agent_to_call": "retriever_agent",
+        }
+
+    def _branch_result(
+        self, task: Dict[str, Any], branch_state: AgentState
+    ) -> Dict[str, Any]:
+        """
+        Reports the branch outcome by chunk ID; only the relevant chunks are
+        written to the parent run's chunk store.
+        """
+        current_sub_query = task["current_sub_query"]
+        current_sub_query_index = task["current_sub_query_index"]
+        relevant_chunk_ids = branch_state["accumulated_relevant_chunk_ids"]
+        chunk_store = branch_state["chunk_store"]
+        return {
+            "chunk_store": {
+                chunk_id: chunk_store[chunk_id] for chunk_id in relevant_chunk_ids
+            },
+            "sub_query_results": {
+                current_sub_query_index: {
+                    "sub_query": current_sub_query,
+                    "relevant_chunk_ids": relevant_chunk_ids,
+                    "unanswerable": bool(branch_state["unanswerable_sub_queries"]),
+                    "retrieval_attempts": branch_state["retrieval_attempts"],
+                }
+            },
+        }
+
+    def collect(self, state: AgentState) -> AgentState:
+        """
+        Joins the parallel branch results, in sub-query order, into the
+        accumulated chunk IDs and unanswerable sub-queries used by synthesis.
+        """
+        return self._join(
+            state.get("sub_query_results", {}), state.get("sub_queries_list", [])
+        )
+
+    def _join(
+        self, sub_query_results: Dict[int, Dict[str, Any]], sub_queries_list: List[str]
+    ) -> AgentState:
+        accumulated_relevant_chunk_ids = []
+        unanswerable_sub_queries = []
+
+        for index in sorted(sub_query_results):
+            result = sub_query_results[index]
+            accumulated_relevant_chunk_ids.extend(result["relevant_chunk_ids"])
+            if result["unanswerable"]:
+                unanswerable_sub_queries.append(result["sub_query"])
+
+        print(
+            f"---SUB-QUERY WORKER: Joined {len(sub_query_results)} branches, "
+            f"{len(accumulated_relevant_chunk_ids)} relevant chunks, "
+            f"{len(unanswerable_sub_queries)} unanswerable sub-queries. Moving to synthesis.---"
+        )
+
+        return {
+            "accumulated_relevant_chunk_ids": accumulated_relevant_chunk_ids,
+            "unanswerable_sub_queries": unanswerable_sub_queries,
+            "current_sub_query_index": len(sub_queries_list),
+            "next_agent_to_call": "synthesizer_agent",
+        }
+
+    async def acollect(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `collect`; the join is pure state manipulation.
+        """
+        return self.collect(state)
@@ -1,24 +1,57 @@
+import time
+from typing import Optional
+
 from src.models import AgentState
 
+# Nodes that gather more evidence; a run over its time budget skips them.
+RESEARCH_NODES = (
+    "research_agent",
+    "retriever_agent",
+    "evaluator_agent",
+    "sub_query_fanout",
+    "sub_query_batch",
+)
+
 
 class SupervisorAgent:
     """
-    Agent responsible for synthesizing a draft answer from accumulated relevant chunks.
+    Routing policy consulted on every edge of the graph. Agents name their
+    successor in `next_agent_to_call` and the graph routes there directly; the
+    supervisor only overrides that choice when a run has spent its time
+    budget, cutting research short and sending it to synthesis with the
+    evidence gathered so far. Without a budget it never intervenes.
     """
 
-    def run(self, state: AgentState) -> str:
+    def __init__(self, time_budget_seconds: Optional[float] = None):
+        self.time_budget_seconds = time_budget_seconds
+
+    def route(self, state: AgentState) -> str:
         """
-        The supervisor node orchestrates the flow based on the 'next_agent_to_call' in the state.
-        It also checks for overall completion of research.
+        Returns the name of the next step: the agent's own choice, "END" for
+        finished or failed runs, or "synthesizer_agent" when over budget.
         """
-        print(f"\n---SUPERVISOR: Directing flow to: {state['next_agent_to_call']}---")
+        next_agent = state["next_agent_to_call"]
 
-        # If an agent signals END or FATAL_ERROR, the supervisor transitions to the graph END
-        if state["next_agent_to_call"] in ["END", "FATAL_ERROR"]:
+        # If an agent signals END or FATAL_ERROR, the workflow transitions to the graph END
+        if next_agent in ["END", "FATAL_ERROR"]:
             print(
                 "---SUPERVISOR: Workflow complete or fatal error detected. Ending workflow.---"
             )
-            return {"next_agent_to_call": "end_workflow"}  # Transition to END
+            return "END"
+
+        if next_agent in RESEARCH_NODES and self._over_budget(state):
+            print(
+                f"---SUPERVISOR: Time budget of {self.time_budget_seconds}s spent. Skipping {next_agent} and moving to synthesis.---"
+            )
+            return "synthesizer_agent"
+
+        return next_agent
 
-        # Otherwise, direct to the agent specified in next_agent_to_call
-        return {"next_agent_to_call": state["next_agent_to_call"]}
+    def _over_budget(self, state: AgentState) -> bool:
+        if not self.time_budget_seconds:
+            return False
+        started_at = state.get("started_at")
+        return (
+            started_at is not None
+            and time.time() - started_at > self.time_budget_seconds
+        )
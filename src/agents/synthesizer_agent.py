@@ -1,25 +1,44 @@
+import time
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 
 from langchain.prompts import PromptTemplate
 from langchain_core.documents import Document
 
-from src.constants import BASE_DIR
-from src.llm_config import LLM
-from src.models import AgentState
+from src.cache.llm_cache import with_response_cache
+from src.config import ConfigurationManager
+from src.constants import (
+    BASE_DIR,
+    DEFAULT_ANSWER_MODE,
+    DEFAULT_CONTEXT_SENTENCE_WINDOW,
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+    DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE,
+)
+from src.llm_config import get_llm
+from src.models import AgentState, relevant_chunks
+from src.retrieval.context_packer import ContextPacker, PackedContext
+from src.utils.answer_formatter import format_answer
 from src.utils.common import read_txt
 
 
 class SynthesizerAgent:
     """
     Agent responsible for synthesizing a draft answer from accumulated relevant chunks.
+    In "fast" answer mode it writes the final answer in a single call with a
+    merged synthesize-and-format prompt and numbered chunks, and polishes it
+    locally instead of handing it to the FormatterAgent.
     """
 
     def __init__(self):
-        self.llm = LLM
-        raw_prompt = read_txt(
-            Path(BASE_DIR) / "prompts" / "synthesizer_agent_prompt.txt"
+        self.llm = with_response_cache(get_llm(), "synthesizer_agent")
+        agent_config = ConfigurationManager().get_agent_config()
+        self.answer_mode = agent_config.get("ANSWER_MODE", DEFAULT_ANSWER_MODE)
+        prompt_file = (
+            "synthesizer_formatter_prompt.txt"
+            if self.answer_mode == "fast"
+            else "synthesizer_agent_prompt.txt"
         )
+        raw_prompt = read_txt(Path(BASE_DIR) / "prompts" / prompt_file)
         self.prompt_template = PromptTemplate(
             template=raw_prompt,
             input_variables=[
@@ -30,65 +49,155 @@ class SynthesizerAgent:
                 }
             ],
         )
+        self.context_packer = ContextPacker(
+            token_budget=agent_config.get(
+                "CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKEN_BUDGET
+            ),
+            sentence_window=agent_config.get(
+                "CONTEXT_SENTENCE_WINDOW", DEFAULT_CONTEXT_SENTENCE_WINDOW
+            ),
+            dedupe=agent_config.get("DEDUPE_CONTEXT_CHUNKS", False),
+            max_distance=agent_config.get(
+                "NEAR_DUPLICATE_MAX_DISTANCE", DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE
+            ),
+        )
 
     def run(self, state: AgentState) -> AgentState:
         """
         Synthesizes the final answer draft from all accumulated relevant chunks.
         """
+        packed = self._pack_context(state)
+        if packed is None:
+            return self._finish(state, self._no_chunks_answer(state))
+        chain_inputs = self._prepare_inputs(state, packed)
+        started = time.perf_counter()
+        try:
+            chain = self.prompt_template | self.llm
+            response = chain.invoke(chain_inputs)
+            final_answer_draft = response.content
+            print(
+                f"---SYNTHESIZER AGENT: Generated in {time.perf_counter() - started:.2f}s ({self.answer_mode} mode)---"
+            )
+        except Exception as e:
+            final_answer_draft = self._handle_error(state, chain_inputs, e)
+        return self._finish(state, final_answer_draft, packed)
+
+    async def arun(self, state: AgentState) -> AgentState:
+        """
+        Async variant of `run` that awaits the LLM call instead of blocking.
+        """
+        packed = self._pack_context(state)
+        if packed is None:
+            return self._finish(state, self._no_chunks_answer(state))
+        chain_inputs = self._prepare_inputs(state, packed)
+        started = time.perf_counter()
+        try:
+            chain = self.prompt_template | self.llm
+            response = await chain.ainvoke(chain_inputs)
+            final_answer_draft = response.content
+            print(
+                f"---SYNTHESIZER AGENT: Generated in {time.perf_counter() - started:.2f}s ({self.answer_mode} mode)---"
+            )
+        except Exception as e:
+            final_answer_draft = self._handle_error(state, chain_inputs, e)
+        return self._finish(state, final_answer_draft, packed)
+
+    def _pack_context(self, state: AgentState) -> Optional[PackedContext]:
+        """
+        Packs the accumulated chunks into the context token budget, or returns
+        None when no chunks were accumulated.
+        """
         print("---SYNTHESIZER AGENT: Generating final answer draft---")
 
-        original_query = state["original_query"]
-        accumulated_relevant_chunks: List[Document] = state.get(
-            "accumulated_relevant_chunks", []
+        accumulated_relevant_chunks: List[Document] = relevant_chunks(state)
+        if not accumulated_relevant_chunks:
+            return None
+
+        packed = self.context_packer.pack(
+            [state["original_query"], *state.get("sub_queries_list", [])],
+            accumulated_relevant_chunks,
         )
-        unanswerable_sub_queries: List[str] = state.get("unanswerable_sub_queries", [])
+        print(
+            f"---SYNTHESIZER AGENT: Packed {len(packed.chunks)}/{len(accumulated_relevant_chunks)} chunks "
+            f"into {packed.used_tokens}/{packed.token_budget} tokens "
+            f"({packed.trimmed} trimmed, {len(packed.dropped)} dropped)---"
+        )
+        return packed
 
-        if not accumulated_relevant_chunks:
-            print(
-                "---SYNTHESIZER AGENT: No relevant chunks accumulated. Cannot synthesize.---"
-            )
-            final_answer_draft = (
-                "I could not find sufficient information in the knowledge base to answer your query: "
-                + original_query
+    def _prepare_inputs(
+        self, state: AgentState, packed: PackedContext
+    ) -> Dict[str, str]:
+        unanswerable_sub_queries: List[str] = state.get("unanswerable_sub_queries", [])
+        unanswerable_sub_queries_str = (
+            "\n".join([f"- {sq}" for sq in unanswerable_sub_queries])
+            if unanswerable_sub_queries
+            else "None"
+        )
+        if self.answer_mode == "fast":
+            # Numbered so the answer can cite chunks as [n].
+            chunks_content = "\n\n".join(
+                f"[{number}] {chunk.page_content}"
+                for number, chunk in enumerate(packed.chunks, start=1)
             )
-            if unanswerable_sub_queries:
-                final_answer_draft += f" (Specifically, could not answer sub-queries: {', '.join(unanswerable_sub_queries)})"
         else:
-            accumulated_relevant_chunks_content = "\n\n".join(
-                [chunk.page_content for chunk in accumulated_relevant_chunks]
+            chunks_content = packed.content
+        return {
+            "original_query": state["original_query"],
+            "accumulated_relevant_chunks_content": chunks_content,
+            "unanswerable_sub_queries_str": unanswerable_sub_queries_str,
+        }
+
+    def _no_chunks_answer(self, state: AgentState) -> str:
+        print(
+            "---SYNTHESIZER AGENT: No relevant chunks accumulated. Cannot synthesize.---"
+        )
+        unanswerable_sub_queries: List[str] = state.get("unanswerable_sub_queries", [])
+        final_answer_draft = (
+            "I could not find sufficient information in the knowledge base to answer your query: "
+            + state["original_query"]
+        )
+        if unanswerable_sub_queries:
+            final_answer_draft += f" (Specifically, could not answer sub-queries: {', '.join(unanswerable_sub_queries)})"
+        return final_answer_draft
+
+    def _handle_error(
+        self, state: AgentState, chain_inputs: Dict[str, str], error: Exception
+    ) -> str:
+        print(f"---ERROR: Synthesizer agent failed during LLM call: {error}---")
+        return (
+            "An error occurred during synthesis. I might not be able to provide a full answer."
+            "\n\nBased on available information, but potentially unrefined: "
+            + chain_inputs["accumulated_relevant_chunks_content"][:500]
+            + "..."
+        )
+
+    def _finish(
+        self,
+        state: AgentState,
+        final_answer_draft: str,
+        packed: Optional[PackedContext] = None,
+    ) -> AgentState:
+        context_packing_report = packed.report() if packed else {}
+        if self.answer_mode == "fast":
+            sources = (
+                [chunk.metadata.get("source", "") for chunk in packed.chunks]
+                if packed
+                else []
             )
-            unanswerable_sub_queries_str = (
-                "\n".join([f"- {sq}" for sq in unanswerable_sub_queries])
-                if unanswerable_sub_queries
-                else "None"
+            print(
+                "---SYNTHESIZER AGENT: Final Answer Generated. Formatted locally. Workflow END.---"
             )
-
-            try:
-                chain = self.prompt_template | self.llm
-                response = chain.invoke(
-                    {
-                        "original_query": original_query,
-                        "accumulated_relevant_chunks_content": accumulated_relevant_chunks_content,
-                        "unanswerable_sub_queries_str": unanswerable_sub_queries_str,
-                    }
-                )
-                final_answer_draft = response.content
-            except Exception as e:
-                print(f"---ERROR: Synthesizer agent failed during LLM call: {e}---")
-                final_answer_draft = "An error occurred during synthesis. I might not be able to provide a full answer."
-                if accumulated_relevant_chunks:
-                    final_answer_draft += (
-                        "\n\nBased on available information, but potentially unrefined: "
-                        + accumulated_relevant_chunks_content[:500]
-                        + "..."
-                    )
-                elif unanswerable_sub_queries:
-                    final_answer_draft += f"\n\nCould not answer specific parts: {', '.join(unanswerable_sub_queries)}"
+            return {
+                "final_answer_draft": final_answer_draft,
+                "report_formatted": format_answer(final_answer_draft, sources),
+                "context_packing_report": context_packing_report,
+                "next_agent_to_call": "END",
+            }
 
         print("---SYNTHESIZER AGENT: Draft Answer Generated. Moving to formatting.---")
 
         return {
-            **state,
             "final_answer_draft": final_answer_draft,
+            "context_packing_report": context_packing_report,
             "next_agent_to_call": "formatter_agent",
         }
@@ -0,0 +1,191 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.cache.sqlite_store import SQLiteKeyValueStore
+from src.config import ConfigurationManager
+from src.constants import (
+    BASE_DIR,
+    DEFAULT_EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+    DEFAULT_EMBEDDING_CACHE_MAX_MEMORY_ENTRIES,
+)
+from src.utils.common import create_directories
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that never sends the same text to the underlying model
+    twice. Vectors are keyed by a hash of (model, task, text) — queries and
+    documents are embedded with different task types, so they are cached
+    separately — and kept in an in-memory LRU in front of an optional SQLite
+    store shared by every process on the host.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        namespace: str,
+        max_memory_entries: int,
+        disk_store: Optional[SQLiteKeyValueStore] = None,
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.max_memory_entries = max_memory_entries
+        self.disk_store = disk_store
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "texts_requested": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "texts_embedded": 0,
+            "embed_calls": 0,
+            "memory_evictions": 0,
+        }
+
+    def _key(self, text: str, task: str) -> str:
+        return hashlib.sha256(
+            f"{self.namespace}\x00{task}\x00{text}".encode("utf-8")
+        ).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts, "document")
+        if missing:
+            self._store(
+                missing, self.embeddings.embed_documents(list(missing)), vectors
+            )
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text], "query")
+        if missing:
+            self._store(missing, [self.embeddings.embed_query(text)], vectors)
+        return vectors[text]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts, "document")
+        if missing:
+            embedded = await self.embeddings.aembed_documents(list(missing))
+            self._store(missing, embedded, vectors)
+        return [vectors[text] for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text], "query")
+        if missing:
+            self._store(missing, [await self.embeddings.aembed_query(text)], vectors)
+        return vectors[text]
+
+    def _lookup(
+        self, texts: List[str], task: str
+    ) -> Tuple[Dict[str, List[float]], Dict[str, str]]:
+        """
+        Returns the cached vectors by text, and the de-duplicated texts that
+        still need embedding mapped to their cache keys.
+        """
+        keys = {text: self._key(text, task) for text in texts}
+        vectors: Dict[str, List[float]] = {}
+
+        with self._lock:
+            self._counters["texts_requested"] += len(texts)
+            for text, key in keys.items():
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[text] = vector
+            self._counters["memory_hits"] += len(vectors)
+
+        pending = {text: key for text, key in keys.items() if text not in vectors}
+        if pending and self.disk_store is not None:
+            stored = self.disk_store.get_many(pending.values())
+            for text, key in list(pending.items()):
+                if key in stored:
+                    vector = np.frombuffer(stored[key], dtype=np.float32).tolist()
+                    vectors[text] = vector
+                    self._remember(key, vector)
+                    del pending[text]
+            with self._lock:
+                self._counters["disk_hits"] += len(stored)
+
+        return vectors, pending
+
+    def _store(
+        self,
+        missing: Dict[str, str],
+        embedded: List[List[float]],
+        vectors: Dict[str, List[float]],
+    ):
+        """Caches freshly embedded vectors and fills them into `vectors`."""
+        with self._lock:
+            self._counters["embed_calls"] += 1
+            self._counters["texts_embedded"] += len(missing)
+        for (text, key), vector in zip(missing.items(), embedded):
+            vector = list(vector)
+            vectors[text] = vector
+            self._remember(key, vector)
+        if self.disk_store is not None:
+            self.disk_store.put_many(
+                {
+                    key: np.asarray(vector, dtype=np.float32).tobytes()
+                    for key, vector in zip(missing.values(), embedded)
+                }
+            )
+
+    def _remember(self, key: str, vector: List[float]):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+                self._counters["memory_evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requested = self._counters["texts_requested"]
+            embedded = self._counters["texts_embedded"]
+            return {
+                **self._counters,
+                "embeds_saved": requested - embedded,
+                "savings_rate": (requested - embedded) / requested
+                if requested
+                else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self.disk_store) if self.disk_store else None,
+            }
+
+
+def with_embedding_cache(embeddings: Embeddings, model_name: str) -> Embeddings:
+    """
+    Wraps `embeddings` in a `CachedEmbeddings` configured from `cache_config`,
+    or returns it unchanged when the embedding cache is disabled.
+    """
+    cache_config = ConfigurationManager().get_cache_config()
+    if not cache_config.get("EMBEDDING_CACHE_ENABLED", False):
+        return embeddings
+
+    disk_store = None
+    if cache_config.get("EMBEDDING_CACHE_BACKEND", "memory") == "sqlite":
+        cache_dir = Path.joinpath(BASE_DIR, cache_config.get("CACHE_DIR", "cache"))
+        create_directories([cache_dir], verbose=False)
+        disk_store = SQLiteKeyValueStore(
+            cache_dir / "embeddings.sqlite3",
+            table="embeddings",
+            max_entries=cache_config.get(
+                "EMBEDDING_CACHE_MAX_DISK_ENTRIES",
+                DEFAULT_EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+            ),
+        )
+
+    return CachedEmbeddings(
+        embeddings,
+        namespace=model_name,
+        max_memory_entries=cache_config.get(
+            "EMBEDDING_CACHE_MAX_MEMORY_ENTRIES",
+            DEFAULT_EMBEDDING_CACHE_MAX_MEMORY_ENTRIES,
+        ),
+        disk_store=disk_store,
+    )
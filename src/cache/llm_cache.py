@@ -0,0 +1,189 @@
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from src.cache.sqlite_store import SQLiteKeyValueStore
+from src.config import ConfigurationManager
+from src.constants import (
+    BASE_DIR,
+    DEFAULT_LLM_CACHE_MAX_DISK_ENTRIES,
+    DEFAULT_LLM_CACHE_MAX_MEMORY_ENTRIES,
+)
+from src.utils.common import create_directories
+
+RETURN_VAL = Sequence[Generation]
+
+
+def response_cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Content address of one LLM call. `llm_string` is LangChain's serialization
+    of the model parameters (model name, temperature, ...) and `prompt` is the
+    fully rendered prompt, so any change to either produces a new key.
+    """
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Exact-match cache for LLM responses: an in-memory LRU in front of an
+    optional SQLite store. Lookups are counted per scope (usually the agent
+    name) so hit rates can be compared across agents.
+    """
+
+    def __init__(
+        self, max_memory_entries: int, disk_store: Optional[SQLiteKeyValueStore] = None
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.disk_store = disk_store
+        self._memory: "OrderedDict[str, RETURN_VAL]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "disk_hits": 0}
+        )
+        self.memory_evictions = 0
+
+    def get(self, key: str, scope: str) -> Optional[RETURN_VAL]:
+        with self._lock:
+            generations = self._memory.get(key)
+            if generations is not None:
+                self._memory.move_to_end(key)
+                self._counters[scope]["hits"] += 1
+                return generations
+
+        if self.disk_store is not None:
+            serialized = self.disk_store.get(key)
+            if serialized is not None:
+                generations = loads(serialized)
+                self._remember(key, generations)
+                with self._lock:
+                    self._counters[scope]["hits"] += 1
+                    self._counters[scope]["disk_hits"] += 1
+                return generations
+
+        with self._lock:
+            self._counters[scope]["misses"] += 1
+        return None
+
+    def put(self, key: str, generations: RETURN_VAL):
+        self._remember(key, generations)
+        if self.disk_store is not None:
+            self.disk_store.put(key, dumps(list(generations)))
+
+    def _remember(self, key: str, generations: RETURN_VAL):
+        with self._lock:
+            self._memory[key] = generations
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+                self.memory_evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_store is not None:
+            self.disk_store.clear()
+
+    def scoped(self, scope: str) -> "ScopedResponseCache":
+        return ScopedResponseCache(self, scope)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_scope = {}
+            for scope, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                per_scope[scope] = {
+                    **counters,
+                    "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+                }
+            return {
+                "memory_entries": len(self._memory),
+                "memory_evictions": self.memory_evictions,
+                "disk_entries": len(self.disk_store) if self.disk_store else None,
+                "disk_evictions": self.disk_store.evictions
+                if self.disk_store
+                else None,
+                "scopes": per_scope,
+            }
+
+
+class ScopedResponseCache(BaseCache):
+    """
+    LangChain cache view over a shared `ResponseCache` that attributes hits and
+    misses to one scope. Assign it to a chat model's `cache` field.
+    """
+
+    def __init__(self, response_cache: ResponseCache, scope: str):
+        self.response_cache = response_cache
+        self.scope = scope
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL]:
+        return self.response_cache.get(
+            response_cache_key(prompt, llm_string), self.scope
+        )
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL) -> None:
+        self.response_cache.put(response_cache_key(prompt, llm_string), return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.response_cache.clear()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_loaded = False
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Returns the process-wide LLM response cache, or None if it is disabled in
+    `cache_config`.
+    """
+    global _response_cache, _response_cache_loaded
+    if _response_cache_loaded:
+        return _response_cache
+
+    with _response_cache_lock:
+        if _response_cache_loaded:
+            return _response_cache
+
+        cache_config = ConfigurationManager().get_cache_config()
+        if cache_config.get("LLM_CACHE_ENABLED", False):
+            disk_store = None
+            if cache_config.get("LLM_CACHE_BACKEND", "memory") == "sqlite":
+                cache_dir = Path.joinpath(
+                    BASE_DIR, cache_config.get("CACHE_DIR", "cache")
+                )
+                create_directories([cache_dir], verbose=False)
+                disk_store = SQLiteKeyValueStore(
+                    cache_dir / "llm_responses.sqlite3",
+                    table="llm_responses",
+                    max_entries=cache_config.get(
+                        "LLM_CACHE_MAX_DISK_ENTRIES", DEFAULT_LLM_CACHE_MAX_DISK_ENTRIES
+                    ),
+                )
+            _response_cache = ResponseCache(
+                max_memory_entries=cache_config.get(
+                    "LLM_CACHE_MAX_MEMORY_ENTRIES", DEFAULT_LLM_CACHE_MAX_MEMORY_ENTRIES
+                ),
+                disk_store=disk_store,
+            )
+        _response_cache_loaded = True
+    return _response_cache
+
+
+def with_response_cache(llm, scope: str):
+    """
+    Returns a copy of `llm` whose calls go through the shared response cache
+    under `scope`, or `llm` itself when caching is disabled. The copy shares the
+    underlying API client.
+    """
+    response_cache = get_response_cache()
+    if response_cache is None:
+        return llm
+    return llm.model_copy(update={"cache": response_cache.scoped(scope)})
@@ -0,0 +1,259 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from src.config import ConfigurationManager
+from src.constants import (
+    DEFAULT_SEMANTIC_CACHE_MAX_ENTRIES,
+    DEFAULT_SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+    DEFAULT_SEMANTIC_CACHE_TTL_SECONDS,
+)
+from src.llm_config import get_embeddings
+from src.utils.db_utils import get_knowledge_base_version
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    embedding: np.ndarray
+    answer: str
+    created_at: float
+
+
+@dataclass
+class CacheLookup:
+    """Result of a lookup; the embedding is kept so a miss can be stored without re-embedding."""
+
+    embedding: np.ndarray
+    answer: Optional[str] = None
+    similarity: float = 0.0
+    matched_query: Optional[str] = None
+
+    @property
+    def hit(self) -> bool:
+        return self.answer is not None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    lookup_latency_ms: List[float] = field(default_factory=list)
+
+
+class SemanticAnswerCache:
+    """
+    Caches final formatted answers keyed on the embedding of the original query.
+    A lookup returns the stored answer of the most similar cached query when the
+    cosine similarity clears `similarity_threshold`. Entries expire after
+    `ttl_seconds`, the least recently used entry is evicted beyond `max_entries`,
+    and the whole cache is dropped when the knowledge base version changes.
+    """
+
+    LATENCY_WINDOW = 1000
+
+    def __init__(
+        self,
+        embeddings,
+        similarity_threshold: float,
+        ttl_seconds: float,
+        max_entries: int,
+        version_fn: Callable[[], str],
+    ):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._version = version_fn()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query: str) -> CacheLookup:
+        """Embeds `query` and returns the cached answer of its nearest neighbour, if close enough."""
+        started = time.perf_counter()
+        embedding = self._normalize(self.embeddings.embed_query(query))
+        return self._search(embedding, started)
+
+    async def alookup(self, query: str) -> CacheLookup:
+        """Async variant of `lookup` that awaits the embedding call."""
+        started = time.perf_counter()
+        embedding = self._normalize(await self.embeddings.aembed_query(query))
+        return self._search(embedding, started)
+
+    def store(self, query: str, answer: str, lookup: CacheLookup):
+        """Stores `answer` under the embedding computed by a previous `lookup`."""
+        key = self._key(query)
+        with self._lock:
+            self._check_version()
+            self._entries[key] = CacheEntry(
+                query=query,
+                embedding=lookup.embedding,
+                answer=answer,
+                created_at=time.time(),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def _search(self, embedding: np.ndarray, started: float) -> CacheLookup:
+        result = CacheLookup(embedding=embedding)
+        with self._lock:
+            self._check_version()
+            self._purge_expired()
+
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix_keys = list(self._entries.keys())
+                    self._matrix = np.stack(
+                        [self._entries[key].embedding for key in self._matrix_keys]
+                    )
+                similarities = self._matrix @ embedding
+                best = int(np.argmax(similarities))
+                result.similarity = float(similarities[best])
+
+                if result.similarity >= self.similarity_threshold:
+                    key = self._matrix_keys[best]
+                    entry = self._entries[key]
+                    self._entries.move_to_end(key)
+                    result.answer = entry.answer
+                    result.matched_query = entry.query
+
+            if result.hit:
+                self._stats.hits += 1
+            else:
+                self._stats.misses += 1
+            self._record_latency(started)
+
+        return result
+
+    def _check_version(self):
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                print(
+                    f"---SEMANTIC CACHE: Knowledge base changed, invalidating {len(self._entries)} cached answers.---"
+                )
+                self._stats.invalidations += len(self._entries)
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._stats.expirations += len(expired)
+            self._matrix = None
+
+    def _record_latency(self, started: float):
+        latencies = self._stats.lookup_latency_ms
+        latencies.append((time.perf_counter() - started) * 1000)
+        if len(latencies) > self.LATENCY_WINDOW:
+            del latencies[: -self.LATENCY_WINDOW]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats.hits + self._stats.misses
+            latencies = sorted(self._stats.lookup_latency_ms)
+            return {
+                "entries": len(self._entries),
+                "hits": self._stats.hits,
+                "misses": self._stats.misses,
+                "hit_rate": self._stats.hits / lookups if lookups else 0.0,
+                "evictions": self._stats.evictions,
+                "expirations": self._stats.expirations,
+                "invalidations": self._stats.invalidations,
+                "lookup_latency_ms_avg": (
+                    sum(latencies) / len(latencies) if latencies else 0.0
+                ),
+                "lookup_latency_ms_p95": (
+                    latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+                ),
+            }
+
+
+_semantic_cache: Optional[SemanticAnswerCache] = None
+_semantic_cache_loaded = False
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Returns the process-wide semantic answer cache, or None if it is disabled
+    in `cache_config`.
+    """
+    global _semantic_cache, _semantic_cache_loaded
+    if _semantic_cache_loaded:
+        return _semantic_cache
+
+    with _semantic_cache_lock:
+        if _semantic_cache_loaded:
+            return _semantic_cache
+
+        config = ConfigurationManager()
+        cache_config = config.get_cache_config()
+        knowledge_base_config = config.get_knowledge_base_config()
+        chroma_db_dir = knowledge_base_config["CHROMA_DB_DIR"]
+        manifest_path = knowledge_base_config["MANIFEST_PATH"]
+
+        if cache_config.get("SEMANTIC_CACHE_ENABLED", False):
+            _semantic_cache = SemanticAnswerCache(
+                embeddings=get_embeddings(),
+                similarity_threshold=cache_config.get(
+                    "SEMANTIC_CACHE_SIMILARITY_THRESHOLD",
+                    DEFAULT_SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+                ),
+                ttl_seconds=cache_config.get(
+                    "SEMANTIC_CACHE_TTL_SECONDS", DEFAULT_SEMANTIC_CACHE_TTL_SECONDS
+                ),
+                max_entries=cache_config.get(
+                    "SEMANTIC_CACHE_MAX_ENTRIES", DEFAULT_SEMANTIC_CACHE_MAX_ENTRIES
+                ),
+                version_fn=lambda: get_knowledge_base_version(
+                    chroma_db_dir, manifest_path
+                ),
+            )
+        _semantic_cache_loaded = True
+    return _semantic_cache
+
+
+def is_cacheable_answer(final_state) -> bool:
+    """Only answers grounded in retrieved chunks are worth serving again."""
+    return bool(final_state.get("report_formatted")) and bool(
+        final_state.get("accumulated_relevant_chunk_ids")
+    )
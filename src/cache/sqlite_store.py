@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+Value = Union[str, bytes]
+
+
+class SQLiteKeyValueStore:
+    """
+    Persistent key/value table shared across processes (WAL mode), bounded to
+    `max_entries` by evicting the least recently accessed rows. Reads only
+    refresh a row's access time once it is `TOUCH_INTERVAL_SECONDS` old, so
+    lookups of hot keys do not take the write lock.
+    """
+
+    MAX_KEYS_PER_QUERY = 500
+    TOUCH_INTERVAL_SECONDS = 60
+
+    def __init__(self, db_path: Path, table: str, max_entries: int):
+        self.db_path = db_path
+        self.table = table
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table} (last_access)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Value]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Value]:
+        keys = list(keys)
+        rows = []
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters per statement.
+            for start in range(0, len(keys), self.MAX_KEYS_PER_QUERY):
+                batch = keys[start : start + self.MAX_KEYS_PER_QUERY]
+                placeholders = ",".join("?" for _ in batch)
+                rows.extend(
+                    self._conn.execute(
+                        f"SELECT key, value, last_access FROM {self.table} "
+                        f"WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+            now = time.time()
+            stale = [
+                key
+                for key, _, last_access in rows
+                if now - last_access >= self.TOUCH_INTERVAL_SECONDS
+            ]
+            if stale:
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in stale],
+                )
+                self._conn.commit()
+        return {key: value for key, value, _ in rows}
+
+    def put(self, key: str, value: Value):
+        self.put_many({key: value})
+
+    def put_many(self, items: Dict[str, Value]):
+        if not items:
+            return
+        now = time.time()
+        keys = list(items)
+        with self._lock:
+            # Count the keys already stored, so `_count` stays current without
+            # a COUNT(*) per write.
+            existing = 0
+            for start in range(0, len(keys), self.MAX_KEYS_PER_QUERY):
+                batch = keys[start : start + self.MAX_KEYS_PER_QUERY]
+                placeholders = ",".join("?" for _ in batch)
+                existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM {self.table} WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchone()[0]
+            self._conn.executemany(
+                f"INSERT INTO {self.table} (key, value, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "value = excluded.value, last_access = excluded.last_access",
+                [(key, value, now) for key, value in items.items()],
+            )
+            self._count += len(keys) - existing
+            if self._count > self.max_entries:
+                # Other processes share the table, so recount before evicting.
+                self._count = self._conn.execute(
+                    f"SELECT COUNT(*) FROM {self.table}"
+                ).fetchone()[0]
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._count -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
@@ -1,28 +1,72 @@
 import os
+import threading
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 from src.constants import BASE_DIR
-from src.utils.common import read_json, create_directories
+from src.utils.common import create_directories, read_json
 
 load_dotenv()
 
+CONFIG_PATH = Path.joinpath(BASE_DIR, "config/config.json")
+
+_config = None
+_config_mtime_ns = None
+_config_lock = threading.Lock()
+_directories_created = False
+
+
+def _config_file_mtime_ns():
+    try:
+        return os.stat(CONFIG_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_config(force: bool = False) -> dict:
+    """
+    Returns the parsed `config/config.json`, read once per process. `force`
+    re-reads the file.
+    """
+    global _config, _config_mtime_ns, _directories_created
+    if _config is not None and not force:
+        return _config
+
+    with _config_lock:
+        if _config is None or force:
+            _config_mtime_ns = _config_file_mtime_ns()
+            _config = read_json(CONFIG_PATH)
+            _directories_created = False
+    return _config
+
+
+def reload_config_if_changed() -> bool:
+    """Re-reads the config file if it changed on disk; returns whether it did."""
+    if _config is not None and _config_file_mtime_ns() == _config_mtime_ns:
+        return False
+    load_config(force=True)
+    return True
+
 
 class ConfigurationManager:
     def __init__(self):
-        self.config = read_json(Path.joinpath(BASE_DIR, "config/config.json"))
+        self.config = load_config()
 
     def get_knowledge_base_config(self):
+        global _directories_created
         config = self.config["knowledge_base"]
-        create_directories([Path.joinpath(BASE_DIR, config["CHROMA_DB_DIR"])])
-        create_directories([Path.joinpath(BASE_DIR, config["RAW_DOCS_DIR"])])
-        #make ingest_manifest.json if it doesn't exist
-        
+        if not _directories_created:
+            create_directories([Path.joinpath(BASE_DIR, config["CHROMA_DB_DIR"])])
+            create_directories([Path.joinpath(BASE_DIR, config["RAW_DOCS_DIR"])])
+            _directories_created = True
+        # make ingest_manifest.json if it doesn't exist
+
         return config
 
     def get_llm_config(self):
-        config = self.config["llm_config"]
+        # A copy, so the API key never lands in the process-wide config.
+        config = dict(self.config["llm_config"])
         config["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY")
         return config
 
@@ -30,6 +74,22 @@ class ConfigurationManager:
         config = self.config["agent_config"]
         return config
 
+    def get_server_config(self):
+        config = self.config.get("server_config", {})
+        return config
+
+    def get_retrieval_config(self):
+        config = self.config.get("retrieval_config", {})
+        return config
+
+    def get_cache_config(self):
+        config = self.config.get("cache_config", {})
+        return config
+
+    def get_ingestion_config(self):
+        config = self.config.get("ingestion_config", {})
+        return config
+
 
 if __name__ == "__main__":
     config = ConfigurationManager()
@@ -3,3 +3,43 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DEFAULT_RETRIEVAL_K = 3
 MAX_RETRIEVAL_ATTEMPTS = 2
+DEFAULT_EXECUTION_MODE = "sequential"
+DEFAULT_MAX_CONCURRENT_QUERIES = 32
+DEFAULT_MAX_QUEUED_QUERIES = 64
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 30
+GRAPH_RECURSION_LIMIT = 200
+DEFAULT_SEMANTIC_CACHE_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_SEMANTIC_CACHE_TTL_SECONDS = 86400
+DEFAULT_SEMANTIC_CACHE_MAX_ENTRIES = 5000
+DEFAULT_LLM_CACHE_MAX_MEMORY_ENTRIES = 2048
+DEFAULT_LLM_CACHE_MAX_DISK_ENTRIES = 100000
+DEFAULT_EMBEDDING_CACHE_MAX_MEMORY_ENTRIES = 10000
+DEFAULT_EMBEDDING_CACHE_MAX_DISK_ENTRIES = 1000000
+DEFAULT_RETRY_K_INCREMENT = 3
+DEFAULT_QUERY_REWRITE_ENABLED = True
+DEFAULT_VECTOR_WEIGHT = 1.0
+DEFAULT_LEXICAL_WEIGHT = 1.0
+DEFAULT_RRF_K = 60
+DEFAULT_CANDIDATE_MULTIPLIER = 2
+DEFAULT_RERANK_CANDIDATES = 20
+DEFAULT_MMR_LAMBDA = 0.7
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_MAX_IN_FLIGHT_BATCHES = 4
+DEFAULT_MAX_BATCH_RETRIES = 5
+DEFAULT_RETRY_BACKOFF_SECONDS = 1.0
+DEFAULT_CHECKPOINT_EVERY_FILES = 50
+DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE = 3
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+DEFAULT_CONTEXT_SENTENCE_WINDOW = 1
+DEFAULT_ANSWER_MODE = "quality"
+DEFAULT_RELEVANCE_ACCEPT_THRESHOLD = 0.85
+DEFAULT_RELEVANCE_REJECT_THRESHOLD = 0.35
+DEFAULT_SIMPLE_QUERY_MAX_WORDS = 14
+DEFAULT_ROUTER_NEIGHBOUR_THRESHOLD = 0.9
+DEFAULT_DECOMPOSITION_CACHE_MAX_ENTRIES = 2000
+DEFAULT_READINESS_TTL_SECONDS = 30
+DEFAULT_CONFIG_RELOAD_SECONDS = 0
+DEFAULT_RETRIEVAL_CACHE_MAX_ENTRIES = 4096
+DEFAULT_BATCH_CONCURRENCY = 8
+DEFAULT_MAX_BATCH_QUERIES = 1000
+DEFAULT_EVALUATION_CONCURRENCY = 4
@@ -0,0 +1,134 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.retrieval.bm25_index import BM25Index
+
+
+class BatchUpserter:
+    """
+    Embeds and upserts chunks into the vector store in fixed-size batches,
+    with up to `max_in_flight` batches running concurrently. Each batch is
+    retried with exponential backoff. `add_file` blocks while the in-flight
+    window is full, which back-pressures the loading stage and keeps memory
+    flat regardless of corpus size.
+
+    `on_file_done(file_path, ok)` is called from the caller's thread once every
+    chunk of a file has been written (or a batch holding one of them failed
+    for good), so the caller can checkpoint the file in the manifest.
+    """
+
+    def __init__(
+        self,
+        vector_db: VectorStore,
+        bm25_index: Optional[BM25Index],
+        on_file_done: Callable[[str, bool], None],
+        batch_size: int,
+        max_in_flight: int,
+        max_retries: int,
+        backoff_seconds: float,
+    ):
+        self.vector_db = vector_db
+        self.bm25_index = bm25_index
+        self.on_file_done = on_file_done
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._buffer: List[Tuple[str, str, Document]] = []
+        self._in_flight: Dict = {}
+        self._remaining: Dict[str, int] = {}
+        self._failed_files: Set[str] = set()
+
+        self.batches_written = 0
+        self.chunks_written = 0
+        self.batches_failed = 0
+
+    def add_file(self, file_path: str, chunk_ids: List[str], chunks: List[Document]):
+        if not chunk_ids:
+            self.on_file_done(file_path, True)
+            return
+        self._remaining[file_path] = len(chunk_ids)
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            self._buffer.append((file_path, chunk_id, chunk))
+        while len(self._buffer) >= self.batch_size:
+            self._submit(self._buffer[: self.batch_size])
+            self._buffer = self._buffer[self.batch_size :]
+
+    def flush(self):
+        """Writes any partial batch and waits for every in-flight batch."""
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = []
+        while self._in_flight:
+            self._collect(block=True)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, batch: List[Tuple[str, str, Document]]):
+        while len(self._in_flight) >= self.max_in_flight:
+            self._collect(block=True)
+        future = self._executor.submit(self._write_with_retry, batch)
+        self._in_flight[future] = batch
+        self._collect(block=False)
+
+    def _collect(self, block: bool):
+        if not self._in_flight:
+            return
+        done, _ = wait(
+            list(self._in_flight),
+            timeout=None if block else 0,
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            batch = self._in_flight.pop(future)
+            try:
+                future.result()
+                self._on_batch_written(batch)
+            except Exception as e:
+                self.batches_failed += 1
+                print(f"Error writing batch of {len(batch)} chunks, giving up: {e}")
+                self._failed_files.update(file_path for file_path, _, _ in batch)
+            self._release(batch)
+
+    def _on_batch_written(self, batch: List[Tuple[str, str, Document]]):
+        self.batches_written += 1
+        self.chunks_written += len(batch)
+        if self.bm25_index is not None:
+            self.bm25_index.add(
+                [chunk_id for _, chunk_id, _ in batch], [chunk for _, _, chunk in batch]
+            )
+
+    def _release(self, batch: List[Tuple[str, str, Document]]):
+        for file_path, count in Counter(file_path for file_path, _, _ in batch).items():
+            self._remaining[file_path] -= count
+            if self._remaining[file_path] == 0:
+                del self._remaining[file_path]
+                ok = file_path not in self._failed_files
+                self._failed_files.discard(file_path)
+                self.on_file_done(file_path, ok)
+
+    def _write_with_retry(self, batch: List[Tuple[str, str, Document]]):
+        ids = [chunk_id for _, chunk_id, _ in batch]
+        chunks = [chunk for _, _, chunk in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.vector_db.add_documents(chunks, ids=ids)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2**attempt) * (1 + random.random())
+                print(
+                    f"---WARNING: Batch upsert failed ({e}), retrying in {delay:.1f}s "
+                    f"(attempt {attempt + 1}/{self.max_retries})---"
+                )
+                time.sleep(delay)
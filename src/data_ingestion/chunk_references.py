@@ -0,0 +1,128 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.retrieval.near_duplicates import NearDuplicateIndex
+
+
+class ChunkReferences:
+    """
+    Reference counts of the chunks that files' manifest entries point at. With
+    near-duplicate dedupe, and identical chunks in different files, several
+    files share one stored chunk, which is deleted only once no file
+    references it. Counts include files that are still being written.
+
+    A chunk another file is still writing is not in the store yet, so a file
+    that references it without writing it depends on that writer: it only
+    completes once the writer has, and fails if the writer fails. Otherwise
+    its manifest entry could point at a chunk that was never stored. Chunks
+    of a failed writer are dropped from the near-duplicate index and written
+    again by the next file that contains them.
+    """
+
+    def __init__(
+        self, manifest: dict, dedup_index: Optional[NearDuplicateIndex] = None
+    ):
+        self.counts = Counter(
+            chunk_id
+            for entry in manifest.values()
+            for chunk_id in entry_chunk_ids(entry)
+        )
+        self.dedup_index = dedup_index
+        self.sources_changed: Set[str] = set()
+        self._writers: Dict[str, str] = {}
+        self._writing: Dict[str, List[str]] = {}
+        self._waiting_on: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._written: Dict[str, bool] = {}
+        self._dependency_failed: Set[str] = set()
+        self._unstored: Set[str] = set()
+
+    def needs_write(self, chunk_id: str) -> bool:
+        """True unless the chunk is stored or being written by another file."""
+        return chunk_id not in self.counts or chunk_id in self._unstored
+
+    def reference(self, file_path: str, added_ids: List[str], new_ids: List[str]):
+        """
+        Counts a file's references to `added_ids`, of which it writes `new_ids`
+        itself; the rest must already be stored or written by another file.
+        """
+        self.counts.update(added_ids)
+        writers = {
+            self._writers[chunk_id]
+            for chunk_id in added_ids
+            if chunk_id in self._writers and chunk_id not in new_ids
+        }
+        writers.discard(file_path)
+        for chunk_id in new_ids:
+            self._writers[chunk_id] = file_path
+            self._unstored.discard(chunk_id)
+        self._writing[file_path] = list(new_ids)
+        self._waiting_on[file_path] = writers
+        for writer in writers:
+            self._dependents.setdefault(writer, set()).add(file_path)
+
+    def file_written(self, file_path: str, ok: bool) -> List[Tuple[str, bool]]:
+        """
+        Records that a file's own chunks are written (or failed) and returns
+        the files that are now complete, with whether they succeeded: the file
+        itself once every file it depends on is complete, and any dependents
+        this unblocked.
+        """
+        self._written[file_path] = ok
+        completed = []
+        ready = [file_path]
+        while ready:
+            current = ready.pop()
+            if self._waiting_on.get(current) or current not in self._written:
+                continue
+            ok = self._written.pop(current) and current not in self._dependency_failed
+            self._waiting_on.pop(current, None)
+            self._dependency_failed.discard(current)
+            own_ids = [
+                chunk_id
+                for chunk_id in self._writing.pop(current, ())
+                if self._writers.get(chunk_id) == current
+            ]
+            for chunk_id in own_ids:
+                del self._writers[chunk_id]
+            if not ok:
+                # Some of them may have been written, but none can be relied on.
+                self._unstored.update(own_ids)
+                if self.dedup_index is not None:
+                    self.dedup_index.remove(own_ids)
+            completed.append((current, ok))
+            for dependent in self._dependents.pop(current, ()):
+                self._waiting_on[dependent].discard(current)
+                if not ok:
+                    self._dependency_failed.add(dependent)
+                ready.append(dependent)
+        return completed
+
+    def release(self, file_path: str, chunk_ids: Iterable[str]) -> List[str]:
+        """Drops one file's references and returns the chunks nobody references."""
+        unreferenced = []
+        for chunk_id in chunk_ids:
+            self.counts[chunk_id] -= 1
+            if self.counts[chunk_id] <= 0:
+                del self.counts[chunk_id]
+                self._unstored.discard(chunk_id)
+                unreferenced.append(chunk_id)
+            elif self.dedup_index is not None and self.dedup_index.remove_source(
+                chunk_id, file_path
+            ):
+                self.sources_changed.add(chunk_id)
+        return unreferenced
+
+    def release_failed(self, file_path: str, added_ids: List[str]):
+        """
+        Drops the references a failed file added. Chunks nobody references
+        any more are forgotten by the near-duplicate index, so later files
+        cannot be deduped onto them.
+        """
+        unreferenced = self.release(file_path, added_ids)
+        if self.dedup_index is not None:
+            self.dedup_index.remove(unreferenced)
+
+
+def entry_chunk_ids(entry) -> List[str]:
+    return entry.get("chunk_ids", []) if isinstance(entry, dict) else []
@@ -0,0 +1,123 @@
+import hashlib
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import (
+    PyPDFLoader,
+    TextLoader,
+    UnstructuredMarkdownLoader,
+)
+from langchain_core.documents import Document
+
+from src.utils.common import get_chunk_id
+
+# Kept free of LLM/embedding imports: this module is imported by every worker
+# process of the ingestion pool.
+
+SUPPORTED_EXTENSIONS = {
+    ".pdf": PyPDFLoader,
+    ".txt": TextLoader,
+    ".md": UnstructuredMarkdownLoader,
+}
+
+TEXT_SPLITTER = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+
+
+@dataclass
+class LoadedFile:
+    """
+    Result of processing one raw file in a worker. `chunks` is None when the
+    content hash matched `known_hash` and the file was not parsed.
+    """
+
+    file_path: str
+    sha256: str = ""
+    chunk_ids: List[str] = field(default_factory=list)
+    chunks: Optional[List[Document]] = None
+    error: Optional[str] = None
+
+
+def hash_file(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def scan_raw_files(raw_data_path: str) -> Dict[str, os.stat_result]:
+    """Returns the supported files under `raw_data_path` with their `stat`."""
+    files = {}
+    for root, _, file_names in os.walk(raw_data_path):
+        for file in file_names:
+            file_path = os.path.join(root, file)
+            if os.path.splitext(file_path)[1] in SUPPORTED_EXTENSIONS:
+                files[file_path] = os.stat(file_path)
+            else:
+                print(f"Skipping unsupported file type: {file}")
+    return files
+
+
+def load_and_split(file_path: str) -> Tuple[List[str], List[Document]]:
+    """
+    Loads one file and splits it into chunks. Chunk IDs are derived from the
+    source path and chunk content, so re-ingesting an unchanged chunk always
+    yields the same ID and identical chunks collapse to one entry.
+    """
+    loader = SUPPORTED_EXTENSIONS[os.path.splitext(file_path)[1]](file_path)
+    pages = loader.load()
+    print(f"Loaded {len(pages)} pages from {os.path.basename(file_path)}")
+    chunks_by_id = {
+        get_chunk_id(chunk): chunk for chunk in TEXT_SPLITTER.split_documents(pages)
+    }
+    return list(chunks_by_id.keys()), list(chunks_by_id.values())
+
+
+def process_file(file_path: str, known_hash: Optional[str] = None) -> LoadedFile:
+    """Hashes a file and, unless its content is already known, parses and chunks it."""
+    try:
+        file_hash = hash_file(file_path)
+        if file_hash == known_hash:
+            return LoadedFile(file_path=file_path, sha256=file_hash)
+        chunk_ids, chunks = load_and_split(file_path)
+        return LoadedFile(
+            file_path=file_path, sha256=file_hash, chunk_ids=chunk_ids, chunks=chunks
+        )
+    except Exception as e:
+        return LoadedFile(file_path=file_path, error=str(e))
+
+
+def iter_loaded_files(
+    files: Iterable[Tuple[str, Optional[str]]], workers: int
+) -> Iterator[LoadedFile]:
+    """
+    Processes `(file_path, known_hash)` pairs and yields results as soon as
+    they are ready. With more than one worker, files are parsed and chunked in
+    a process pool; at most `2 * workers` files are in flight so parsed chunks
+    never pile up ahead of the embedding stage.
+    """
+    if workers <= 1:
+        for file_path, known_hash in files:
+            yield process_file(file_path, known_hash)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for file_path, known_hash in files:
+            pending.add(executor.submit(process_file, file_path, known_hash))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def resolve_worker_count(configured: Optional[int]) -> int:
+    """0 or None means one worker per CPU core."""
+    return configured if configured else (os.cpu_count() or 1)
@@ -1,69 +1,320 @@
 import os
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    UnstructuredMarkdownLoader,
-)
 from langchain_community.vectorstores import Chroma
 
-from src.constants import BASE_DIR
-from src.llm_config import EMBEDDINGS
+from src.cache.embedding_cache import CachedEmbeddings
+from src.constants import (
+    BASE_DIR,
+    DEFAULT_CHECKPOINT_EVERY_FILES,
+    DEFAULT_EMBED_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_RETRIES,
+    DEFAULT_MAX_IN_FLIGHT_BATCHES,
+    DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE,
+    DEFAULT_RETRY_BACKOFF_SECONDS,
+)
+from src.data_ingestion.batch_writer import BatchUpserter
+from src.data_ingestion.chunk_references import ChunkReferences, entry_chunk_ids
+from src.data_ingestion.document_loader import (
+    iter_loaded_files,
+    resolve_worker_count,
+    scan_raw_files,
+)
+from src.llm_config import get_embeddings
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.near_duplicates import NearDuplicateIndex
 from src.utils.common import create_directories, read_json, save_json
 
 
+def is_unchanged(entry, stat: os.stat_result) -> bool:
+    """
+    Cheap check that avoids opening a file: same size and mtime as recorded in
+    the manifest. Entries written by older manifests (`True`) never match.
+    """
+    return (
+        isinstance(entry, dict)
+        and entry.get("mtime_ns") == stat.st_mtime_ns
+        and entry.get("size") == stat.st_size
+    )
+
+
+def manifest_entry(file_hash: str, stat: os.stat_result, chunk_ids: List[str]) -> dict:
+    return {
+        "sha256": file_hash,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "chunk_ids": chunk_ids,
+    }
+
+
+def sync_sources_metadata(
+    db: Chroma, dedup_index: NearDuplicateIndex, chunk_ids: List[str]
+):
+    """Writes the current source list of each canonical chunk to its metadata."""
+    if not chunk_ids:
+        return
+    try:
+        stored = db.get(ids=chunk_ids, include=["metadatas"])
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            metadata = dict(metadata or {})
+            # Chroma metadata values must be scalars.
+            metadata["sources"] = "; ".join(dedup_index.sources(chunk_id))
+            ids.append(chunk_id)
+            metadatas.append(metadata)
+        if ids:
+            db._collection.update(ids=ids, metadatas=metadatas)
+        print(f"Updated sources of {len(ids)} shared chunks.")
+    except Exception as e:
+        print(f"Error updating sources metadata: {e}")
+
+
 def build_knowledge_base(
-    raw_data_path: str, collection_name: str, chroma_db_dir: str, mainfest_path: str
+    raw_data_path: str,
+    collection_name: str,
+    chroma_db_dir: str,
+    mainfest_path: str,
+    bm25_index_path: Optional[str] = None,
+    ingestion_config: Optional[dict] = None,
+    near_duplicate_index_path: Optional[str] = None,
 ):
+    """
+    Incrementally syncs the vector store (and BM25 index) with `raw_data_path`.
+    The manifest records each file's content hash, mtime, size and chunk IDs:
+    unchanged files are skipped without being opened, changed files have their
+    new chunks upserted and stale chunks deleted, and files that disappeared
+    have all of their chunks deleted.
+
+    Files are hashed, parsed and chunked in a process pool and streamed into
+    batched, concurrent embedding upserts, so memory stays flat. A file's
+    manifest entry is only updated once all of its chunks are written, and the
+    manifest is checkpointed every `CHECKPOINT_EVERY_FILES` files, so an
+    interrupted run resumes where it stopped.
+
+    With `NEAR_DUPLICATE_DEDUPE`, a chunk whose SimHash is close to a chunk
+    already in the store is not embedded again: the file references the
+    canonical chunk, whose `sources` metadata lists every file containing it.
+    """
     if not os.path.exists(raw_data_path):
         raise ValueError(f"Data directory {raw_data_path} does not exist.")
 
+    ingestion_config = ingestion_config or {}
     create_directories([Path.joinpath(BASE_DIR, chroma_db_dir)])
 
-    manifest = read_json(Path.joinpath(BASE_DIR, mainfest_path))
-    updated_manifest = manifest.copy()
+    manifest_file = Path.joinpath(BASE_DIR, mainfest_path)
+    manifest = read_json(manifest_file)
+    # Starts as the old manifest; entries are replaced as files complete.
+    checkpoint = dict(manifest)
 
-    documents = []
-    supported_extensions = {
-        ".pdf": PyPDFLoader,
-        ".txt": TextLoader,
-        ".md": UnstructuredMarkdownLoader,
-    }
+    current_files = scan_raw_files(raw_data_path)
+    files_to_check = []
+    for file_path, stat in current_files.items():
+        entry = manifest.get(file_path)
+        if not is_unchanged(entry, stat):
+            known_hash = entry.get("sha256") if isinstance(entry, dict) else None
+            files_to_check.append((file_path, known_hash))
+    removed_files = [
+        file_path for file_path in manifest if file_path not in current_files
+    ]
 
-    for root, _, files in os.walk(raw_data_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            extension = os.path.splitext(file_path)[1]
+    print(
+        f"Ingestion plan: {len(current_files) - len(files_to_check)} unchanged, "
+        f"{len(files_to_check)} to check, {len(removed_files)} removed files."
+    )
+    if not files_to_check and not removed_files:
+        print("Knowledge base is up to date.")
+        return
 
-            if file_path in updated_manifest:
-                print(f"Skipping already processed file: {file}")
-                continue
+    embeddings = get_embeddings()
+    db = Chroma(
+        persist_directory=chroma_db_dir,
+        embedding_function=embeddings,
+        collection_name=collection_name,
+    )
+    bm25_index = (
+        BM25Index(Path.joinpath(BASE_DIR, bm25_index_path)).load()
+        if bm25_index_path
+        else None
+    )
+    dedup_index = None
+    if near_duplicate_index_path and ingestion_config.get(
+        "NEAR_DUPLICATE_DEDUPE", False
+    ):
+        dedup_index = NearDuplicateIndex(
+            Path.joinpath(BASE_DIR, near_duplicate_index_path),
+            max_distance=ingestion_config.get(
+                "NEAR_DUPLICATE_MAX_DISTANCE", DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE
+            ),
+        ).load()
 
-            if extension in supported_extensions:
-                loader = supported_extensions[extension](file_path)
-                updated_manifest[file_path] = True
-                documents.extend(loader.load())
-                print(f"Loaded {len(loader.load())} pages from {file}")
-            else:
-                print(f"Skipping unsupported file type: {file}")
+    def save_checkpoint():
+        if bm25_index is not None:
+            bm25_index.save()
+        if dedup_index is not None:
+            dedup_index.save()
+        save_json(checkpoint, manifest_file)
 
-    if not documents:
-        print("No documents loaded. Please check your data directory and file types.")
-        return
+    # A chunk is deleted only once no file references it; with near-duplicate
+    # dedupe several files can share one canonical chunk.
+    references = ChunkReferences(manifest, dedup_index)
 
-    save_json(updated_manifest, Path.joinpath(BASE_DIR, mainfest_path))
+    def delete_chunks(chunk_ids: List[str]):
+        db.delete(ids=chunk_ids)
+        if bm25_index is not None:
+            bm25_index.remove(chunk_ids)
+        if dedup_index is not None:
+            dedup_index.remove(chunk_ids)
+
+    pending_files: Dict[str, Tuple[dict, List[str]]] = {}
+    counts = {"completed": 0, "failed": 0, "duplicates": 0, "deleted": 0}
+    checkpoint_every = ingestion_config.get(
+        "CHECKPOINT_EVERY_FILES", DEFAULT_CHECKPOINT_EVERY_FILES
+    )
+
+    def on_file_done(file_path: str, ok: bool):
+        # A file referencing chunks another file is still writing completes
+        # (or fails) together with that file.
+        for completed_path, completed_ok in references.file_written(file_path, ok):
+            finish_file(completed_path, completed_ok)
+
+    def finish_file(file_path: str, ok: bool):
+        new_entry, added_ids = pending_files.pop(file_path)
+        if not ok:
+            # The old entry stays, so the file is retried on the next run.
+            references.release_failed(file_path, added_ids)
+            counts["failed"] += 1
+            return
+
+        kept_ids = set(new_entry["chunk_ids"])
+        stale_ids = references.release(
+            file_path,
+            [i for i in entry_chunk_ids(manifest.get(file_path)) if i not in kept_ids],
+        )
+        if stale_ids:
+            try:
+                delete_chunks(stale_ids)
+                counts["deleted"] += len(stale_ids)
+            except Exception as e:
+                print(f"Error deleting stale chunks of {file_path}: {e}")
+        checkpoint[file_path] = new_entry
+        counts["completed"] += 1
+        if counts["completed"] % checkpoint_every == 0:
+            save_checkpoint()
+            print(f"Checkpoint: {counts['completed']} files ingested.")
+
+    upserter = BatchUpserter(
+        vector_db=db,
+        bm25_index=bm25_index,
+        on_file_done=on_file_done,
+        batch_size=ingestion_config.get("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE),
+        max_in_flight=ingestion_config.get(
+            "MAX_IN_FLIGHT_BATCHES", DEFAULT_MAX_IN_FLIGHT_BATCHES
+        ),
+        max_retries=ingestion_config.get(
+            "MAX_BATCH_RETRIES", DEFAULT_MAX_BATCH_RETRIES
+        ),
+        backoff_seconds=ingestion_config.get(
+            "RETRY_BACKOFF_SECONDS", DEFAULT_RETRY_BACKOFF_SECONDS
+        ),
+    )
+
+    workers = resolve_worker_count(ingestion_config.get("WORKERS"))
+    if files_to_check:
+        print(f"Processing {len(files_to_check)} files with {workers} workers...")
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    texts = text_splitter.split_documents(documents)
     try:
-        db = Chroma.from_documents(
-            texts,
-            EMBEDDINGS,
-            persist_directory=chroma_db_dir,
-            collection_name=collection_name,
+        for loaded in iter_loaded_files(files_to_check, workers):
+            file_path = loaded.file_path
+            entry = manifest.get(file_path)
+            stat = current_files[file_path]
+
+            if loaded.error:
+                print(f"Error loading {file_path}: {loaded.error}")
+                counts["failed"] += 1
+                continue
+
+            if loaded.chunks is None:
+                # Touched but identical content: refresh the stat fields only.
+                checkpoint[file_path] = manifest_entry(
+                    loaded.sha256, stat, entry["chunk_ids"]
+                )
+                continue
+
+            previous_ids = set(entry_chunk_ids(entry))
+            chunk_ids, new_ids, new_chunks = [], [], []
+            for chunk_id, chunk in zip(loaded.chunk_ids, loaded.chunks):
+                if chunk_id not in previous_ids and dedup_index is not None:
+                    canonical_id, signature = dedup_index.find(chunk.page_content)
+                    if canonical_id is not None and canonical_id != chunk_id:
+                        # Reference the canonical copy instead of embedding another.
+                        if dedup_index.add_source(canonical_id, file_path):
+                            references.sources_changed.add(canonical_id)
+                        counts["duplicates"] += 1
+                        chunk_id = canonical_id
+                    else:
+                        dedup_index.add(
+                            chunk_id, signature, file_path, chunk.page_content
+                        )
+                        chunk.metadata["sources"] = file_path
+                if chunk_id in chunk_ids:
+                    continue
+                chunk_ids.append(chunk_id)
+                if chunk_id not in previous_ids and references.needs_write(chunk_id):
+                    new_ids.append(chunk_id)
+                    new_chunks.append(chunk)
+
+            added_ids = [
+                chunk_id for chunk_id in chunk_ids if chunk_id not in previous_ids
+            ]
+            references.reference(file_path, added_ids, new_ids)
+            pending_files[file_path] = (
+                manifest_entry(loaded.sha256, stat, chunk_ids),
+                added_ids,
+            )
+            upserter.add_file(file_path, new_ids, new_chunks)
+
+        upserter.flush()
+    finally:
+        upserter.close()
+        # Whatever finished before an interruption is kept for the next run.
+        if upserter.batches_written or checkpoint != manifest:
+            save_checkpoint()
+
+    for file_path in removed_files:
+        print(f"Removing chunks of deleted file: {os.path.basename(file_path)}")
+        unreferenced = references.release(
+            file_path, entry_chunk_ids(checkpoint[file_path])
         )
-        db.persist()
-    except Exception as e:
-        print(f"Error creating vector database: {e}")
+        try:
+            if unreferenced:
+                delete_chunks(unreferenced)
+                counts["deleted"] += len(unreferenced)
+            del checkpoint[file_path]
+        except Exception as e:
+            print(f"Error deleting chunks of {file_path}: {e}")
+
+    sources_changed = references.sources_changed
+    if dedup_index is not None and sources_changed:
+        sync_sources_metadata(
+            db,
+            dedup_index,
+            sorted(
+                chunk_id
+                for chunk_id in sources_changed
+                if chunk_id in references.counts
+            ),
+        )
+
+    if checkpoint != manifest or sources_changed:
+        save_checkpoint()
+
+    print(
+        f"Ingestion finished: {counts['completed']} files ingested, {counts['failed']} failed, "
+        f"{upserter.chunks_written} chunks upserted in {upserter.batches_written} batches, "
+        f"{counts['duplicates']} near-duplicate chunks merged, {counts['deleted']} chunks deleted."
+    )
+    if bm25_index is not None:
+        print(f"BM25 index: {len(bm25_index)} chunks indexed.")
+    if isinstance(embeddings, CachedEmbeddings):
+        print(f"Embedding cache: {embeddings.stats()}")
@@ -1,17 +1,31 @@
+import argparse
+import asyncio
 import os
+from typing import Any, Dict, List, Optional, Union
+
 import pandas as pd
-from typing import List, Dict, Any
-from tqdm import tqdm
 from dotenv import load_dotenv
-
-load_dotenv()
-
 from langchain.evaluation import EvaluatorType, load_evaluator
+from tqdm import tqdm
 
-from src.graph.agent_workflow import create_rag_agent_workflow
-from src.models import AgentState
+from src.cache.llm_cache import with_response_cache
 from src.config import ConfigurationManager
-from src.llm_config import LLM
+from src.constants import DEFAULT_EVALUATION_CONCURRENCY, GRAPH_RECURSION_LIMIT
+from src.graph.agent_workflow import create_rag_agent_workflow
+from src.graph.batch_runner import (
+    BatchItem,
+    BatchResultWriter,
+    load_batch_items,
+    parse_batch_items,
+    read_result_records,
+)
+from src.llm_config import get_llm
+from src.models import build_initial_state, relevant_chunks
+
+load_dotenv()
+
+# Results with these statuses are evaluated again when a suite resumes.
+RETRY_STATUSES = ("Agent Error", "Evaluation Error")
 
 
 class RAGEvaluator:
@@ -21,7 +35,7 @@ class RAGEvaluator:
 
     def __init__(self, chroma_db_dir=None):
         self.rag_app = create_rag_agent_workflow()
-        self.evaluation_llm = LLM
+        self.evaluation_llm = with_response_cache(get_llm(), "rag_evaluator")
         self.faithfulness_evaluator = load_evaluator(
             EvaluatorType.SCORE_STRING,
             criteria="faithfulness",
@@ -34,86 +48,100 @@ class RAGEvaluator:
         )
         self.chroma_db_dir = chroma_db_dir
 
-    def _run_agent_and_get_results(self, query: str) -> Dict[str, Any]:
-        """Runs the RAG agent and returns the final state."""
-        initial_state: AgentState = {
-            "original_query": query,
-            "sub_queries_list": [],
-            "current_sub_query_index": 0,
-            "current_sub_query": "",
-            "retrieved_chunks": [],
-            "evaluated_sufficiency": False,
-            "evaluator_feedback": "",
-            "retrieval_attempts": 0,
-            "accumulated_relevant_chunks": [],
-            "unanswerable_sub_queries": [],
-            "final_answer_draft": "",
-            "report_formatted": "",
-            "next_agent_to_call": "research_agent",
-        }
-        final_state = self.rag_app.invoke(initial_state, config={"recursion_limit": 200})
-        return final_state
+    async def _arun_agent_and_get_results(self, query: str) -> Dict[str, Any]:
+        initial_state = build_initial_state(query)
+        return await self.rag_app.ainvoke(
+            initial_state, config={"recursion_limit": GRAPH_RECURSION_LIMIT}
+        )
 
     def evaluate_query(self, query: str) -> Dict[str, Any]:
         """
-        Runs the agent for a single query and evaluates its output.
+        Runs the agent for a single query and evaluates its output. This starts
+        its own event loop with `asyncio.run`, so it raises `RuntimeError` when
+        called from a running loop (e.g. Jupyter); await `aevaluate_query` there.
         """
-        print(f"\n--- Evaluating query: '{query}' ---")
-        agent_output = self._run_agent_and_get_results(query)
-        generated_answer = agent_output.get("report_formatted", "")
-        retrieved_contexts_content = "\n\n".join(
-            [
-                doc.page_content
-                for doc in agent_output.get("accumulated_relevant_chunks", [])
-            ]
-        )
+        return asyncio.run(self.aevaluate_query(query))
 
+    async def aevaluate_query(
+        self, query: str, query_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Runs the agent for a single query, then the faithfulness and answer
+        relevance judges concurrently. Agent failures are recorded as an
+        "Agent Error" result instead of aborting the suite.
+        """
+        print(f"\n--- Evaluating query: '{query}' ---")
         results = {
+            "id": query_id,
             "query": query,
-            "generated_answer": generated_answer,
-            "retrieved_contexts_count": len(
-                agent_output.get("accumulated_relevant_chunks", [])
-            ),
-            "unanswerable_sub_queries": ", ".join(
-                agent_output.get("unanswerable_sub_queries", [])
-            ),
+            "generated_answer": "",
+            "retrieved_contexts_count": 0,
+            "unanswerable_sub_queries": "",
             "faithfulness_score": None,
             "faithfulness_reasoning": None,
             "answer_relevance_score": None,
             "answer_relevance_reasoning": None,
-            "status": "Success" if generated_answer else "Failed",
+            "status": "Failed",
         }
 
+        try:
+            agent_output = await self._arun_agent_and_get_results(query)
+        except Exception as e:
+            print(f"Error running the agent for query '{query}': {e}")
+            results["status"] = "Agent Error"
+            results["faithfulness_reasoning"] = f"Agent failed: {e}"
+            return results
+
+        generated_answer = agent_output.get("report_formatted", "")
+        retrieved_contexts = relevant_chunks(agent_output)
+        retrieved_contexts_content = "\n\n".join(
+            [doc.page_content for doc in retrieved_contexts]
+        )
+        results.update(
+            generated_answer=generated_answer,
+            retrieved_contexts_count=len(retrieved_contexts),
+            unanswerable_sub_queries=", ".join(
+                agent_output.get("unanswerable_sub_queries", [])
+            ),
+            status="Success" if generated_answer else "Failed",
+        )
+
         if not generated_answer:
             print("No answer generated for evaluation.")
             return results
 
         try:
-            # Evaluate Faithfulness (Generated Answer vs. Retrieved Contexts)
-            faithfulness_eval_result = self.faithfulness_evaluator.evaluate_strings(
-                prediction=generated_answer,
-                input=query,  # Pass the original query as input
-                reference=retrieved_contexts_content,  # Crucially, pass the retrieved content here
+            # Faithfulness (Generated Answer vs. Retrieved Contexts) and
+            # Answer Relevance (Generated Answer vs. Original Query) are
+            # independent, so both judges run at once.
+            (
+                faithfulness_eval_result,
+                answer_relevance_eval_result,
+            ) = await asyncio.gather(
+                self.faithfulness_evaluator.aevaluate_strings(
+                    prediction=generated_answer,
+                    input=query,  # Pass the original query as input
+                    reference=retrieved_contexts_content,  # Crucially, pass the retrieved content here
+                ),
+                self.answer_relevance_evaluator.aevaluate_strings(
+                    prediction=generated_answer,
+                    input=query,  # Only need the query here
+                ),
             )
             results["faithfulness_score"] = faithfulness_eval_result.get("score")
             results["faithfulness_reasoning"] = faithfulness_eval_result.get(
                 "reasoning"
             )
-            print(f"  Faithfulness Score: {results['faithfulness_score']}")
-
-            # Evaluate Answer Relevance (Generated Answer vs. Original Query)
-            answer_relevance_eval_result = (
-                self.answer_relevance_evaluator.evaluate_strings(
-                    prediction=generated_answer, input=query  # Only need the query here
-                )
-            )
             results["answer_relevance_score"] = answer_relevance_eval_result.get(
                 "score"
             )
             results["answer_relevance_reasoning"] = answer_relevance_eval_result.get(
                 "reasoning"
             )
-            print(f"  Answer Relevance Score: {results['answer_relevance_score']}")
+            print(
+                f"  '{query}': Faithfulness Score: {results['faithfulness_score']}, "
+                f"Answer Relevance Score: {results['answer_relevance_score']}"
+            )
 
         except Exception as e:
             print(f"Error during evaluation for query '{query}': {e}")
@@ -123,9 +151,33 @@ class RAGEvaluator:
 
         return results
 
-    def run_evaluation_suite(self, test_queries: List[str]) -> pd.DataFrame:
+    def run_evaluation_suite(
+        self,
+        test_queries: List[Union[str, Dict[str, Any], BatchItem]],
+        results_path: Optional[str] = None,
+        concurrency: int = DEFAULT_EVALUATION_CONCURRENCY,
+    ) -> pd.DataFrame:
         """
         Runs the RAG agent and evaluates it across a suite of test queries.
+        See `arun_evaluation_suite`. Like `evaluate_query`, this uses
+        `asyncio.run`, so await `arun_evaluation_suite` from a running loop.
+        """
+        return asyncio.run(
+            self.arun_evaluation_suite(test_queries, results_path, concurrency)
+        )
+
+    async def arun_evaluation_suite(
+        self,
+        test_queries: List[Union[str, Dict[str, Any], BatchItem]],
+        results_path: Optional[str] = None,
+        concurrency: int = DEFAULT_EVALUATION_CONCURRENCY,
+    ) -> pd.DataFrame:
+        """
+        Evaluates up to `concurrency` queries at a time. With `results_path`,
+        each query's result is appended there (JSONL) as soon as it completes,
+        and queries already evaluated there are skipped, so an interrupted
+        suite resumes where it stopped. Agent and judge errors are retried on
+        the next run.
         """
         if not os.path.exists(self.chroma_db_dir) or not os.listdir(self.chroma_db_dir):
             print(
@@ -136,30 +188,97 @@ class RAGEvaluator:
             )
             return pd.DataFrame()
 
-        all_results = []
-        for query in tqdm(test_queries, desc="Running evaluations"):
-            result = self.evaluate_query(query)
-            all_results.append(result)
+        items = parse_batch_items(
+            [
+                {"id": query.id, "query": query.query}
+                if isinstance(query, BatchItem)
+                else query
+                for query in test_queries
+            ]
+        )
+
+        writer = BatchResultWriter(results_path) if results_path else None
+        completed_ids = writer.completed_ids(RETRY_STATUSES) if writer else set()
+        pending = [item for item in items if item.id not in completed_ids]
+        if completed_ids:
+            print(
+                f"Resuming evaluation: {len(items) - len(pending)} of {len(items)} queries already evaluated."
+            )
 
-        df = pd.DataFrame(all_results)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        all_results: Dict[str, Dict[str, Any]] = {}
+
+        async def evaluate_item(item: BatchItem) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aevaluate_query(item.query, item.id)
+
+        tasks = [asyncio.ensure_future(evaluate_item(item)) for item in pending]
+        try:
+            with tqdm(total=len(pending), desc="Running evaluations") as progress:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    all_results[result["id"]] = result
+                    if writer:
+                        writer.write(result)
+                    progress.update(1)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if writer:
+                writer.close()
+
+        if writer:
+            # Include the results of earlier (resumed) runs.
+            all_results = {
+                **read_result_records(str(writer.progress_path)),
+                **all_results,
+            }
+
+        df = pd.DataFrame(
+            [all_results[item.id] for item in items if item.id in all_results]
+        )
         return df
 
 
+def load_evaluation_dataset(path: str) -> List[BatchItem]:
+    """
+    Loads evaluation queries from a JSONL file (a query string or an object
+    with `query` and optional `id` per line) or a CSV file with a `query`
+    column and optional `id` column.
+    """
+    return load_batch_items(path)
+
+
 if __name__ == "__main__":
-    # Example Test Queries (In a real scenario, load from a JSON/CSV dataset)
+    parser = argparse.ArgumentParser(
+        description="Evaluate the RAG agent on a query dataset."
+    )
+    parser.add_argument(
+        "dataset", help="JSONL or CSV file of queries (see load_evaluation_dataset)."
+    )
+    parser.add_argument(
+        "--results",
+        default="rag_evaluation_results.jsonl",
+        help="Per-query results, appended as they complete; re-running resumes from it.",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_EVALUATION_CONCURRENCY
+    )
+    parser.add_argument("--output", default="rag_evaluation_results.csv")
+    args = parser.parse_args()
+
     config = ConfigurationManager()
     knowledge_base_config = config.get_knowledge_base_config()
     chroma_db_dir = knowledge_base_config["CHROMA_DB_DIR"]
 
-    test_queries = [
-        # "What is the warranty period for the QuantumFlow QF-2025",
-        "What is the storage capacity of the QuantumFlow?",
-        "what is the probable cause and solutions for strange taste ot odor in purified water",
-        # "what is the probable cause and solutions for water leakage",
-    ]
+    test_queries = load_evaluation_dataset(args.dataset)
 
     evaluator = RAGEvaluator(chroma_db_dir)
-    evaluation_df = evaluator.run_evaluation_suite(test_queries)
+    evaluation_df = evaluator.run_evaluation_suite(
+        test_queries, results_path=args.results, concurrency=args.concurrency
+    )
+    if evaluation_df.empty:
+        raise SystemExit(1)
 
     print("\n--- Evaluation Summary ---")
     print(
@@ -169,7 +288,7 @@ if __name__ == "__main__":
     )
 
     # Optionally save results to CSV
-    output_filename = "rag_evaluation_results.csv"
+    output_filename = args.output
     evaluation_df.to_csv(output_filename, index=False)
     print(f"\nDetailed evaluation results saved to {output_filename}")
 
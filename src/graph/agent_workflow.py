@@ -1,64 +1,160 @@
+import threading
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 
 from src.agents.evaluator_agent import EvaluatorAgent
 from src.agents.formatter_agent import FormatterAgent
 from src.agents.research_agent import ResearchAgent
 from src.agents.retriever_agent import RetrieverAgent
+from src.agents.sub_query_batch_agent import SubQueryBatchAgent
+from src.agents.sub_query_worker_agent import SubQueryWorkerAgent
 from src.agents.supervisor_agent import SupervisorAgent
 from src.agents.synthesizer_agent import SynthesizerAgent
+from src.config import ConfigurationManager
 from src.models import AgentState
 
-# Initialize agent instances
-research_agent = ResearchAgent()
-retriever_agent = RetrieverAgent()
-evaluator_agent = EvaluatorAgent()
-synthesizer_agent = SynthesizerAgent()
-formatter_agent = FormatterAgent()
-supervisor_agent = SupervisorAgent()
+_rag_app = None
+_rag_app_lock = threading.Lock()
+
+
+def make_router(
+    supervisor_agent: SupervisorAgent, sub_query_worker_agent: SubQueryWorkerAgent
+):
+    def route_next_agent(state: AgentState):
+        """
+        Routes from any agent straight to the next node chosen by the
+        supervisor policy. A `sub_query_fanout` request is expanded into one
+        parallel `sub_query_worker` branch per sub-query.
+        """
+        next_agent = supervisor_agent.route(state)
+        if next_agent == "sub_query_fanout":
+            return sub_query_worker_agent.fan_out(state)
+        return next_agent
+
+    return route_next_agent
+
+
+def as_node(run, arun) -> RunnableLambda:
+    """
+    Wraps an agent's sync and async entry points into a single graph node, so
+    `invoke` uses `run` and `ainvoke` awaits `arun` without a thread-pool hop.
+    """
+    return RunnableLambda(run, afunc=arun)
 
 
 def create_rag_agent_workflow():
     """
-    Defines and compiles the LangGraph workflow for the RAG agent.
+    Defines and compiles the LangGraph workflow for the RAG agent. Every agent
+    routes to its successor through a conditional edge, so each step of a run
+    is a single super-step. In the "fast" answer mode the synthesizer writes
+    the final answer itself, so the formatter node is left out of the graph.
     """
+    # Initialize agent instances
+    research_agent = ResearchAgent()
+    retriever_agent = RetrieverAgent()
+    evaluator_agent = EvaluatorAgent()
+    synthesizer_agent = SynthesizerAgent()
+    formatter_agent = FormatterAgent()
+    supervisor_agent = SupervisorAgent(
+        time_budget_seconds=ConfigurationManager()
+        .get_agent_config()
+        .get("QUERY_TIME_BUDGET_SECONDS")
+    )
+    sub_query_worker_agent = SubQueryWorkerAgent(retriever_agent, evaluator_agent)
+    sub_query_batch_agent = SubQueryBatchAgent(retriever_agent, evaluator_agent)
+    route_next_agent = make_router(supervisor_agent, sub_query_worker_agent)
+
+    quality_mode = synthesizer_agent.answer_mode != "fast"
     workflow = StateGraph(AgentState)
 
     # Add nodes
-    workflow.add_node("supervisor", supervisor_agent.run)
-    workflow.add_node("research_agent", research_agent.run)
-    workflow.add_node("retriever_agent", retriever_agent.run)
-    workflow.add_node("evaluator_agent", evaluator_agent.run)
-    workflow.add_node("synthesizer_agent", synthesizer_agent.run)
-    workflow.add_node("formatter_agent", formatter_agent.run)
+    workflow.add_node(
+        "research_agent", as_node(research_agent.run, research_agent.arun)
+    )
+    workflow.add_node(
+        "retriever_agent", as_node(retriever_agent.run, retriever_agent.arun)
+    )
+    workflow.add_node(
+        "evaluator_agent", as_node(evaluator_agent.run, evaluator_agent.arun)
+    )
+    workflow.add_node(
+        "synthesizer_agent", as_node(synthesizer_agent.run, synthesizer_agent.arun)
+    )
+    if quality_mode:
+        workflow.add_node(
+            "formatter_agent", as_node(formatter_agent.run, formatter_agent.arun)
+        )
+    workflow.add_node(
+        "sub_query_worker",
+        as_node(sub_query_worker_agent.run, sub_query_worker_agent.arun),
+    )
+    workflow.add_node(
+        "sub_query_join",
+        as_node(sub_query_worker_agent.collect, sub_query_worker_agent.acollect),
+    )
+    workflow.add_node(
+        "sub_query_batch",
+        as_node(sub_query_batch_agent.run, sub_query_batch_agent.arun),
+    )
+
+    routes = {
+        "research_agent": "research_agent",
+        "retriever_agent": "retriever_agent",
+        "evaluator_agent": "evaluator_agent",
+        "sub_query_worker": "sub_query_worker",
+        "sub_query_batch": "sub_query_batch",
+        "synthesizer_agent": "synthesizer_agent",
+        "END": END,
+    }
+    if quality_mode:
+        routes["formatter_agent"] = "formatter_agent"
 
     # Set entry point
-    workflow.set_entry_point("supervisor")
-
-    workflow.add_edge("research_agent", "supervisor")
-    workflow.add_edge("retriever_agent", "supervisor")
-    workflow.add_edge("evaluator_agent", "supervisor")
-    workflow.add_edge("synthesizer_agent", "supervisor")
-    workflow.add_edge("formatter_agent", "supervisor")
-
-    workflow.add_conditional_edges(
-        "supervisor",
-        lambda state: state["next_agent_to_call"],
-        {
-            "research_agent": "research_agent",
-            "retriever_agent": "retriever_agent",
-            "evaluator_agent": "evaluator_agent",
-            "synthesizer_agent": "synthesizer_agent",
-            "formatter_agent": "formatter_agent",
-            "END": END,
-            "FATAL_ERROR": END,
-            "end_workflow": END,
-        },
-    )
+    workflow.set_conditional_entry_point(route_next_agent, routes)
+
+    for node in (
+        "research_agent",
+        "retriever_agent",
+        "evaluator_agent",
+        "synthesizer_agent",
+        "sub_query_join",
+        "sub_query_batch",
+    ):
+        workflow.add_conditional_edges(node, route_next_agent, routes)
+    if quality_mode:
+        workflow.add_conditional_edges("formatter_agent", route_next_agent, routes)
+    workflow.add_edge("sub_query_worker", "sub_query_join")
 
     app = workflow.compile()
 
     return app
 
 
+def get_rag_agent_workflow():
+    """
+    Returns the process-wide compiled workflow, built on first use so that
+    importing this module does not construct agents, LLM clients or the
+    vector store.
+    """
+    global _rag_app
+    if _rag_app is None:
+        with _rag_app_lock:
+            if _rag_app is None:
+                _rag_app = create_rag_agent_workflow()
+    return _rag_app
+
+
+def rag_agent_workflow_loaded() -> bool:
+    return _rag_app is not None
+
+
+def reset_rag_agent_workflow():
+    """Drops the compiled workflow so the next request rebuilds its agents."""
+    global _rag_app
+    with _rag_app_lock:
+        _rag_app = None
+
+
 if __name__ == "__main__":
     compiled_app = create_rag_agent_workflow()
@@ -0,0 +1,310 @@
+import asyncio
+import csv
+import json
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from src.cache.semantic_cache import get_semantic_cache, is_cacheable_answer
+from src.constants import GRAPH_RECURSION_LIMIT
+from src.graph.agent_workflow import get_rag_agent_workflow
+from src.models import build_initial_state
+from src.utils.concurrency import ConcurrencyLimiter
+
+
+@dataclass
+class BatchItem:
+    id: str
+    query: str
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def parse_batch_items(records: Iterable[Any]) -> List[BatchItem]:
+    """
+    Turns batch records into `BatchItem`s. A record is either a query string or
+    an object with a `query` and an optional `id`; items without an id are
+    numbered by their (1-based) position.
+    """
+    items = []
+    for position, record in enumerate(records, start=1):
+        if isinstance(record, str):
+            record = {"query": record}
+        if not isinstance(record, dict) or not str(record.get("query", "")).strip():
+            raise ValueError(f"Batch item {position} has no query: {record!r}")
+        items.append(
+            BatchItem(id=str(record.get("id", position)), query=record["query"])
+        )
+
+    seen = set()
+    for item in items:
+        if item.id in seen:
+            raise ValueError(f"Duplicate batch item id: {item.id!r}")
+        seen.add(item.id)
+    return items
+
+
+def load_batch_items(path: str) -> List[BatchItem]:
+    """
+    Reads queries from a JSONL file (one string or object per line) or a CSV
+    file with a `query` column and an optional `id` column.
+    """
+    if Path(path).suffix.lower() == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = [
+                {
+                    key: value
+                    for key, value in row.items()
+                    if key in ("id", "query") and value
+                }
+                for row in csv.DictReader(f)
+            ]
+        return parse_batch_items(rows)
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(
+                    f"{path}:{line_number} is not valid JSON: {e}"
+                ) from None
+    return parse_batch_items(records)
+
+
+class BatchQueryRunner:
+    """
+    Answers a batch of queries with at most `concurrency` agent runs in flight.
+
+    Repeated queries (compared case- and whitespace-insensitively) run once and
+    their result is reported for every item that asked them. Sub-query
+    retrievals and embeddings are shared across the batch through the
+    process-wide retrieval and embedding caches. When `limiter` is given (the
+    API server's), every run also takes one of its slots, so a batch cannot
+    starve interactive queries beyond its own concurrency.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        use_cache: bool = True,
+        limiter: Optional[ConcurrencyLimiter] = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.use_cache = use_cache
+        self.limiter = limiter
+        self._counters = {
+            "items": 0,
+            "unique_queries": 0,
+            "completed": 0,
+            "errors": 0,
+            "cached": 0,
+        }
+        self._started_at: Optional[float] = None
+
+    async def run(self, items: List[BatchItem]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields one result record per item, in completion order, as soon as the
+        run answering it finishes.
+        """
+        groups: Dict[str, List[BatchItem]] = {}
+        for item in items:
+            groups.setdefault(normalize_query(item.query), []).append(item)
+
+        self._started_at = time.perf_counter()
+        self._counters["items"] += len(items)
+        self._counters["unique_queries"] += len(groups)
+        print(
+            f"---BATCH: {len(items)} queries ({len(groups)} unique), concurrency {self.concurrency}---"
+        )
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def answer_group(members: List[BatchItem]):
+            async with semaphore:
+                return members, await self._answer(members[0].query)
+
+        tasks = [
+            asyncio.ensure_future(answer_group(members)) for members in groups.values()
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                members, result = await next_done
+                for item in members:
+                    self._counters["completed"] += 1
+                    self._counters["errors"] += result["status"] == "error"
+                    self._counters["cached"] += result["cached"]
+                    yield {"id": item.id, "query": item.query, **result}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _answer(self, query: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        result = {
+            "answer": None,
+            "status": "ok",
+            "cached": False,
+            "grounded": False,
+            "error": None,
+        }
+
+        semantic_cache = get_semantic_cache() if self.use_cache else None
+        cache_lookup = None
+        if semantic_cache is not None:
+            try:
+                cache_lookup = await semantic_cache.alookup(query)
+            except Exception as e:
+                print(
+                    f"---BATCH: Semantic cache lookup failed, running the agent instead: {e}---"
+                )
+            if cache_lookup is not None and cache_lookup.hit:
+                result.update(answer=cache_lookup.answer, cached=True, grounded=True)
+                result["seconds"] = time.perf_counter() - started
+                return result
+
+        try:
+            async with self._slot():
+                final_state = await get_rag_agent_workflow().ainvoke(
+                    build_initial_state(query),
+                    config={"recursion_limit": GRAPH_RECURSION_LIMIT},
+                )
+        except Exception as e:
+            print(f"---BATCH: Error answering '{query}': {e}---")
+            result.update(status="error", error=str(e))
+            result["seconds"] = time.perf_counter() - started
+            return result
+
+        answer = final_state.get("report_formatted")
+        if answer:
+            grounded = is_cacheable_answer(final_state)
+            result.update(answer=answer, grounded=grounded)
+            if grounded and cache_lookup is not None:
+                semantic_cache.store(query, answer, cache_lookup)
+        else:
+            result.update(
+                status="no_answer", error="No final answer could be generated."
+            )
+        result["seconds"] = time.perf_counter() - started
+        return result
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self.limiter is None:
+            yield
+            return
+        async with self.limiter.slot():
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            **self._counters,
+            "duplicates": self._counters["items"] - self._counters["unique_queries"],
+            "seconds": elapsed,
+            "queries_per_minute": self._counters["completed"] / elapsed * 60
+            if elapsed
+            else 0.0,
+        }
+
+
+class BatchResultWriter:
+    """
+    Appends result records to a JSONL file, flushing each one, so an
+    interrupted batch keeps everything finished so far. For a `.parquet`
+    output the JSONL file is a `<output>.progress.jsonl` sidecar that is
+    converted (latest record per id) when the writer is closed.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = Path(output_path)
+        self.parquet = self.output_path.suffix == ".parquet"
+        self.progress_path = (
+            self.output_path.with_name(self.output_path.name + ".progress.jsonl")
+            if self.parquet
+            else self.output_path
+        )
+        self.progress_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.progress_path, "a", encoding="utf-8")
+
+    def completed_ids(self, retry_statuses: Iterable[str] = ("error",)) -> Set[str]:
+        return read_completed_ids(str(self.progress_path), retry_statuses)
+
+    def write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        if self.parquet:
+            import pandas as pd
+
+            records = read_result_records(str(self.progress_path))
+            pd.DataFrame(list(records.values())).to_parquet(
+                self.output_path, index=False
+            )
+            print(f"---BATCH: Wrote {len(records)} results to {self.output_path}---")
+
+
+def read_result_records(path: str) -> Dict[str, Dict[str, Any]]:
+    """Latest result record per item id from a (possibly truncated) JSONL file."""
+    records: Dict[str, Dict[str, Any]] = {}
+    if not Path(path).exists():
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave the last line half-written.
+                continue
+            records[str(record["id"])] = record
+    return records
+
+
+def read_completed_ids(
+    path: str, retry_statuses: Iterable[str] = ("error",)
+) -> Set[str]:
+    """
+    Ids already answered in a previous run. Items whose latest record has one
+    of `retry_statuses` are not counted, so they run again.
+    """
+    retry_statuses = set(retry_statuses)
+    return {
+        item_id
+        for item_id, record in read_result_records(path).items()
+        if record.get("status") not in retry_statuses
+    }
+
+
+async def run_batch_file(
+    input_path: str, output_path: str, concurrency: int, use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Answers every query in `input_path` and writes the results to
+    `output_path` (JSONL, or Parquet for a `.parquet` path). Re-running with the
+    same output resumes: items already answered there are skipped.
+    """
+    items = load_batch_items(input_path)
+    writer = BatchResultWriter(output_path)
+    completed_ids = writer.completed_ids()
+    pending = [item for item in items if item.id not in completed_ids]
+    if completed_ids:
+        print(
+            f"---BATCH: Resuming, {len(items) - len(pending)} of {len(items)} already answered---"
+        )
+
+    runner = BatchQueryRunner(concurrency=concurrency, use_cache=use_cache)
+    try:
+        async for record in runner.run(pending):
+            writer.write(record)
+    finally:
+        writer.close()
+    return runner.stats()
@@ -0,0 +1,182 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+from src.config import ConfigurationManager
+from src.constants import DEFAULT_ANSWER_MODE
+from src.models import AgentState, apply_update
+
+
+def answer_nodes() -> set:
+    """
+    Nodes whose LLM tokens make up the answer the user actually sees. In "fast"
+    answer mode the synthesizer writes the final answer in one pass.
+    """
+    if (
+        ConfigurationManager()
+        .get_agent_config()
+        .get("ANSWER_MODE", DEFAULT_ANSWER_MODE)
+        == "fast"
+    ):
+        return {"synthesizer_agent"}
+    return {"formatter_agent"}
+
+
+def _progress_event(
+    node: str, output: Dict[str, Any], state: AgentState
+) -> Optional[Dict[str, Any]]:
+    """
+    Maps a finished graph node to a client-facing progress event, or None if the
+    node has nothing worth reporting. `output` is the node's own update and
+    `state` the run state with that update applied.
+    """
+    if node == "research_agent":
+        if output.get("next_agent_to_call") in (
+            "sub_query_fanout",
+            "sub_query_batch",
+            "synthesizer_agent",
+        ):
+            return None
+        return {
+            "event": "sub_query_started",
+            "data": {
+                "sub_query": state.get("current_sub_query", ""),
+                "index": state.get("current_sub_query_index", 0),
+                "total": len(state.get("sub_queries_list", [])),
+            },
+        }
+    if node == "retriever_agent":
+        return {
+            "event": "retrieval_done",
+            "data": {
+                "sub_query": state.get("current_sub_query", ""),
+                "search_query": state.get("retrieval_query", ""),
+                "attempt": state.get("retrieval_attempts", 0),
+                "chunks": len(state.get("retrieved_chunk_ids", [])),
+            },
+        }
+    if node == "evaluator_agent":
+        return {
+            "event": "sufficiency_verdict",
+            "data": {
+                "sub_query": state.get("current_sub_query", ""),
+                "sufficient": state.get("evaluated_sufficiency", False),
+                "feedback": state.get("evaluator_feedback", ""),
+            },
+        }
+    if node == "sub_query_worker":
+        results = output.get("sub_query_results", {})
+        if not results:
+            return None
+        index, result = next(iter(results.items()))
+        return {
+            "event": "sufficiency_verdict",
+            "data": {
+                "sub_query": result["sub_query"],
+                "index": index,
+                "sufficient": not result["unanswerable"],
+                "attempts": result["retrieval_attempts"],
+                "chunks": len(result["relevant_chunk_ids"]),
+            },
+        }
+    if node == "sub_query_batch":
+        results = output.get("sub_query_results", {})
+        return {
+            "event": "sufficiency_verdicts",
+            "data": {
+                "results": [
+                    {
+                        "sub_query": results[index]["sub_query"],
+                        "index": index,
+                        "sufficient": not results[index]["unanswerable"],
+                        "attempts": results[index]["retrieval_attempts"],
+                        "chunks": len(results[index]["relevant_chunk_ids"]),
+                    }
+                    for index in sorted(results)
+                ]
+            },
+        }
+    if node == "synthesizer_agent":
+        report = output.get("context_packing_report", {})
+        return {
+            "event": "synthesis_done",
+            "data": {
+                "context_tokens": report.get("used_tokens", 0),
+                "dropped_chunks": len(report.get("dropped_chunks", [])),
+            },
+        }
+    return None
+
+
+async def stream_agent_events(
+    rag_app, initial_state: AgentState, config: Dict[str, Any]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs the compiled graph with `astream_events` and yields progress events as
+    nodes finish, answer tokens as they are generated, and a final `done` event
+    carrying the complete formatted report and whether it was grounded in
+    retrieved chunks. Nodes only emit their updates, so a local view of the
+    run state is kept to give events their context.
+
+    The `token` events concatenate to the `done` answer: text the final
+    formatting only appended (e.g. the fast-mode Sources list) is sent as one
+    last token. When formatting rewrote the streamed text instead, or the
+    answer comes from an error fallback, `done` has `replaces_stream` set and
+    its answer should replace what was streamed.
+    """
+    sub_queries_sent = False
+    streamed = []
+    state: AgentState = dict(initial_state)
+    streamed_nodes = answer_nodes()
+
+    async for event in rag_app.astream_events(
+        initial_state, config=config, version="v2"
+    ):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node in streamed_nodes:
+            token = event["data"]["chunk"].content
+            if token:
+                streamed.append(token)
+                yield {"event": "token", "data": {"text": token}}
+            continue
+
+        # Only the node-level run (named after the node) carries the state update.
+        if kind != "on_chain_end" or event.get("name") != node:
+            continue
+
+        output = event["data"].get("output")
+        if not isinstance(output, dict):
+            continue
+        state = apply_update(state, output)
+
+        if not sub_queries_sent and output.get("sub_queries_list"):
+            sub_queries_sent = True
+            yield {
+                "event": "sub_queries",
+                "data": {"sub_queries": output["sub_queries_list"]},
+            }
+
+        progress = _progress_event(node, output, state)
+        if progress:
+            yield progress
+
+    answer = state.get("report_formatted", "")
+    streamed_text = "".join(streamed)
+    replaces_stream = not answer.startswith(streamed_text)
+    if not replaces_stream and len(answer) > len(streamed_text):
+        yield {"event": "token", "data": {"text": answer[len(streamed_text) :]}}
+
+    yield {
+        "event": "done",
+        "data": {
+            "answer": answer,
+            "grounded": bool(state.get("accumulated_relevant_chunk_ids")),
+            "replaces_stream": replaces_stream,
+        },
+    }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serializes an event dict as a Server-Sent-Events frame."""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -1,31 +1,90 @@
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+import threading
 
+from src.cache.embedding_cache import with_embedding_cache
 from src.config import ConfigurationManager
 
-config = ConfigurationManager()
-llm_config = config.get_llm_config()
-
-EMBEDDING_MODEL = llm_config["EMBEDDING_MODEL"]
-GENERATION_MODEL = llm_config["GENERATION_MODEL"]
-LLM_TEMPERATURE = llm_config["LLM_TEMPERATURE"]
-GOOGLE_API_KEY = llm_config["GEMINI_API_KEY"]
+_llm = None
+_embeddings = None
+_lock = threading.Lock()
 
 
 def get_gemini_llm():
     """Initializes and returns the Google Gemini LLM."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    llm_config = ConfigurationManager().get_llm_config()
     return ChatGoogleGenerativeAI(
-        model=GENERATION_MODEL,
-        temperature=LLM_TEMPERATURE,
-        google_api_key=GOOGLE_API_KEY,
+        model=llm_config["GENERATION_MODEL"],
+        temperature=llm_config["LLM_TEMPERATURE"],
+        google_api_key=llm_config["GEMINI_API_KEY"],
     )
 
 
 def get_gemini_embeddings():
     """Initializes and returns the Google Gemini Embeddings model."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    llm_config = ConfigurationManager().get_llm_config()
     return GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY
+        model=llm_config["EMBEDDING_MODEL"], google_api_key=llm_config["GEMINI_API_KEY"]
     )
 
 
-LLM = get_gemini_llm()
-EMBEDDINGS = get_gemini_embeddings()
+def get_llm():
+    """
+    Returns the process-wide Gemini LLM, built on first use. The Gemini client
+    library is only imported then, so importing agents stays cheap.
+    """
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = get_gemini_llm()
+    return _llm
+
+
+def get_embeddings():
+    """Returns the process-wide (cached) Gemini embeddings, built on first use."""
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                embedding_model = ConfigurationManager().get_llm_config()[
+                    "EMBEDDING_MODEL"
+                ]
+                _embeddings = with_embedding_cache(
+                    get_gemini_embeddings(), embedding_model
+                )
+    return _embeddings
+
+
+def set_clients(llm=None, embeddings=None):
+    """
+    Replaces the process-wide LLM and/or embeddings, e.g. with the local
+    stand-ins in `benchmarks`. Call it before the agents are built; clients
+    already captured by agents are not swapped.
+    """
+    global _llm, _embeddings
+    with _lock:
+        if llm is not None:
+            _llm = llm
+        if embeddings is not None:
+            _embeddings = embeddings
+
+
+def embeddings_loaded() -> bool:
+    return _embeddings is not None
+
+
+def llm_loaded() -> bool:
+    return _llm is not None
+
+
+def __getattr__(name: str):
+    # `LLM` and `EMBEDDINGS` used to be built at import time; they are still
+    # importable by name, but only built when first accessed.
+    if name == "LLM":
+        return get_llm()
+    if name == "EMBEDDINGS":
+        return get_embeddings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
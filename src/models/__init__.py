@@ -1,24 +1,91 @@
-from typing import List, Literal, TypedDict
+import time
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    TypedDict,
+    get_origin,
+    get_type_hints,
+)
 
 from langchain_core.documents import Document
 
 
-class AgentState(TypedDict):
+def merge_sub_query_results(
+    left: Dict[int, Dict[str, Any]], right: Dict[int, Dict[str, Any]]
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Reducer for `sub_query_results`. Parallel sub-query branches each write the
+    result for their own index, so merging by key is order-independent and
+    re-applying an existing result is a no-op.
+    """
+    return {**(left or {}), **(right or {})}
+
+
+def merge_chunk_store(
+    left: Dict[str, Document], right: Dict[str, Document]
+) -> Dict[str, Document]:
+    """
+    Reducer for `chunk_store`. Nodes write only the chunks they retrieved, keyed
+    by chunk ID; every other channel refers to chunks by ID.
+    """
+    if not right:
+        return left or {}
+    return {**(left or {}), **right}
+
+
+def append_items(left: List[Any], right: List[Any]) -> List[Any]:
+    """Reducer for append-only list channels."""
+    if not right:
+        return left or []
+    return [*(left or []), *right]
+
+
+def append_unique(left: List[str], right: List[str]) -> List[str]:
+    """Reducer for append-only ID channels; IDs already present are skipped."""
+    if not right:
+        return left or []
+    seen = set(left or [])
+    merged = list(left or [])
+    for item in right:
+        if item not in seen:
+            seen.add(item)
+            merged.append(item)
+    return merged
+
+
+class AgentState(TypedDict, total=False):
     """
     Represents the state of our RAG agent's overall workflow.
     This state is passed between all nodes in the LangGraph.
+
+    Nodes return only the keys they change (hence `total=False`). Retrieved
+    documents live once in `chunk_store`; the other channels hold chunk IDs.
+    Channels annotated with a reducer are merged rather than overwritten, so
+    they are never mutated in place.
     """
 
     original_query: str
+    started_at: float
     sub_queries_list: List[str]
     current_sub_query_index: int
     current_sub_query: str
-    retrieved_chunks: List[Document]
+    chunk_store: Annotated[Dict[str, Document], merge_chunk_store]
+    retrieved_chunk_ids: List[str]
+    retrieval_query: str
+    retrieval_unchanged: bool
+    retrieval_scores: List[Optional[float]]
     evaluated_sufficiency: bool
     evaluator_feedback: str
     retrieval_attempts: int
-    accumulated_relevant_chunks: List[Document]
-    unanswerable_sub_queries: List[str]
+    accumulated_relevant_chunk_ids: Annotated[List[str], append_unique]
+    unanswerable_sub_queries: Annotated[List[str], append_items]
+    sub_query_results: Annotated[Dict[int, Dict[str, Any]], merge_sub_query_results]
+    context_packing_report: Dict[str, Any]
     final_answer_draft: str
     report_formatted: str
 
@@ -26,8 +93,67 @@ class AgentState(TypedDict):
         "research_agent",
         "retriever_agent",
         "evaluator_agent",
+        "sub_query_fanout",
+        "sub_query_batch",
         "synthesizer_agent",
         "formatter_agent",
         "END",
         "FATAL_ERROR",
     ]
+
+
+STATE_REDUCERS: Dict[str, Callable[[Any, Any], Any]] = {
+    key: hint.__metadata__[0]
+    for key, hint in get_type_hints(AgentState, include_extras=True).items()
+    if get_origin(hint) is Annotated
+}
+
+
+def build_initial_state(query: str) -> AgentState:
+    """Returns the initial graph state for a new user query."""
+    return {
+        "original_query": query,
+        "started_at": time.time(),
+        "sub_queries_list": [],
+        "current_sub_query_index": 0,
+        "current_sub_query": "",
+        "chunk_store": {},
+        "retrieved_chunk_ids": [],
+        "retrieval_query": "",
+        "retrieval_unchanged": False,
+        "retrieval_scores": [],
+        "evaluated_sufficiency": False,
+        "evaluator_feedback": "",
+        "retrieval_attempts": 0,
+        "accumulated_relevant_chunk_ids": [],
+        "unanswerable_sub_queries": [],
+        "sub_query_results": {},
+        "context_packing_report": {},
+        "final_answer_draft": "",
+        "report_formatted": "",
+        "next_agent_to_call": "research_agent",  # Initial state to start the process
+    }
+
+
+def apply_update(state: AgentState, update: AgentState) -> AgentState:
+    """
+    Applies a node's partial update the way the graph does: reducer channels
+    are merged, every other key is overwritten. Used where agents are chained
+    outside the graph, e.g. inside a sub-query branch.
+    """
+    merged = dict(state)
+    for key, value in update.items():
+        reducer = STATE_REDUCERS.get(key)
+        merged[key] = reducer(state.get(key), value) if reducer else value
+    return merged
+
+
+def resolve_chunks(state: Dict[str, Any], chunk_ids: List[str]) -> List[Document]:
+    """Looks chunk IDs up in the run's chunk store, in the given order."""
+    chunk_store = state.get("chunk_store", {})
+    return [chunk_store[chunk_id] for chunk_id in chunk_ids if chunk_id in chunk_store]
+
+
+def relevant_chunks(state: Dict[str, Any]) -> List[Document]:
+    """Chunks judged sufficient for their sub-query, in the order they were accepted."""
+    return resolve_chunks(state, state.get("accumulated_relevant_chunk_ids", []))
@@ -0,0 +1,195 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+MAX_IDS_PER_QUERY = 500
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits text into terms. Compound codes such as "QF-2025" are
+    kept whole and also indexed by their parts, so both "qf-2025" and "2025"
+    match.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index over knowledge base chunks. Chunks are keyed
+    by the same IDs used in the Chroma collection so lexical and vector hits can
+    be fused; only term frequencies and chunk lengths are stored, the chunk
+    text stays in Chroma. Postings live in a SQLite file (WAL mode) next to the
+    vector store, so writes are incremental: `add` and `remove` go into an open
+    transaction that `save` commits, and nothing is held in memory but the
+    collection statistics.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self._doc_count = 0
+        self._total_length = 0
+        self._data_version = None
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, length INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, chunk_id TEXT NOT NULL, frequency INTEGER NOT NULL, "
+            "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_postings_chunk_id ON postings (chunk_id)"
+        )
+        self._conn.commit()
+        self._refresh_stats()
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def add(self, ids: Iterable[str], documents: Iterable):
+        with self._lock:
+            for chunk_id, document in zip(ids, documents):
+                self._remove([chunk_id])
+                terms = Counter(tokenize(document.page_content))
+                length = sum(terms.values())
+                self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, length) VALUES (?, ?)",
+                    (chunk_id, length),
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, frequency) VALUES (?, ?, ?)",
+                    [(term, chunk_id, frequency) for term, frequency in terms.items()],
+                )
+                self._doc_count += 1
+                self._total_length += length
+
+    def remove(self, ids: Iterable[str]):
+        ids = list(ids)
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters per statement.
+            for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+                self._remove(ids[start : start + MAX_IDS_PER_QUERY])
+
+    def _remove(self, ids: List[str]):
+        placeholders = ",".join("?" for _ in ids)
+        count, length = self._conn.execute(
+            f"SELECT COUNT(*), TOTAL(length) FROM chunks WHERE chunk_id IN ({placeholders})",
+            ids,
+        ).fetchone()
+        if not count:
+            return
+        self._conn.execute(
+            f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", ids
+        )
+        self._conn.execute(
+            f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", ids
+        )
+        self._doc_count -= count
+        self._total_length -= int(length)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Returns the IDs and BM25 scores of the top-`k` chunks, best first."""
+        with self._lock:
+            if not self._doc_count:
+                return []
+            average_length = self._total_length / self._doc_count
+            scores = defaultdict(float)
+
+            for term in set(tokenize(query)):
+                postings = self._conn.execute(
+                    "SELECT p.chunk_id, p.frequency, c.length FROM postings p "
+                    "JOIN chunks c ON c.chunk_id = p.chunk_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(
+                    1 + (self._doc_count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for chunk_id, frequency, length in postings:
+                    length_norm = 1 - self.b + self.b * length / average_length
+                    scores[chunk_id] += (
+                        idf
+                        * frequency
+                        * (self.k1 + 1)
+                        / (frequency + self.k1 * length_norm)
+                    )
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self):
+        """Commits the writes made since the last save."""
+        with self._lock:
+            self._conn.commit()
+            self._data_version = self._read_data_version()
+
+    def load(self) -> "BM25Index":
+        """
+        Reads the collection statistics. An index still stored in the old
+        single-JSON format (same path with a `.json` suffix) is imported once.
+        """
+        legacy_path = self.path.with_suffix(".json")
+        if not self._doc_count and legacy_path != self.path and legacy_path.exists():
+            self._import_legacy_json(legacy_path)
+        with self._lock:
+            self._refresh_stats()
+        return self
+
+    def reload_if_changed(self):
+        """Picks up a re-ingested index without restarting the process."""
+        with self._lock:
+            if self._read_data_version() != self._data_version:
+                print(f"---BM25 INDEX: Reloading changed index from {self.path}---")
+                self._refresh_stats()
+
+    def _refresh_stats(self):
+        count, length = self._conn.execute(
+            "SELECT COUNT(*), TOTAL(length) FROM chunks"
+        ).fetchone()
+        self._doc_count = count
+        self._total_length = int(length)
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        # Changes whenever another connection commits to the database.
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _import_legacy_json(self, legacy_path: Path):
+        print(f"---BM25 INDEX: Importing {legacy_path} into {self.path}---")
+        with open(legacy_path, "r") as f:
+            documents = json.load(f)["documents"]
+        with self._lock:
+            for chunk_id, entry in documents.items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chunks (chunk_id, length) VALUES (?, ?)",
+                    (chunk_id, sum(entry["terms"].values())),
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO postings (term, chunk_id, frequency) VALUES (?, ?, ?)",
+                    [
+                        (term, chunk_id, frequency)
+                        for term, frequency in entry["terms"].items()
+                    ],
+                )
+            self._conn.commit()
@@ -0,0 +1,221 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from langchain_core.documents import Document
+
+from src.constants import (
+    DEFAULT_CONTEXT_SENTENCE_WINDOW,
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+    DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE,
+)
+from src.retrieval.bm25_index import tokenize
+from src.retrieval.near_duplicates import fact_tokens, is_near_duplicate, simhash
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+CHARS_PER_TOKEN = 4
+MIN_TRIMMED_TOKENS = 32
+STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "can",
+    "do",
+    "does",
+    "for",
+    "how",
+    "i",
+    "in",
+    "is",
+    "it",
+    "my",
+    "of",
+    "on",
+    "or",
+    "the",
+    "to",
+    "what",
+    "when",
+    "where",
+    "which",
+    "who",
+    "why",
+    "with",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate (~4 characters per token for English text). The
+    Gemini tokenizer is only available through an API call, which would cost
+    more latency than packing saves.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [
+        sentence.strip()
+        for sentence in SENTENCE_BOUNDARY.split(text)
+        if sentence.strip()
+    ]
+
+
+@dataclass
+class PackedContext:
+    chunks: List[Document]
+    content: str
+    used_tokens: int
+    token_budget: int
+    trimmed: int = 0
+    dropped: List[Dict[str, Any]] = field(default_factory=list)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "used_tokens": self.used_tokens,
+            "kept_chunks": len(self.chunks),
+            "trimmed_chunks": self.trimmed,
+            "dropped_chunks": self.dropped,
+        }
+
+
+class ContextPacker:
+    """
+    Fits the synthesizer's evidence into a token budget: drops near-duplicate
+    chunks, orders the rest by relevance, and adds them whole while they fit.
+    A chunk that does not fit is cut down to the sentences around query terms
+    (plus `sentence_window` neighbours on each side); if even that does not
+    fit it is dropped. Every dropped chunk is recorded with a reason.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+        sentence_window: int = DEFAULT_CONTEXT_SENTENCE_WINDOW,
+        dedupe: bool = True,
+        max_distance: int = DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE,
+    ):
+        self.token_budget = token_budget
+        self.sentence_window = sentence_window
+        self.dedupe = dedupe
+        self.max_distance = max_distance
+
+    def pack(self, query_texts: List[str], chunks: List[Document]) -> PackedContext:
+        query_terms = {
+            term
+            for text in query_texts
+            for term in tokenize(text)
+            if term not in STOPWORDS
+        }
+        dropped: List[Dict[str, Any]] = []
+
+        candidates = (
+            self._drop_duplicates(chunks, dropped) if self.dedupe else list(chunks)
+        )
+        ranked = sorted(
+            enumerate(candidates),
+            key=lambda item: (
+                -self._relevance(item[1], item[0], len(candidates), query_terms)
+            ),
+        )
+
+        packed: List[Document] = []
+        used_tokens = 0
+        trimmed = 0
+        for _, chunk in ranked:
+            remaining = self.token_budget - used_tokens
+            tokens = estimate_tokens(chunk.page_content)
+            if tokens <= remaining:
+                packed.append(chunk)
+                used_tokens += tokens
+                continue
+
+            window = ""
+            if remaining >= MIN_TRIMMED_TOKENS:
+                window = self._sentence_window(
+                    chunk.page_content, query_terms, remaining
+                )
+            window_tokens = estimate_tokens(window)
+            if window and window_tokens <= remaining:
+                packed.append(
+                    Document(page_content=window, metadata=chunk.metadata, id=chunk.id)
+                )
+                used_tokens += window_tokens
+                trimmed += 1
+            else:
+                dropped.append(self._dropped(chunk, "over_budget"))
+
+        return PackedContext(
+            chunks=packed,
+            content="\n\n".join(chunk.page_content for chunk in packed),
+            used_tokens=used_tokens,
+            token_budget=self.token_budget,
+            trimmed=trimmed,
+            dropped=dropped,
+        )
+
+    def _drop_duplicates(
+        self, chunks: List[Document], dropped: List[Dict[str, Any]]
+    ) -> List[Document]:
+        kept: List[Document] = []
+        signatures: List[Tuple[int, FrozenSet[str]]] = []
+        for chunk in chunks:
+            signature = simhash(chunk.page_content)
+            facts = fact_tokens(chunk.page_content)
+            if any(
+                is_near_duplicate(
+                    signature, facts, other, other_facts, self.max_distance
+                )
+                for other, other_facts in signatures
+            ):
+                dropped.append(self._dropped(chunk, "near_duplicate"))
+                continue
+            kept.append(chunk)
+            signatures.append((signature, facts))
+        return kept
+
+    def _relevance(self, chunk: Document, rank: int, total: int, query_terms) -> float:
+        # A retrieval score, when the retriever recorded one, wins; otherwise
+        # query term coverage with the retrieval order as a tie-breaker.
+        score = chunk.metadata.get("relevance_score")
+        if score is not None:
+            return float(score)
+        rank_prior = 1 - rank / max(total, 1)
+        if not query_terms:
+            return rank_prior
+        coverage = len(query_terms & set(tokenize(chunk.page_content))) / len(
+            query_terms
+        )
+        return 0.7 * coverage + 0.3 * rank_prior
+
+    def _sentence_window(self, text: str, query_terms, max_tokens: int) -> str:
+        sentences = split_sentences(text)
+        hits = [
+            index
+            for index, sentence in enumerate(sentences)
+            if query_terms & set(tokenize(sentence))
+        ]
+        selected = set()
+        for index in hits:
+            window = range(
+                max(0, index - self.sentence_window),
+                min(len(sentences), index + self.sentence_window + 1),
+            )
+            candidate = selected | set(window)
+            if (
+                estimate_tokens(" ".join(sentences[i] for i in sorted(candidate)))
+                > max_tokens
+            ):
+                continue
+            selected = candidate
+        return " ".join(sentences[i] for i in sorted(selected))
+
+    def _dropped(self, chunk: Document, reason: str) -> Dict[str, Any]:
+        return {
+            "source": chunk.metadata.get("source", ""),
+            "tokens": estimate_tokens(chunk.page_content),
+            "reason": reason,
+        }
@@ -0,0 +1,242 @@
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from src.config import ConfigurationManager
+from src.constants import (
+    BASE_DIR,
+    DEFAULT_CANDIDATE_MULTIPLIER,
+    DEFAULT_LEXICAL_WEIGHT,
+    DEFAULT_RERANK_CANDIDATES,
+    DEFAULT_RETRIEVAL_K,
+    DEFAULT_RRF_K,
+    DEFAULT_VECTOR_WEIGHT,
+)
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.reranker import RerankingRetriever, build_reranker
+from src.retrieval.retrieval_cache import CachingRetriever, get_retrieval_cache
+from src.utils.common import get_chunk_id
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Document]], weights: List[float], rrf_k: int
+) -> List[Document]:
+    """
+    Fuses several best-first result lists: each chunk scores
+    sum(weight / (rrf_k + rank)) over the lists it appears in.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    documents: Dict[str, Document] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, document in enumerate(ranked, start=1):
+            chunk_id = get_chunk_id(document)
+            scores[chunk_id] += weight / (rrf_k + rank)
+            documents.setdefault(chunk_id, document)
+    return [
+        documents[chunk_id] for chunk_id in sorted(scores, key=scores.get, reverse=True)
+    ]
+
+
+def with_relevance_scores(hits: List[Tuple[Document, float]]) -> List[Document]:
+    """
+    Records each hit's vector relevance score (0-1, higher is closer) in its
+    metadata, so later stages can gate and order chunks by it.
+    """
+    for document, score in hits:
+        document.metadata["relevance_score"] = score
+    return [document for document, _ in hits]
+
+
+class ScoredVectorRetriever(BaseRetriever):
+    """
+    Dense similarity search that keeps the relevance scores. Accepts `k` as an
+    invoke-time keyword like the default vector store retriever.
+    """
+
+    vectorstore: VectorStore
+    k: int = DEFAULT_RETRIEVAL_K
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return with_relevance_scores(
+            self.vectorstore.similarity_search_with_relevance_scores(
+                query, k=k or self.k
+            )
+        )
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return with_relevance_scores(
+            await self.vectorstore.asimilarity_search_with_relevance_scores(
+                query, k=k or self.k
+            )
+        )
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses dense Chroma similarity search with the local BM25
+    index using weighted reciprocal rank fusion. BM25 hits are read back from
+    the Chroma collection. Each side fetches
+    `candidate_multiplier * k` candidates before fusion. Accepts `k` as an
+    invoke-time keyword like the default vector store retriever.
+    """
+
+    vectorstore: VectorStore
+    bm25_index: BM25Index
+    k: int = DEFAULT_RETRIEVAL_K
+    vector_weight: float = DEFAULT_VECTOR_WEIGHT
+    lexical_weight: float = DEFAULT_LEXICAL_WEIGHT
+    rrf_k: int = DEFAULT_RRF_K
+    candidate_multiplier: int = DEFAULT_CANDIDATE_MULTIPLIER
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _lexical_search(self, query: str, fetch_k: int) -> List[Document]:
+        self.bm25_index.reload_if_changed()
+        ids = [chunk_id for chunk_id, _ in self.bm25_index.search(query, fetch_k)]
+        if not ids:
+            return []
+        # The lexical index only stores term statistics; text comes from Chroma.
+        stored = self.vectorstore.get(ids=ids, include=["documents", "metadatas"])
+        documents = {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            )
+        }
+        return [documents[chunk_id] for chunk_id in ids if chunk_id in documents]
+
+    def _fuse(
+        self, vector_hits: List[Document], lexical_hits: List[Document], k: int
+    ) -> List[Document]:
+        return reciprocal_rank_fusion(
+            [vector_hits, lexical_hits],
+            [self.vector_weight, self.lexical_weight],
+            self.rrf_k,
+        )[:k]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = k or self.k
+        fetch_k = k * self.candidate_multiplier
+        vector_hits = with_relevance_scores(
+            self.vectorstore.similarity_search_with_relevance_scores(query, k=fetch_k)
+        )
+        return self._fuse(vector_hits, self._lexical_search(query, fetch_k), k)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = k or self.k
+        fetch_k = k * self.candidate_multiplier
+        vector_hits = with_relevance_scores(
+            await self.vectorstore.asimilarity_search_with_relevance_scores(
+                query, k=fetch_k
+            )
+        )
+        return self._fuse(vector_hits, self._lexical_search(query, fetch_k), k)
+
+
+def get_bm25_index_path() -> Path:
+    knowledge_base_config = ConfigurationManager().get_knowledge_base_config()
+    return Path.joinpath(BASE_DIR, knowledge_base_config["BM25_INDEX_PATH"])
+
+
+def build_retriever(vector_db: VectorStore) -> BaseRetriever:
+    """
+    Returns the retriever used by `RetrieverAgent`: hybrid or dense search as
+    configured, wrapped in an over-fetch + local rerank stage when a reranker
+    is enabled in `retrieval_config`, and in a shared result cache when
+    `RETRIEVAL_CACHE_MAX_ENTRIES` is non-zero.
+    """
+    retrieval_config = ConfigurationManager().get_retrieval_config()
+    retriever = build_base_retriever(vector_db, retrieval_config)
+
+    reranker = build_reranker(retrieval_config, vector_db.embeddings)
+    if reranker is not None:
+        print(f"---RETRIEVER: Reranking with '{reranker.name}'---")
+        retriever = RerankingRetriever(
+            base_retriever=retriever,
+            reranker=reranker,
+            k=DEFAULT_RETRIEVAL_K,
+            candidates=retrieval_config.get(
+                "RERANK_CANDIDATES", DEFAULT_RERANK_CANDIDATES
+            ),
+        )
+
+    retrieval_cache = get_retrieval_cache()
+    if retrieval_cache is None:
+        return retriever
+    return CachingRetriever(
+        base_retriever=retriever, cache=retrieval_cache, k=DEFAULT_RETRIEVAL_K
+    )
+
+
+def build_base_retriever(
+    vector_db: VectorStore, retrieval_config: dict
+) -> BaseRetriever:
+    """
+    Hybrid BM25 + vector search when enabled and the lexical index exists,
+    otherwise plain dense similarity search. Vector hits carry their
+    `relevance_score` in metadata.
+    """
+    if retrieval_config.get("HYBRID_SEARCH_ENABLED", False):
+        bm25_index = BM25Index(get_bm25_index_path()).load()
+        if len(bm25_index):
+            print(
+                f"---RETRIEVER: Hybrid search enabled over {len(bm25_index)} indexed chunks---"
+            )
+            return HybridRetriever(
+                vectorstore=vector_db,
+                bm25_index=bm25_index,
+                k=DEFAULT_RETRIEVAL_K,
+                vector_weight=retrieval_config.get(
+                    "VECTOR_WEIGHT", DEFAULT_VECTOR_WEIGHT
+                ),
+                lexical_weight=retrieval_config.get(
+                    "LEXICAL_WEIGHT", DEFAULT_LEXICAL_WEIGHT
+                ),
+                rrf_k=retrieval_config.get("RRF_K", DEFAULT_RRF_K),
+                candidate_multiplier=retrieval_config.get(
+                    "CANDIDATE_MULTIPLIER", DEFAULT_CANDIDATE_MULTIPLIER
+                ),
+            )
+        print(
+            "---RETRIEVER: BM25 index is empty or missing, falling back to vector search. Re-run ingestion to build it.---"
+        )
+
+    return ScoredVectorRetriever(vectorstore=vector_db, k=DEFAULT_RETRIEVAL_K)
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from src.constants import DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE
+from src.retrieval.bm25_index import tokenize
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+SIGNED_OFFSET = 1 << SIMHASH_BITS
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word 3-shingles. Texts that differ only in a few words
+    land within a small Hamming distance of each other, so a distance alone
+    cannot tell shared boilerplate from two chunks stating different figures;
+    see `is_near_duplicate`.
+    """
+    tokens = tokenize(text)
+    if len(tokens) >= SHINGLE_SIZE:
+        features = [
+            " ".join(tokens[i : i + SHINGLE_SIZE])
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        ]
+    else:
+        features = [" ".join(tokens)]
+
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        value = int.from_bytes(
+            hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+
+def hamming_distance(left: int, right: int) -> int:
+    return bin(left ^ right).count("1")
+
+
+def fact_tokens(text: str) -> FrozenSet[str]:
+    """
+    Tokens containing a digit: quantities, prices, model codes and part
+    numbers. Chunks that differ in any of them state different facts.
+    """
+    return frozenset(
+        token for token in tokenize(text) if any(c.isdigit() for c in token)
+    )
+
+
+def is_near_duplicate(
+    signature: int,
+    facts: FrozenSet[str],
+    other_signature: int,
+    other_facts: Iterable[str],
+    max_distance: int,
+) -> bool:
+    """
+    Two chunks are near-duplicates when their SimHashes are within
+    `max_distance` bits and they contain exactly the same numbers and model
+    codes, so "1 year warranty" and "5 years warranty" are never merged.
+    """
+    return hamming_distance(
+        signature, other_signature
+    ) <= max_distance and facts == frozenset(other_facts)
+
+
+def _band_ranges(max_distance: int) -> List[Tuple[int, int]]:
+    # With max_distance + 1 bands, two signatures within max_distance bits of
+    # each other agree exactly on at least one band (pigeonhole).
+    bands = max_distance + 1
+    width = SIMHASH_BITS // bands
+    return [
+        (i * width, SIMHASH_BITS if i == bands - 1 else (i + 1) * width)
+        for i in range(bands)
+    ]
+
+
+def _band_keys(
+    signature: int, band_ranges: List[Tuple[int, int]]
+) -> List[Tuple[int, int]]:
+    return [
+        (i, signature >> start & ((1 << (end - start)) - 1))
+        for i, (start, end) in enumerate(band_ranges)
+    ]
+
+
+class NearDuplicateIndex:
+    """
+    Persistent SimHash index of the canonical chunks in the knowledge base,
+    with LSH bands so a lookup only compares against a handful of candidates.
+    A match also needs identical number and model-code tokens (see
+    `is_near_duplicate`), so only wording-level variants of the same facts
+    are merged. Each canonical chunk also records every source file that
+    contained it (or a near-identical copy), which ingestion writes to the
+    chunk's `sources` metadata.
+
+    Entries, bands and sources are rows in a SQLite file (WAL mode), so writes
+    are incremental: changes go into an open transaction that `save` commits,
+    and lookups only read the candidate rows.
+    """
+
+    def __init__(
+        self, path: Path, max_distance: int = DEFAULT_NEAR_DUPLICATE_MAX_DISTANCE
+    ):
+        self.path = Path(path)
+        self.max_distance = max_distance
+        self.band_ranges = _band_ranges(max_distance)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "chunk_id TEXT PRIMARY KEY, simhash INTEGER NOT NULL, facts TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands ("
+            "band INTEGER NOT NULL, value INTEGER NOT NULL, chunk_id TEXT NOT NULL, "
+            "PRIMARY KEY (band, value, chunk_id)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "chunk_id TEXT NOT NULL, source TEXT NOT NULL, UNIQUE (chunk_id, source))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def find(self, text: str) -> Tuple[Optional[str], int]:
+        """Returns the ID of a near-duplicate canonical chunk (or None) and the signature."""
+        signature = simhash(text)
+        facts = fact_tokens(text)
+        with self._lock:
+            candidates = set()
+            for band, value in _band_keys(signature, self.band_ranges):
+                candidates.update(
+                    self._conn.execute(
+                        "SELECT e.chunk_id, e.simhash, e.facts FROM bands b "
+                        "JOIN entries e ON e.chunk_id = b.chunk_id "
+                        "WHERE b.band = ? AND b.value = ?",
+                        (band, value),
+                    ).fetchall()
+                )
+        for chunk_id, stored_signature, stored_facts in sorted(candidates):
+            # Entries written before facts were recorded never match.
+            if stored_facts is not None and is_near_duplicate(
+                signature,
+                facts,
+                stored_signature % SIGNED_OFFSET,
+                json.loads(stored_facts),
+                self.max_distance,
+            ):
+                return chunk_id, signature
+        return None, signature
+
+    def add(self, chunk_id: str, signature: int, source: str, text: str):
+        with self._lock:
+            self._add_entry(chunk_id, signature, sorted(fact_tokens(text)))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sources (chunk_id, source) VALUES (?, ?)",
+                (chunk_id, source),
+            )
+
+    def add_source(self, chunk_id: str, source: str) -> bool:
+        """Records another source for a canonical chunk; returns True if it was new."""
+        with self._lock:
+            if not self._has_entry(chunk_id):
+                return False
+            return (
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO sources (chunk_id, source) VALUES (?, ?)",
+                    (chunk_id, source),
+                ).rowcount
+                > 0
+            )
+
+    def remove_source(self, chunk_id: str, source: str) -> bool:
+        with self._lock:
+            return (
+                self._conn.execute(
+                    "DELETE FROM sources WHERE chunk_id = ? AND source = ?",
+                    (chunk_id, source),
+                ).rowcount
+                > 0
+            )
+
+    def sources(self, chunk_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source FROM sources WHERE chunk_id = ? ORDER BY rowid",
+                (chunk_id,),
+            ).fetchall()
+        return [source for (source,) in rows]
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for chunk_id in ids:
+                row = self._conn.execute(
+                    "SELECT simhash FROM entries WHERE chunk_id = ?", (chunk_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                self._conn.executemany(
+                    "DELETE FROM bands WHERE band = ? AND value = ? AND chunk_id = ?",
+                    [
+                        (band, value, chunk_id)
+                        for band, value in _band_keys(
+                            row[0] % SIGNED_OFFSET, self.band_ranges
+                        )
+                    ],
+                )
+                self._conn.execute(
+                    "DELETE FROM entries WHERE chunk_id = ?", (chunk_id,)
+                )
+                self._conn.execute(
+                    "DELETE FROM sources WHERE chunk_id = ?", (chunk_id,)
+                )
+
+    def save(self):
+        """Commits the changes made since the last save."""
+        with self._lock:
+            self._conn.commit()
+
+    def load(self) -> "NearDuplicateIndex":
+        """
+        Rebuilds the LSH bands if `max_distance` changed since they were written,
+        and imports an index still stored in the old single-JSON format (same
+        path with a `.json` suffix) once.
+        """
+        legacy_path = self.path.with_suffix(".json")
+        if legacy_path != self.path and legacy_path.exists() and not len(self):
+            self._import_legacy_json(legacy_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'max_distance'"
+            ).fetchone()
+            if row is None or int(row[0]) != self.max_distance:
+                self._rebuild_bands()
+        return self
+
+    def _has_entry(self, chunk_id: str) -> bool:
+        return (
+            self._conn.execute(
+                "SELECT 1 FROM entries WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone()
+            is not None
+        )
+
+    def _add_entry(self, chunk_id: str, signature: int, facts: Optional[List[str]]):
+        if self._has_entry(chunk_id):
+            return
+        self._conn.execute(
+            "INSERT INTO entries (chunk_id, simhash, facts) VALUES (?, ?, ?)",
+            (
+                chunk_id,
+                # SQLite integers are signed 64-bit.
+                signature - SIGNED_OFFSET
+                if signature >= SIGNED_OFFSET // 2
+                else signature,
+                None if facts is None else json.dumps(facts),
+            ),
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO bands (band, value, chunk_id) VALUES (?, ?, ?)",
+            [
+                (band, value, chunk_id)
+                for band, value in _band_keys(signature, self.band_ranges)
+            ],
+        )
+
+    def _rebuild_bands(self):
+        self._conn.execute("DELETE FROM bands")
+        for chunk_id, signature in self._conn.execute(
+            "SELECT chunk_id, simhash FROM entries"
+        ):
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bands (band, value, chunk_id) VALUES (?, ?, ?)",
+                [
+                    (band, value, chunk_id)
+                    for band, value in _band_keys(
+                        signature % SIGNED_OFFSET, self.band_ranges
+                    )
+                ],
+            )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('max_distance', ?)",
+            (str(self.max_distance),),
+        )
+        self._conn.commit()
+
+    def _import_legacy_json(self, legacy_path: Path):
+        print(f"---NEAR DUPLICATES: Importing {legacy_path} into {self.path}---")
+        with open(legacy_path, "r") as f:
+            entries = json.load(f)["entries"]
+        with self._lock:
+            for chunk_id, entry in entries.items():
+                self._add_entry(chunk_id, entry["simhash"], entry.get("facts"))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO sources (chunk_id, source) VALUES (?, ?)",
+                    [(chunk_id, source) for source in entry["sources"]],
+                )
+            self._conn.commit()
@@ -0,0 +1,101 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.config import ConfigurationManager
+from src.constants import (
+    DEFAULT_RELEVANCE_ACCEPT_THRESHOLD,
+    DEFAULT_RELEVANCE_REJECT_THRESHOLD,
+)
+
+BANDS = ("accept", "reject", "ambiguous", "unscored")
+
+
+class RelevanceGate:
+    """
+    Decides sufficiency from retrieval similarity scores alone when the answer
+    is clear: a top score at or above `accept_threshold` is accepted, and a
+    result where every chunk scores below `reject_threshold` is rejected. The
+    ambiguous middle band (and chunks without a vector score, e.g. BM25-only
+    hits) goes to the LLM evaluator. Band hits are counted so thresholds can
+    be tuned from production traffic.
+    """
+
+    def __init__(self, accept_threshold: float, reject_threshold: float):
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {band: 0 for band in BANDS}
+
+    def classify(self, scores: List[Optional[float]]) -> str:
+        known = [score for score in scores if score is not None]
+        if not known:
+            band = "unscored"
+        elif max(known) >= self.accept_threshold:
+            band = "accept"
+        elif len(known) == len(scores) and max(known) < self.reject_threshold:
+            band = "reject"
+        else:
+            band = "ambiguous"
+        with self._lock:
+            self._counts[band] += 1
+        return band
+
+    def verdict(self, scores: List[Optional[float]]) -> Optional[Tuple[bool, str]]:
+        """Returns a (sufficiency, feedback) verdict, or None when the LLM must decide."""
+        band = self.classify(scores)
+        top = max((score for score in scores if score is not None), default=None)
+        print(f"---RELEVANCE GATE: Top score {top} -> {band}---")
+        if band == "accept":
+            return True, ""
+        if band == "reject":
+            return (
+                False,
+                "Retrieved chunks are not similar to the sub-query. Try different keywords.",
+            )
+        return None
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            total = sum(self._counts.values())
+            return {
+                "accept_threshold": self.accept_threshold,
+                "reject_threshold": self.reject_threshold,
+                "bands": dict(self._counts),
+                "llm_skip_rate": (
+                    (self._counts["accept"] + self._counts["reject"]) / total
+                    if total
+                    else 0.0
+                ),
+            }
+
+
+_relevance_gate: Optional[RelevanceGate] = None
+_relevance_gate_loaded = False
+_relevance_gate_lock = threading.Lock()
+
+
+def get_relevance_gate() -> Optional[RelevanceGate]:
+    """
+    Returns the process-wide relevance gate, or None if it is disabled in
+    `retrieval_config`.
+    """
+    global _relevance_gate, _relevance_gate_loaded
+    if _relevance_gate_loaded:
+        return _relevance_gate
+
+    with _relevance_gate_lock:
+        if _relevance_gate_loaded:
+            return _relevance_gate
+
+        retrieval_config = ConfigurationManager().get_retrieval_config()
+        if retrieval_config.get("RELEVANCE_GATE_ENABLED", False):
+            _relevance_gate = RelevanceGate(
+                accept_threshold=retrieval_config.get(
+                    "RELEVANCE_ACCEPT_THRESHOLD", DEFAULT_RELEVANCE_ACCEPT_THRESHOLD
+                ),
+                reject_threshold=retrieval_config.get(
+                    "RELEVANCE_REJECT_THRESHOLD", DEFAULT_RELEVANCE_REJECT_THRESHOLD
+                ),
+            )
+        _relevance_gate_loaded = True
+        return _relevance_gate
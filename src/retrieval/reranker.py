@@ -0,0 +1,267 @@
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from src.constants import (
+    BASE_DIR,
+    DEFAULT_MMR_LAMBDA,
+    DEFAULT_RERANK_CANDIDATES,
+    DEFAULT_RETRIEVAL_K,
+)
+from src.retrieval.bm25_index import tokenize
+
+
+class Reranker:
+    """
+    Reorders retrieval candidates locally and keeps the best `top_n`, so only a
+    small, high-quality set of chunks reaches the LLM prompts.
+    """
+
+    name = "base"
+
+    def rerank(
+        self, query: str, documents: List[Document], top_n: int
+    ) -> List[Document]:
+        raise NotImplementedError
+
+    async def arerank(
+        self, query: str, documents: List[Document], top_n: int
+    ) -> List[Document]:
+        return self.rerank(query, documents, top_n)
+
+
+class LexicalOverlapReranker(Reranker):
+    """
+    Scores each candidate by the share of query terms it contains, blended with
+    its original retrieval rank. Pure Python and effectively free.
+    """
+
+    name = "lexical"
+
+    def __init__(self, overlap_weight: float = 0.7):
+        self.overlap_weight = overlap_weight
+
+    def rerank(
+        self, query: str, documents: List[Document], top_n: int
+    ) -> List[Document]:
+        query_terms = set(tokenize(query))
+        if not query_terms or not documents:
+            return documents[:top_n]
+
+        scored = []
+        for rank, document in enumerate(documents):
+            document_terms = set(tokenize(document.page_content))
+            coverage = len(query_terms & document_terms) / len(query_terms)
+            rank_prior = 1 - rank / len(documents)
+            score = (
+                self.overlap_weight * coverage + (1 - self.overlap_weight) * rank_prior
+            )
+            scored.append((score, rank, document))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [document for _, _, document in scored[:top_n]]
+
+
+class MMRReranker(Reranker):
+    """
+    Maximal marginal relevance over the candidates: trades similarity to the
+    query against similarity to chunks already selected, so near-duplicate
+    chunks do not crowd out the top-N. Uses the (cached) embeddings model.
+    """
+
+    name = "mmr"
+
+    def __init__(self, embeddings: Embeddings, lambda_mult: float = DEFAULT_MMR_LAMBDA):
+        self.embeddings = embeddings
+        self.lambda_mult = lambda_mult
+
+    def rerank(
+        self, query: str, documents: List[Document], top_n: int
+    ) -> List[Document]:
+        if len(documents) <= 1:
+            return documents[:top_n]
+        query_vector = self.embeddings.embed_query(query)
+        document_vectors = self.embeddings.embed_documents(
+            [document.page_content for document in documents]
+        )
+        return self._select(query_vector, document_vectors, documents, top_n)
+
+    async def arerank(
+        self, query: str, documents: List[Document], top_n: int
+    ) -> List[Document]:
+        if len(documents) <= 1:
+            return documents[:top_n]
+        query_vector = await self.embeddings.aembed_query(query)
+        document_vectors = await self.embeddings.aembed_documents(
+            [document.page_content for document in documents]
+        )
+        return self._select(query_vector, document_vectors, documents, top_n)
+
+    def _select(
+        self, query_vector, document_vectors, documents, top_n
+    ) -> List[Document]:
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        matrix = np.asarray(document_vectors, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+
+        relevance = matrix @ query_vector
+        selected: List[int] = []
+        candidates = list(range(len(documents)))
+
+        while candidates and len(selected) < top_n:
+            if selected:
+                redundancy = (matrix[candidates] @ matrix[selected].T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(candidates))
+            scores = (
+                self.lambda_mult * relevance[candidates]
+                - (1 - self.lambda_mult) * redundancy
+            )
+            best = candidates[int(np.argmax(scores))]
+            selected.append(best)
+            candidates.remove(best)
+
+        return [documents[index] for index in selected]
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Scores (query, chunk) pairs with a small ONNX cross-encoder on CPU, e.g. an
+    exported ms-marco MiniLM model. `model_dir` must contain `model.onnx` and a
+    Hugging Face `tokenizer.json`. Requires the optional `onnxruntime` and
+    `tokenizers` packages.
+    """
+
+    name = "cross_encoder"
+
+    def __init__(self, model_dir: Path, max_length: int = 512, batch_size: int = 32):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(
+            str(Path(model_dir) / "model.onnx"), providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+        self.batch_size = batch_size
+
+    def rerank(
+        self, query: str, documents: List[Document], top_n: int
+    ) -> List[Document]:
+        if not documents:
+            return []
+        scores = []
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start : start + self.batch_size]
+            encodings = self.tokenizer.encode_batch(
+                [(query, document.page_content) for document in batch]
+            )
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array(
+                    [e.attention_mask for e in encodings], dtype=np.int64
+                ),
+                "token_type_ids": np.array(
+                    [e.type_ids for e in encodings], dtype=np.int64
+                ),
+            }
+            inputs = {
+                name: value
+                for name, value in inputs.items()
+                if name in self.input_names
+            }
+            logits = self.session.run(None, inputs)[0]
+            scores.extend(np.asarray(logits).reshape(len(batch), -1)[:, 0].tolist())
+
+        order = sorted(range(len(documents)), key=lambda index: -scores[index])
+        return [documents[index] for index in order[:top_n]]
+
+
+def build_reranker(
+    retrieval_config: dict, embeddings: Embeddings
+) -> Optional[Reranker]:
+    """
+    Returns the reranker selected by `RERANKER` in `retrieval_config`, or None
+    when reranking is disabled. A cross-encoder that cannot be loaded falls
+    back to lexical overlap.
+    """
+    if not retrieval_config.get("RERANK_ENABLED", False):
+        return None
+
+    reranker_name = retrieval_config.get("RERANKER", "lexical")
+    if reranker_name == "mmr":
+        return MMRReranker(
+            embeddings,
+            lambda_mult=retrieval_config.get("MMR_LAMBDA", DEFAULT_MMR_LAMBDA),
+        )
+    if reranker_name == "cross_encoder":
+        model_dir = Path.joinpath(
+            BASE_DIR,
+            retrieval_config.get("CROSS_ENCODER_MODEL_DIR", "models/cross_encoder"),
+        )
+        try:
+            return CrossEncoderReranker(model_dir)
+        except Exception as e:
+            print(
+                f"---WARNING: Could not load cross-encoder from {model_dir} ({e}). Falling back to lexical reranking.---"
+            )
+    return LexicalOverlapReranker()
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Wraps a retriever with an over-fetch + local rerank stage: it asks the base
+    retriever for `candidates` chunks and returns the reranker's top `k`.
+    """
+
+    base_retriever: BaseRetriever
+    reranker: Any
+    k: int = DEFAULT_RETRIEVAL_K
+    candidates: int = DEFAULT_RERANK_CANDIDATES
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = k or self.k
+        candidates = self.base_retriever.invoke(
+            query,
+            config={"callbacks": run_manager.get_child()},
+            k=max(self.candidates, k),
+        )
+        return self.reranker.rerank(query, candidates, k)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = k or self.k
+        candidates = await self.base_retriever.ainvoke(
+            query,
+            config={"callbacks": run_manager.get_child()},
+            k=max(self.candidates, k),
+        )
+        return await self.reranker.arerank(query, candidates, k)
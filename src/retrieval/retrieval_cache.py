@@ -0,0 +1,201 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.config import ConfigurationManager
+from src.constants import DEFAULT_RETRIEVAL_CACHE_MAX_ENTRIES, DEFAULT_RETRIEVAL_K
+from src.utils.db_utils import get_knowledge_base_version
+
+CacheKey = Tuple[str, int]
+
+
+class RetrievalCache:
+    """
+    LRU cache of retrieval results keyed on the normalised search query and
+    `k`. Concurrent sub-queries of different user queries (e.g. the items of a
+    batch) often search for the same thing; identical searches in flight on
+    the same event loop are coalesced into one. The cache is dropped whenever
+    the knowledge base version changes.
+    """
+
+    def __init__(self, max_entries: int, version_fn: Callable[[], str]):
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self._entries: "OrderedDict[CacheKey, List[Document]]" = OrderedDict()
+        self._in_flight: Dict[
+            CacheKey, Tuple[asyncio.AbstractEventLoop, asyncio.Future]
+        ] = {}
+        self._version = version_fn()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    @staticmethod
+    def key(query: str, k: int) -> CacheKey:
+        return " ".join(query.lower().split()), k
+
+    def get(self, key: CacheKey) -> Optional[List[Document]]:
+        with self._lock:
+            self._check_version()
+            documents = self._entries.get(key)
+            if documents is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return list(documents)
+
+    def put(self, key: CacheKey, documents: List[Document]):
+        with self._lock:
+            self._entries[key] = list(documents)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def aget_or_fetch(self, key: CacheKey, fetch) -> List[Document]:
+        """
+        Returns the cached result, awaits an identical search already in
+        flight on this event loop, or runs `fetch()` and caches its result.
+        """
+        documents = self.get(key)
+        if documents is not None:
+            return documents
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None and in_flight[0] is loop:
+                self._counters["coalesced"] += 1
+                future = in_flight[1]
+            else:
+                future = None
+                self._in_flight[key] = (loop, loop.create_future())
+
+        if future is not None:
+            return list(await asyncio.shield(future))
+
+        owned = self._in_flight[key][1]
+        try:
+            documents = await fetch()
+        except Exception as e:
+            owned.set_exception(e)
+            # Nobody may be waiting; mark the exception as retrieved.
+            owned.exception()
+            raise
+        else:
+            self.put(key, documents)
+            owned.set_result(documents)
+            return list(documents)
+        finally:
+            if not owned.done():
+                # The fetch was cancelled; don't leave waiters hanging.
+                owned.cancel()
+            with self._lock:
+                if self._in_flight.get(key, (None, None))[1] is owned:
+                    del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                **self._counters,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            }
+
+    def _check_version(self):
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+
+class CachingRetriever(BaseRetriever):
+    """
+    Wraps the full retrieval pipeline (search + rerank) with a `RetrievalCache`.
+    Accepts `k` as an invoke-time keyword like the retrievers it wraps.
+    """
+
+    base_retriever: BaseRetriever
+    cache: Any
+    k: int = DEFAULT_RETRIEVAL_K
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = k or self.k
+        key = self.cache.key(query, k)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = self.base_retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}, k=k
+            )
+            self.cache.put(key, documents)
+        return documents
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = k or self.k
+
+        async def fetch() -> List[Document]:
+            return await self.base_retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}, k=k
+            )
+
+        return await self.cache.aget_or_fetch(self.cache.key(query, k), fetch)
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+_retrieval_cache_loaded = False
+_retrieval_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Returns the process-wide retrieval cache, or None if
+    `RETRIEVAL_CACHE_MAX_ENTRIES` in `retrieval_config` is 0.
+    """
+    global _retrieval_cache, _retrieval_cache_loaded
+    if _retrieval_cache_loaded:
+        return _retrieval_cache
+
+    with _retrieval_cache_lock:
+        if _retrieval_cache_loaded:
+            return _retrieval_cache
+
+        config = ConfigurationManager()
+        max_entries = config.get_retrieval_config().get(
+            "RETRIEVAL_CACHE_MAX_ENTRIES", DEFAULT_RETRIEVAL_CACHE_MAX_ENTRIES
+        )
+        if max_entries:
+            knowledge_base_config = config.get_knowledge_base_config()
+            chroma_db_dir = knowledge_base_config["CHROMA_DB_DIR"]
+            manifest_path = knowledge_base_config["MANIFEST_PATH"]
+            _retrieval_cache = RetrievalCache(
+                max_entries=max_entries,
+                version_fn=lambda: get_knowledge_base_version(
+                    chroma_db_dir, manifest_path
+                ),
+            )
+        _retrieval_cache_loaded = True
+        return _retrieval_cache
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain.prompts import PromptTemplate
+from langchain_core.documents import Document
+
+from src.cache.llm_cache import with_response_cache
+from src.constants import BASE_DIR
+from src.llm_config import get_llm
+from src.models import AgentState
+from src.utils.common import get_chunk_id, read_txt
+
+
+@dataclass
+class RetrievalPlan:
+    query: str
+    k: int
+
+
+class RetryStrategy:
+    """
+    Decides how each retrieval attempt for a sub-query is issued. The first
+    attempt searches for the sub-query as-is; retries rewrite the query from
+    the evaluator's feedback, widen `k`, and only keep chunks that were not
+    already seen, so a retry either brings new evidence or is recognised as
+    unchanged and skips the evaluator LLM call.
+    """
+
+    def __init__(self, base_k: int, k_increment: int, rewrite_enabled: bool):
+        self.base_k = base_k
+        self.k_increment = k_increment
+        self.rewrite_enabled = rewrite_enabled
+        self.llm = with_response_cache(get_llm(), "query_rewriter")
+        raw_prompt = read_txt(Path(BASE_DIR) / "prompts" / "query_rewriter_prompt.txt")
+        self.prompt_template = PromptTemplate(
+            template=raw_prompt,
+            input_variables=["current_sub_query", "evaluator_feedback"],
+        )
+
+    def _is_retry(self, state: AgentState) -> bool:
+        return state["retrieval_attempts"] > 0
+
+    def _k_for(self, state: AgentState) -> int:
+        return self.base_k + self.k_increment * state["retrieval_attempts"]
+
+    def _should_rewrite(self, state: AgentState) -> bool:
+        return (
+            self.rewrite_enabled
+            and self._is_retry(state)
+            and bool(state.get("evaluator_feedback"))
+        )
+
+    def plan(self, state: AgentState) -> RetrievalPlan:
+        """Returns the query and `k` to use for the next retrieval attempt."""
+        query = state["current_sub_query"]
+        if self._should_rewrite(state):
+            try:
+                chain = self.prompt_template | self.llm
+                response = chain.invoke(self._rewrite_inputs(state))
+                query = self._parse_rewrite(state, response)
+            except Exception as e:
+                query = self._fallback_rewrite(state, e)
+        return RetrievalPlan(query=query, k=self._k_for(state))
+
+    async def aplan(self, state: AgentState) -> RetrievalPlan:
+        """Async variant of `plan` that awaits the rewrite LLM call."""
+        query = state["current_sub_query"]
+        if self._should_rewrite(state):
+            try:
+                chain = self.prompt_template | self.llm
+                response = await chain.ainvoke(self._rewrite_inputs(state))
+                query = self._parse_rewrite(state, response)
+            except Exception as e:
+                query = self._fallback_rewrite(state, e)
+        return RetrievalPlan(query=query, k=self._k_for(state))
+
+    def _rewrite_inputs(self, state: AgentState) -> dict:
+        return {
+            "current_sub_query": state["current_sub_query"],
+            "evaluator_feedback": state["evaluator_feedback"],
+        }
+
+    def _parse_rewrite(self, state: AgentState, response) -> str:
+        lines = [line.strip() for line in response.content.strip().splitlines()]
+        rewritten = next((line for line in lines if line), "").strip("\"'")
+        if not rewritten:
+            return self._fallback_rewrite(state, ValueError("empty rewrite"))
+        print(
+            f"---RETRY STRATEGY: Rewrote '{state['current_sub_query']}' -> '{rewritten}'---"
+        )
+        return rewritten
+
+    def _fallback_rewrite(self, state: AgentState, error: Exception) -> str:
+        # Still vary the search by folding the feedback into the query text.
+        print(
+            f"---WARNING: Query rewrite failed, appending feedback instead: {error}---"
+        )
+        return f"{state['current_sub_query']} {state['evaluator_feedback']}".strip()
+
+    def merge(
+        self, state: AgentState, new_chunks: List[Document]
+    ) -> Tuple[List[str], Dict[str, Document], bool]:
+        """
+        Adds unseen chunks to the ones already retrieved for this sub-query.
+        Returns the combined chunk IDs, the unseen chunks keyed by ID, and
+        whether the attempt produced nothing new.
+        """
+        retrieved_chunk_ids = (
+            list(state.get("retrieved_chunk_ids", [])) if self._is_retry(state) else []
+        )
+        seen = set(retrieved_chunk_ids)
+
+        fresh_chunks: Dict[str, Document] = {}
+        for chunk in new_chunks:
+            chunk_id = get_chunk_id(chunk)
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            retrieved_chunk_ids.append(chunk_id)
+            fresh_chunks[chunk_id] = chunk
+
+        unchanged = self._is_retry(state) and not fresh_chunks
+        return retrieved_chunk_ids, fresh_chunks, unchanged
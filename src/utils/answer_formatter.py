@@ -0,0 +1,62 @@
+import os
+import re
+from typing import List
+
+FENCED_ANSWER = re.compile(r"^```(?:markdown|md)?\s*\n(.*)\n```\s*$", re.DOTALL)
+BULLET = re.compile(r"^(\s*)[*•‣◦]\s+")
+HEADING = re.compile(r"^(#{1,6})(?=[^#\s])")
+CITATION = re.compile(r"\[(\d+)\]")
+
+
+def normalize_markdown(text: str) -> str:
+    """
+    Deterministic cleanup of an LLM answer: unwraps an answer fenced as a
+    markdown code block, normalises bullets to `-`, fixes `#Heading`
+    spacing, strips trailing whitespace and collapses runs of blank lines.
+    """
+    text = text.strip()
+    fenced = FENCED_ANSWER.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+
+    lines = []
+    for line in text.splitlines():
+        line = BULLET.sub(r"\1- ", line.rstrip())
+        line = HEADING.sub(r"\1 ", line)
+        if line.startswith("#") and lines and lines[-1]:
+            lines.append("")
+        lines.append(line)
+
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def render_citations(text: str, sources: List[str]) -> str:
+    """
+    Resolves `[n]` chunk markers against `sources` (1-based, in prompt order):
+    markers that do not match a chunk are removed, and a "Sources" list of the
+    cited files is appended.
+    """
+    cited = []
+
+    def keep_valid(match: re.Match) -> str:
+        number = int(match.group(1))
+        if 1 <= number <= len(sources):
+            if number not in cited:
+                cited.append(number)
+            return match.group(0)
+        return ""
+
+    text = CITATION.sub(keep_valid, text)
+    text = re.sub(r"[ \t]+([.,;:!?])", r"\1", text)
+    if not cited:
+        return text
+
+    source_lines = [
+        f"- [{number}] {os.path.basename(sources[number - 1]) or 'Knowledge base'}"
+        for number in sorted(cited)
+    ]
+    return text + "\n\n**Sources:**\n" + "\n".join(source_lines)
+
+
+def format_answer(text: str, sources: List[str]) -> str:
+    return render_citations(normalize_markdown(text), sources)
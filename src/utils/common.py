@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 
@@ -43,3 +44,16 @@ def return_prompt_template(file_path) -> ChatPromptTemplate:
     with open(file_path, "r", encoding="utf-8") as f:
         template = f.read().strip()
     return ChatPromptTemplate.from_messages([("system", template)])
+
+
+def get_chunk_id(document) -> str:
+    """
+    Returns a stable identifier for a retrieved chunk: the vector store ID when
+    present, otherwise a hash of its source and content.
+    """
+    if getattr(document, "id", None):
+        return document.id
+    source = document.metadata.get("source", "")
+    return hashlib.sha256(
+        f"{source}\x00{document.page_content}".encode("utf-8")
+    ).hexdigest()[:32]
@@ -0,0 +1,95 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class ServerBusyError(Exception):
+    """Raised when a request cannot get an execution slot in time."""
+
+
+class SlotGuard:
+    """
+    A held limiter slot that is released at most once, so every cleanup path
+    (a generator's `finally`, a response background task) can call `release`.
+    """
+
+    def __init__(self, limiter: "ConcurrencyLimiter"):
+        self.limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.limiter.release()
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the number of agent runs in flight on one event loop. Requests beyond
+    `max_concurrency` wait in a bounded queue; once the queue is full, or a
+    request waits longer than `queue_timeout`, `ServerBusyError` is raised so
+    the caller can shed load instead of piling up work.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_size: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def acquire(self):
+        """
+        Waits for an execution slot. Callers must pair this with `release`.
+        """
+        if self._semaphore.locked() and self._waiting >= self.max_queue_size:
+            raise ServerBusyError(
+                f"Request queue is full ({self._waiting} waiting, {self._in_flight} running)."
+            )
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(
+                self._semaphore.acquire(), timeout=self.queue_timeout
+            )
+        except asyncio.TimeoutError:
+            raise ServerBusyError(
+                f"Timed out after {self.queue_timeout}s waiting for an execution slot."
+            ) from None
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+
+    def release(self):
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    async def acquire_guard(self) -> SlotGuard:
+        """Waits for an execution slot and returns a guard that releases it once."""
+        await self.acquire()
+        return SlotGuard(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_size": self.max_queue_size,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+        }
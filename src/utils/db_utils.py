@@ -1,25 +1,74 @@
-from langchain_chroma import Chroma
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict
 
 from src.config import ConfigurationManager
-from src.llm_config import EMBEDDINGS
+from src.constants import BASE_DIR
+from src.llm_config import get_embeddings
+
+_chroma_client = None
+_vector_db = None
+_vector_db_lock = threading.Lock()
+
+
+def get_chroma_client():
+    """
+    Returns the process-wide persistent Chroma client. Every vector store
+    opened by the server shares it, so the SQLite store and its caches are
+    opened once.
+    """
+    global _chroma_client
+    if _chroma_client is not None:
+        return _chroma_client
+
+    with _vector_db_lock:
+        if _chroma_client is None:
+            import chromadb
+
+            knowledge_base_config = ConfigurationManager().get_knowledge_base_config()
+            _chroma_client = chromadb.PersistentClient(
+                path=knowledge_base_config["CHROMA_DB_DIR"]
+            )
+    return _chroma_client
 
 
 def get_vector_db():
+    """
+    Returns the process-wide ChromaDB instance, opened on first use. Callers
+    share one persistent client instead of opening the store per agent.
+    """
+    global _vector_db
+    if _vector_db is not None:
+        return _vector_db
+
+    client = get_chroma_client()
+    with _vector_db_lock:
+        if _vector_db is None:
+            _vector_db = open_vector_db(client)
+    return _vector_db
+
+
+def open_vector_db(client=None):
     """Helper function to load the ChromaDB instance."""
+    from langchain_chroma import Chroma
+
     config = ConfigurationManager()
     knowledge_base_config = config.get_knowledge_base_config()
     CHROMA_DB_DIR = knowledge_base_config["CHROMA_DB_DIR"]
     COLLECTION_NAME = knowledge_base_config["COLLECTION_NAME"]
     try:
         vector_db = Chroma(
-            persist_directory=CHROMA_DB_DIR,
-            embedding_function=EMBEDDINGS,
+            client=client,
+            persist_directory=None if client else CHROMA_DB_DIR,
+            embedding_function=get_embeddings(),
             collection_name=COLLECTION_NAME,
         )
 
-        if vector_db.get()["ids"]:
+        chunk_count = vector_db._collection.count()
+        if chunk_count:
             print(
-                f"ChromaDB loaded successfully from {CHROMA_DB_DIR} with existing data."
+                f"ChromaDB loaded successfully from {CHROMA_DB_DIR} with {chunk_count} chunks."
             )
         else:
             print(
@@ -31,5 +80,37 @@ def get_vector_db():
         raise
 
 
+def knowledge_base_status() -> Dict[str, Any]:
+    """
+    Readiness of the knowledge base: the collection's chunk count, which Chroma
+    answers from its metadata without reading any documents.
+    """
+    try:
+        chunk_count = get_vector_db()._collection.count()
+    except Exception as e:
+        return {"ready": False, "chunks": 0, "error": str(e)}
+    return {"ready": chunk_count > 0, "chunks": chunk_count}
+
+
+def get_knowledge_base_version(chroma_db_dir: str, manifest_path: str) -> str:
+    """
+    Returns a cheap fingerprint of the knowledge base that changes whenever
+    ingestion writes to the Chroma store or the ingest manifest. Only `stat`
+    calls are made, so this is safe to check on every request.
+    """
+    paths = [
+        Path(chroma_db_dir) / "chroma.sqlite3",
+        Path.joinpath(BASE_DIR, manifest_path),
+    ]
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+        except FileNotFoundError:
+            fingerprint.append("missing")
+    return ":".join(fingerprint)
+
+
 if __name__ == "__main__":
     get_vector_db()
@@ -0,0 +1,216 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import ConfigurationManager
+from src.constants import (
+    DEFAULT_DECOMPOSITION_CACHE_MAX_ENTRIES,
+    DEFAULT_ROUTER_NEIGHBOUR_THRESHOLD,
+    DEFAULT_SIMPLE_QUERY_MAX_WORDS,
+)
+from src.llm_config import get_embeddings
+
+CONJUNCTIONS = re.compile(
+    r"\b(?:and|or|also|plus|then|versus|vs\.?|as well as|compare|compared|difference between)\b|[;&]",
+    re.IGNORECASE,
+)
+ROUTES = ("cached", "simple", "neighbour_simple", "neighbour_complex", "complex")
+
+
+@dataclass
+class RouteDecision:
+    """
+    Outcome of routing one query. `sub_queries` is set when decomposition can
+    be skipped; None means the research LLM has to decompose the query.
+    """
+
+    route: str
+    sub_queries: Optional[List[str]] = None
+
+
+class QueryRouter:
+    """
+    Cheap pre-decomposition router. A query already decomposed before reuses
+    its cached sub-queries. Otherwise local features (word count, conjunctions,
+    question marks) label it simple, in which case it is sent to retrieval as
+    its own single sub-query, or complex. A query with exactly one complex
+    feature is settled by its nearest previously decomposed query: if that
+    neighbour (cosine similarity at least `neighbour_threshold`) was not split
+    by the LLM, this one is not either.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        max_simple_words: int,
+        neighbour_threshold: float,
+        max_entries: int,
+    ):
+        self.embeddings = embeddings
+        self.max_simple_words = max_simple_words
+        self.neighbour_threshold = neighbour_threshold
+        self.max_entries = max_entries
+
+        self._decompositions: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {route: 0 for route in ROUTES}
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def complexity(self, query: str) -> int:
+        """Number of features suggesting the query asks for more than one thing."""
+        score = len(CONJUNCTIONS.findall(query))
+        score += max(0, query.count("?") - 1)
+        if len(query.split()) > self.max_simple_words:
+            score += 1
+        return score
+
+    def route(self, query: str) -> RouteDecision:
+        decision = self._route_locally(query)
+        if decision is None:
+            try:
+                embedding = self._normalize(self.embeddings.embed_query(query))
+                decision = self._route_by_neighbour(query, embedding)
+            except Exception as e:
+                print(f"---WARNING: Query router could not embed the query: {e}---")
+                decision = RouteDecision("complex")
+        return self._count(decision)
+
+    async def aroute(self, query: str) -> RouteDecision:
+        """Async variant of `route` that awaits the embedding call."""
+        decision = self._route_locally(query)
+        if decision is None:
+            try:
+                embedding = self._normalize(await self.embeddings.aembed_query(query))
+                decision = self._route_by_neighbour(query, embedding)
+            except Exception as e:
+                print(f"---WARNING: Query router could not embed the query: {e}---")
+                decision = RouteDecision("complex")
+        return self._count(decision)
+
+    def remember(self, query: str, sub_queries: List[str]):
+        """Caches an LLM decomposition and keeps the query as a neighbour for routing."""
+        embedding = self._normalize(self.embeddings.embed_query(query))
+        self._store(query, sub_queries, embedding)
+
+    async def aremember(self, query: str, sub_queries: List[str]):
+        embedding = self._normalize(await self.embeddings.aembed_query(query))
+        self._store(query, sub_queries, embedding)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            total = sum(self._counts.values())
+            return {
+                "entries": len(self._decompositions),
+                "routes": dict(self._counts),
+                "llm_skip_rate": (
+                    (
+                        total
+                        - self._counts["neighbour_complex"]
+                        - self._counts["complex"]
+                    )
+                    / total
+                    if total
+                    else 0.0
+                ),
+            }
+
+    def _route_locally(self, query: str) -> Optional[RouteDecision]:
+        with self._lock:
+            cached = self._decompositions.get(self._key(query))
+            if cached is not None:
+                self._decompositions.move_to_end(self._key(query))
+                return RouteDecision("cached", list(cached))
+
+        score = self.complexity(query)
+        if score == 0:
+            return RouteDecision("simple", [query])
+        if score > 1:
+            return RouteDecision("complex")
+        return None
+
+    def _route_by_neighbour(self, query: str, embedding: np.ndarray) -> RouteDecision:
+        with self._lock:
+            if self._embeddings:
+                if self._matrix is None:
+                    self._matrix_keys = list(self._embeddings.keys())
+                    self._matrix = np.stack(
+                        [self._embeddings[key] for key in self._matrix_keys]
+                    )
+                similarities = self._matrix @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.neighbour_threshold:
+                    neighbour = self._decompositions[self._matrix_keys[best]]
+                    if len(neighbour) == 1:
+                        return RouteDecision("neighbour_simple", [query])
+                    return RouteDecision("neighbour_complex")
+        return RouteDecision("complex")
+
+    def _store(self, query: str, sub_queries: List[str], embedding: np.ndarray):
+        key = self._key(query)
+        with self._lock:
+            self._decompositions[key] = list(sub_queries)
+            self._decompositions.move_to_end(key)
+            self._embeddings[key] = embedding
+            while len(self._decompositions) > self.max_entries:
+                evicted, _ = self._decompositions.popitem(last=False)
+                self._embeddings.pop(evicted, None)
+            self._matrix = None
+
+    def _count(self, decision: RouteDecision) -> RouteDecision:
+        with self._lock:
+            self._counts[decision.route] += 1
+        print(f"---QUERY ROUTER: Routed as {decision.route}---")
+        return decision
+
+
+_query_router: Optional[QueryRouter] = None
+_query_router_loaded = False
+_query_router_lock = threading.Lock()
+
+
+def get_query_router() -> Optional[QueryRouter]:
+    """
+    Returns the process-wide query router, or None if it is disabled in
+    `agent_config`.
+    """
+    global _query_router, _query_router_loaded
+    if _query_router_loaded:
+        return _query_router
+
+    with _query_router_lock:
+        if _query_router_loaded:
+            return _query_router
+
+        agent_config = ConfigurationManager().get_agent_config()
+        if agent_config.get("QUERY_ROUTER_ENABLED", False):
+            _query_router = QueryRouter(
+                embeddings=get_embeddings(),
+                max_simple_words=agent_config.get(
+                    "SIMPLE_QUERY_MAX_WORDS", DEFAULT_SIMPLE_QUERY_MAX_WORDS
+                ),
+                neighbour_threshold=agent_config.get(
+                    "ROUTER_NEIGHBOUR_THRESHOLD", DEFAULT_ROUTER_NEIGHBOUR_THRESHOLD
+                ),
+                max_entries=agent_config.get(
+                    "DECOMPOSITION_CACHE_MAX_ENTRIES",
+                    DEFAULT_DECOMPOSITION_CACHE_MAX_ENTRIES,
+                ),
+            )
+        _query_router_loaded = True
+        return _query_router
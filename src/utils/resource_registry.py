@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.config import ConfigurationManager, reload_config_if_changed
+from src.constants import DEFAULT_CONFIG_RELOAD_SECONDS, DEFAULT_READINESS_TTL_SECONDS
+from src.graph.agent_workflow import rag_agent_workflow_loaded, reset_rag_agent_workflow
+from src.llm_config import embeddings_loaded, llm_loaded
+from src.utils.db_utils import knowledge_base_status
+
+
+class ResourceRegistry:
+    """
+    Process-wide view of the server's shared resources: the config (read once,
+    optionally re-read when the file changes), the Gemini clients, the single
+    Chroma client and the compiled graph. Knowledge base readiness is cached
+    for `readiness_ttl_seconds`, so per-request checks cost a clock read.
+
+    A config change rebuilds the graph on the next request, so settings read
+    when the agents are built take effect without a restart. Other
+    process-wide singletons (the clients, the Chroma store and the caches)
+    keep their settings until the process restarts.
+    """
+
+    def __init__(self, readiness_ttl_seconds: float, config_reload_seconds: float):
+        self.readiness_ttl_seconds = readiness_ttl_seconds
+        self.config_reload_seconds = config_reload_seconds
+        self._lock = threading.Lock()
+        self._readiness: Optional[Dict[str, Any]] = None
+        self._readiness_checked_at = 0.0
+        self._config_checked_at = time.monotonic()
+        self._config_reloads = 0
+
+    def knowledge_base_ready(self) -> bool:
+        return self.readiness()["ready"]
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Cached knowledge base status. An unready store is re-checked on every
+        call, so the server picks up a finished ingest immediately.
+        """
+        now = time.monotonic()
+        readiness = self._readiness
+        if (
+            readiness is not None
+            and readiness["ready"]
+            and now - self._readiness_checked_at < self.readiness_ttl_seconds
+        ):
+            return readiness
+
+        readiness = knowledge_base_status()
+        with self._lock:
+            self._readiness = readiness
+            self._readiness_checked_at = now
+        return readiness
+
+    def refresh_config(self) -> bool:
+        """
+        Re-reads the config file if it changed, at most once every
+        `config_reload_seconds` (0 disables reloading). Returns whether it did.
+        """
+        if not self.config_reload_seconds:
+            return False
+        now = time.monotonic()
+        if now - self._config_checked_at < self.config_reload_seconds:
+            return False
+
+        with self._lock:
+            if now - self._config_checked_at < self.config_reload_seconds:
+                return False
+            self._config_checked_at = now
+            if not reload_config_if_changed():
+                return False
+            self._config_reloads += 1
+
+        print(
+            "---RESOURCE REGISTRY: Config file changed, rebuilding the agent graph on next use.---"
+        )
+        reset_rag_agent_workflow()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        readiness = self.readiness()
+        return {
+            "ready": readiness["ready"],
+            "knowledge_base": readiness,
+            "resources": {
+                "llm": llm_loaded(),
+                "embeddings": embeddings_loaded(),
+                "agent_graph": rag_agent_workflow_loaded(),
+            },
+            "config_reloads": self._config_reloads,
+        }
+
+
+_resource_registry: Optional[ResourceRegistry] = None
+_resource_registry_lock = threading.Lock()
+
+
+def get_resource_registry() -> ResourceRegistry:
+    """Returns the process-wide resource registry."""
+    global _resource_registry
+    if _resource_registry is not None:
+        return _resource_registry
+
+    with _resource_registry_lock:
+        if _resource_registry is None:
+            server_config = ConfigurationManager().get_server_config()
+            _resource_registry = ResourceRegistry(
+                readiness_ttl_seconds=server_config.get(
+                    "READINESS_TTL_SECONDS", DEFAULT_READINESS_TTL_SECONDS
+                ),
+                config_reload_seconds=server_config.get(
+                    "CONFIG_RELOAD_SECONDS", DEFAULT_CONFIG_RELOAD_SECONDS
+                ),
+            )
+        return _resource_registry
@@ -0,0 +1,159 @@
+from src.data_ingestion.chunk_references import ChunkReferences
+from src.retrieval.near_duplicates import (
+    NearDuplicateIndex,
+    fact_tokens,
+    hamming_distance,
+    is_near_duplicate,
+    simhash,
+)
+
+MANUAL_CHUNK = (
+    "Warranty coverage. The QuantumFlow purifier is covered by a limited warranty of "
+    "{period} from the date of original purchase. The warranty covers defects in "
+    "materials and workmanship under normal household use. It does not cover damage "
+    "caused by improper installation, misuse, unauthorised repairs, freezing, or the "
+    "use of replacement filters that are not approved by the manufacturer. To make a "
+    "claim, contact customer support with your proof of purchase and the serial number "
+    "printed on the label at the back of the unit. Replacement parts supplied under "
+    "warranty are covered for the remainder of the original warranty period."
+)
+TEXT = MANUAL_CHUNK.format(period="2 years")
+REWORDED = TEXT.replace("household use", "domestic use")
+
+
+def reworded_index(tmp_path) -> NearDuplicateIndex:
+    """An index in which `REWORDED` is a near-duplicate of `TEXT`."""
+    max_distance = hamming_distance(simhash(TEXT), simhash(REWORDED))
+    return NearDuplicateIndex(
+        tmp_path / "near_duplicates.sqlite3", max_distance=max_distance
+    ).load()
+
+
+def write_canonical(index, references, file_path, chunk_id, text):
+    _, signature = index.find(text)
+    index.add(chunk_id, signature, file_path, text)
+    references.reference(file_path, [chunk_id], [chunk_id])
+
+
+def dedupe_reworded(index, references, file_path) -> str:
+    canonical_id, _ = index.find(REWORDED)
+    index.add_source(canonical_id, file_path)
+    assert not references.needs_write(canonical_id)
+    references.reference(file_path, [canonical_id], [])
+    return canonical_id
+
+
+def test_chunks_differing_only_in_a_numeric_spec_are_kept_apart(tmp_path):
+    one_year = MANUAL_CHUNK.format(period="1 year")
+    five_years = MANUAL_CHUNK.format(period="5 years")
+    assert fact_tokens(one_year) != fact_tokens(five_years)
+    max_distance = hamming_distance(simhash(one_year), simhash(five_years))
+
+    assert not is_near_duplicate(
+        simhash(one_year),
+        fact_tokens(one_year),
+        simhash(five_years),
+        fact_tokens(five_years),
+        max_distance,
+    )
+
+    index = NearDuplicateIndex(
+        tmp_path / "near_duplicates.sqlite3", max_distance=max_distance
+    ).load()
+    canonical_id, signature = index.find(one_year)
+    assert canonical_id is None
+    index.add("one-year", signature, "a.pdf", one_year)
+
+    assert index.find(five_years)[0] is None
+
+
+def test_identical_facts_with_reworded_text_are_merged(tmp_path):
+    index = reworded_index(tmp_path)
+    _, signature = index.find(TEXT)
+    index.add("canonical", signature, "a.pdf", TEXT)
+
+    assert index.find(REWORDED)[0] == "canonical"
+
+
+def test_index_is_persisted_on_save(tmp_path):
+    index = reworded_index(tmp_path)
+    _, signature = index.find(TEXT)
+    index.add("canonical", signature, "a.pdf", TEXT)
+    index.add_source("canonical", "b.pdf")
+    index.save()
+
+    reopened = reworded_index(tmp_path)
+    assert reopened.find(REWORDED)[0] == "canonical"
+    assert reopened.sources("canonical") == ["a.pdf", "b.pdf"]
+
+
+def test_file_deduped_onto_an_in_flight_chunk_waits_for_its_writer(tmp_path):
+    index = reworded_index(tmp_path)
+    references = ChunkReferences({}, index)
+    write_canonical(index, references, "a.pdf", "canonical", TEXT)
+    dedupe_reworded(index, references, "b.pdf")
+
+    # b.pdf wrote nothing itself, but must not complete before a.pdf.
+    assert references.file_written("b.pdf", True) == []
+    assert references.file_written("a.pdf", True) == [
+        ("a.pdf", True),
+        ("b.pdf", True),
+    ]
+    assert dedupe_reworded(index, references, "c.pdf") == "canonical"
+    assert references.file_written("c.pdf", True) == [("c.pdf", True)]
+
+
+def test_file_deduped_onto_an_in_flight_chunk_fails_with_its_writer(tmp_path):
+    index = reworded_index(tmp_path)
+    references = ChunkReferences({}, index)
+    write_canonical(index, references, "a.pdf", "canonical", TEXT)
+    dedupe_reworded(index, references, "b.pdf")
+    assert references.file_written("b.pdf", True) == []
+
+    # The owner's batch fails: the canonical chunk was never stored.
+    completed = references.file_written("a.pdf", False)
+    assert completed == [("a.pdf", False), ("b.pdf", False)]
+    for file_path, _ in completed:
+        references.release_failed(file_path, ["canonical"])
+
+    assert references.needs_write("canonical")
+    assert index.find(REWORDED)[0] is None
+    assert index.sources("canonical") == []
+
+
+def test_identical_chunk_of_a_failed_writer_is_written_again(tmp_path):
+    index = reworded_index(tmp_path)
+    references = ChunkReferences({}, index)
+    write_canonical(index, references, "a.pdf", "canonical", TEXT)
+    references.reference("b.pdf", ["canonical"], [])
+
+    # a.pdf fails while b.pdf, which references its chunk, is still writing.
+    assert references.file_written("a.pdf", False) == [("a.pdf", False)]
+    references.release_failed("a.pdf", ["canonical"])
+    assert index.find(TEXT)[0] is None
+
+    # A later file containing the same chunk writes it instead of pointing at it.
+    assert references.needs_write("canonical")
+    write_canonical(index, references, "c.pdf", "canonical", TEXT)
+    assert references.file_written("b.pdf", True) == [("b.pdf", False)]
+    references.release_failed("b.pdf", ["canonical"])
+    assert references.file_written("c.pdf", True) == [("c.pdf", True)]
+    assert not references.needs_write("canonical")
+    assert index.find(REWORDED)[0] == "canonical"
+
+
+def test_released_chunk_is_unreferenced_only_after_its_last_file(tmp_path):
+    index = reworded_index(tmp_path)
+    manifest = {
+        "a.pdf": {"chunk_ids": ["canonical"]},
+        "b.pdf": {"chunk_ids": ["canonical"]},
+    }
+    references = ChunkReferences(manifest, index)
+    _, signature = index.find(TEXT)
+    index.add("canonical", signature, "a.pdf", TEXT)
+    index.add_source("canonical", "b.pdf")
+
+    assert references.release("a.pdf", ["canonical"]) == []
+    assert references.sources_changed == {"canonical"}
+    assert index.sources("canonical") == ["b.pdf"]
+    assert references.release("b.pdf", ["canonical"]) == ["canonical"]